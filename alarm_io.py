@@ -0,0 +1,288 @@
+"""
+Bulk import and export of alarms as CSV and iCalendar (.ics)
+
+Readers are generators: they parse one record at a time from an open file and
+yield validated alarm dicts (hour, minute, label, days, ringtone, enabled,
+rrule, dtstart, timezone), so a 10,000-line file never has to be held in
+memory twice. Records that fail validation are skipped and reported as (line
+number, message) in the `errors` list passed in. Writers stream the alarms out
+the same way.
+
+CSV columns: time, label, days, ringtone, enabled, rrule, dtstart, timezone
+  time     07:30, 7:30 PM or 19:30 (or separate hour and minute columns)
+  days     day names separated by ; or spaces, e.g. "Mon;Wed;Fri"; empty = one-time
+  enabled  true/false, yes/no or 1/0; defaults to true
+  rrule    optional iCalendar rule, e.g. "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO"; overrides days
+  dtstart  optional YYYY-MM-DD the rule counts from
+  timezone optional IANA zone the time is in, e.g. "America/New_York"; empty = local time
+
+iCalendar: each VEVENT becomes an alarm at its DTSTART time (in its TZID zone,
+if it has one) and SUMMARY is the label. An RRULE that is just "weekly on
+these days" becomes repeat days; any other rule recurrence.py supports is kept
+as the alarm's rrule.
+"""
+import csv
+import re
+from datetime import date, datetime, timezone
+
+from occurrence import DAY_NAMES
+from recurrence import RecurrenceRule, alarm_start
+from zones import get_zone
+
+CSV_FIELDS = ["time", "label", "days", "ringtone", "enabled", "rrule", "dtstart", "timezone"]
+ICS_DAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+TRUE_VALUES = {"1", "true", "yes", "y", "on"}
+FALSE_VALUES = {"0", "false", "no", "n", "off"}
+MAX_LABEL_LENGTH = 200
+# One escape sequence in an iCalendar TEXT value (RFC 5545 3.3.11)
+ICS_ESCAPE = re.compile(r"\\([\\;,nN])")
+
+
+class InvalidAlarm(ValueError):
+    pass
+
+
+def parse_time(text):
+    """(hour, minute) from '07:30', '7:30 PM' or '19:30'"""
+    text = text.strip().upper()
+    period = None
+    if text.endswith(("AM", "PM")):
+        text, period = text[:-2].strip(), text[-2:]
+    try:
+        hour, minute = (int(part) for part in text.split(":"))
+    except ValueError:
+        raise InvalidAlarm(f"bad time {text!r}")
+    if period:
+        if not 1 <= hour <= 12:
+            raise InvalidAlarm(f"bad 12-hour time {text!r} {period}")
+        hour = hour % 12 + (12 if period == "PM" else 0)
+    return hour, minute
+
+
+def parse_days(text):
+    days = []
+    for part in text.replace(";", " ").replace(",", " ").split():
+        day = part[:3].capitalize()
+        if day not in DAY_NAMES:
+            raise InvalidAlarm(f"unknown day {part!r}")
+        if day not in days:
+            days.append(day)
+    # Keep the Mon..Sun order the UI uses
+    return [day for day in DAY_NAMES if day in days]
+
+
+def parse_bool(text, default=True):
+    text = (text or "").strip().lower()
+    if not text:
+        return default
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise InvalidAlarm(f"bad enabled value {text!r}")
+
+
+def parse_rrule(text):
+    """(days, rrule) for a rule: plain weekly rules become days, anything else stays a normalized rule"""
+    try:
+        rule = RecurrenceRule.parse(text)
+    except ValueError as e:
+        raise InvalidAlarm(f"unsupported recurrence {text!r}: {e}")
+    days = rule.simple_days()
+    if days is not None:
+        return days, None
+    return [], str(rule)
+
+
+def validate(hour, minute, label="", days=(), ringtone="", enabled=True, rrule=None, dtstart=None, timezone=None):
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise InvalidAlarm(f"time out of range {hour}:{minute:02d}")
+    label = (label or "").strip()[:MAX_LABEL_LENGTH] or f"Alarm {hour:02d}:{minute:02d}"
+    if rrule:
+        days, rrule = parse_rrule(rrule)
+    if rrule and dtstart:
+        try:
+            dtstart = date.fromisoformat(dtstart.strip()).isoformat()
+        except ValueError:
+            raise InvalidAlarm(f"bad dtstart {dtstart!r}")
+    timezone = (timezone or "").strip() or None
+    try:
+        get_zone(timezone)
+    except ValueError as e:
+        raise InvalidAlarm(str(e))
+    return {
+        "hour": hour,
+        "minute": minute,
+        "label": label,
+        "days": list(days),
+        "ringtone": (ringtone or "").strip() or "Default",
+        "enabled": enabled,
+        "rrule": rrule or None,
+        "dtstart": (dtstart or None) if rrule else None,
+        "timezone": timezone,
+    }
+
+
+# CSV
+
+def read_csv(f, errors):
+    reader = csv.DictReader(f)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            errors.append((reader.line_num, f"unreadable CSV: {e}"))
+            return
+        try:
+            row = {(key or "").strip().lower(): (value or "") for key, value in row.items()}
+            if row.get("time"):
+                hour, minute = parse_time(row["time"])
+            else:
+                try:
+                    hour, minute = int(row["hour"]), int(row["minute"])
+                except (KeyError, ValueError):
+                    raise InvalidAlarm("missing time")
+            yield validate(hour, minute, row.get("label"), parse_days(row.get("days", "")),
+                           row.get("ringtone"), parse_bool(row.get("enabled")),
+                           row.get("rrule"), row.get("dtstart"), row.get("timezone"))
+        except InvalidAlarm as e:
+            errors.append((reader.line_num, str(e)))
+
+
+def write_csv(alarms, f):
+    writer = csv.writer(f)
+    writer.writerow(CSV_FIELDS)
+    count = 0
+    for alarm in alarms:
+        writer.writerow([f"{alarm.hour:02d}:{alarm.minute:02d}", alarm.label, ";".join(alarm.days),
+                         alarm.ringtone, "true" if alarm.enabled else "false",
+                         alarm.rrule or "", alarm.dtstart or "", alarm.timezone or ""])
+        count += 1
+    return count
+
+
+# iCalendar
+
+def _unfold(f):
+    """Yield (line number, logical line) with RFC 5545 continuation lines joined"""
+    current, start = None, 0
+    for number, line in enumerate(f, 1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, number
+    if current is not None:
+        yield start, current
+
+
+def _unescape(text):
+    # One pass, so an escaped backslash can't pair up with the character after it
+    return ICS_ESCAPE.sub(lambda m: " " if m.group(1) in "nN" else m.group(1), text)
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _parse_dtstart(params, value):
+    """(wall-clock start, IANA zone or None) from DTSTART's parameters and value"""
+    params = dict(param.partition("=")[::2] for param in params.split(";") if param)
+    params = {key.upper(): value.strip('"') for key, value in params.items()}
+    if params.get("VALUE", "").upper() == "DATE":
+        raise InvalidAlarm("all-day event has no time")
+    try:
+        when = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    except ValueError:
+        raise InvalidAlarm(f"bad DTSTART {value!r}")
+    if value.endswith("Z"):
+        # UTC times ring at the matching local time
+        return when.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None), None
+    zone = params.get("TZID")
+    try:
+        get_zone(zone)
+    except ValueError:
+        # Not an IANA name (e.g. a Windows zone name): read the time as local
+        zone = None
+    return when, zone
+
+
+def read_ics(f, errors):
+    event = None
+    for number, line in _unfold(f):
+        name, _, value = line.partition(":")
+        name, _, params = name.partition(";")
+        name = name.upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event = {"line": number}
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            try:
+                if "DTSTART" not in event:
+                    raise InvalidAlarm("missing DTSTART")
+                start, zone = _parse_dtstart(*event["DTSTART"])
+                enabled = parse_bool(event.get("X-RINGRING-ENABLED"), event.get("STATUS", "").upper() != "CANCELLED")
+                yield validate(start.hour, start.minute, _unescape(event.get("SUMMARY", "")), [],
+                               _unescape(event.get("X-RINGRING-RINGTONE", "")), enabled,
+                               event.get("RRULE"), start.date().isoformat(), zone)
+            except InvalidAlarm as e:
+                errors.append((event["line"], str(e)))
+            event = None
+        elif event is not None and name not in event:
+            # Only the first of each property counts; nested VALARMs don't override the event's
+            event[name] = (params, value) if name == "DTSTART" else value
+
+
+def write_ics(alarms, f, today=None):
+    today = today or datetime.now()
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//ShaazKazi//Ring Ring//EN\r\n")
+    count = 0
+    for alarm in alarms:
+        if alarm.rrule:
+            start = alarm_start(alarm)
+        else:
+            start = today.replace(hour=alarm.hour, minute=alarm.minute, second=0, microsecond=0)
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:ringring-{alarm.id}-{start:%Y%m%d}@ringring",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART{f';TZID={alarm.timezone}' if alarm.timezone else ''}:{start:%Y%m%dT%H%M%S}",
+            "DURATION:PT1M",
+            f"SUMMARY:{_escape(alarm.label)}",
+        ]
+        if alarm.rrule:
+            lines.append(f"RRULE:{alarm.rrule}")
+        elif alarm.days:
+            lines.append("RRULE:FREQ=WEEKLY;BYDAY=" + ",".join(ICS_DAYS[DAY_NAMES.index(day)] for day in alarm.days))
+        lines += [
+            f"X-RINGRING-RINGTONE:{_escape(alarm.ringtone)}",
+            f"X-RINGRING-ENABLED:{'TRUE' if alarm.enabled else 'FALSE'}",
+            "BEGIN:VALARM",
+            "ACTION:DISPLAY",
+            f"DESCRIPTION:{_escape(alarm.label)}",
+            "TRIGGER:PT0S",
+            "END:VALARM",
+            "END:VEVENT",
+        ]
+        f.write("\r\n".join(lines) + "\r\n")
+        count += 1
+    f.write("END:VCALENDAR\r\n")
+    return count
+
+
+def read_alarms(path, errors):
+    """Open `path` and stream alarms from it, picking the format by extension"""
+    reader = read_ics if path.lower().endswith((".ics", ".ical")) else read_csv
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        yield from reader(f, errors)
+
+
+def write_alarms(alarms, path):
+    """Write alarms to `path` as CSV or iCalendar, by extension; returns the count"""
+    writer = write_ics if path.lower().endswith((".ics", ".ical")) else write_csv
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        return writer(alarms, f)
@@ -0,0 +1,206 @@
+"""
+Virtualized alarm list
+
+Only the cards that fit in the visible part of the list (plus a couple either
+side) exist as widgets. As the list scrolls, cards that leave the viewport go
+back to a pool and are re-bound to whichever alarms scrolled into view, so a
+list of thousands of alarms costs the same handful of widgets as a list of ten.
+
+Changes are keyed by alarm id: insert(), update() and remove() touch only the
+affected card (and shift the rows below it) instead of rebuilding the list.
+
+The list owns its canvas and scrollbar rather than borrowing the insides of a
+CTkScrollableFrame. The inner frame is kept exactly one viewport tall and moved
+along with the view, because a Tk window cannot be made tall enough to hold
+thousands of cards; the canvas scroll region carries the full list height.
+"""
+import sys
+import tkinter as tk
+
+import customtkinter as ctk
+
+
+class VirtualAlarmList:
+    def __init__(self, master, row_height, create_card, bind_card, create_empty=None, padx=10, pady=8, overscan=2,
+                 **frame_kwargs):
+        # create_card(master) builds a card widget, bind_card(card, alarm) points it at an alarm
+        self.create_card = create_card
+        self.bind_card = bind_card
+        self.create_empty = create_empty
+        self.row_height = row_height
+        self.padx = padx
+        self.pady = pady
+        self.overscan = overscan
+
+        self._order = []
+        self._alarms = {}
+        self._visible = {}
+        self._pool = []
+        self._empty_widget = None
+        self._render_pending = False
+        # Called once the next render is done
+        self._on_rendered = []
+
+        self._create_widgets(master, frame_kwargs)
+
+    def _create_widgets(self, master, frame_kwargs):
+        # container is what the caller packs; frame holds the cards
+        self.container = ctk.CTkFrame(master, **frame_kwargs)
+        self.scrollbar = ctk.CTkScrollbar(self.container)
+        self.scrollbar.pack(side="right", fill="y", padx=(0, 4), pady=6)
+        self.canvas = tk.Canvas(self.container, highlightthickness=0, borderwidth=0)
+        self.canvas.pack(side="left", fill="both", expand=True, padx=(6, 0), pady=6)
+        self.frame = ctk.CTkFrame(self.canvas, fg_color=self.container.cget("fg_color"), corner_radius=0)
+        self._window = self.canvas.create_window(0, 0, window=self.frame, anchor="nw")
+
+        self.scrollbar.configure(command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
+        if sys.platform.startswith("win"):
+            self.canvas.configure(yscrollincrement=1)
+        elif sys.platform == "darwin":
+            self.canvas.configure(yscrollincrement=8)
+        else:
+            self.canvas.configure(yscrollincrement=30)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.canvas.bind_all(sequence, self._on_mouse_wheel, add="+")
+
+        # The canvas is plain Tk, so its background follows the theme by hand
+        self._update_colors(ctk.get_appearance_mode())
+        ctk.AppearanceModeTracker.add(self._update_colors, self.container)
+        self.canvas.bind("<Destroy>", lambda e: ctk.AppearanceModeTracker.remove(self._update_colors))
+
+    def __len__(self):
+        return len(self._order)
+
+    def _scaling(self):
+        return ctk.ScalingTracker.get_widget_scaling(self.container)
+
+    def _update_colors(self, mode):
+        color = self.container.cget("fg_color")
+        if isinstance(color, (tuple, list)):
+            color = color[1] if mode == "Dark" else color[0]
+        self.canvas.configure(bg=color)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.schedule_render()
+
+    def _on_mouse_wheel(self, event):
+        # bind_all sees every wheel event in the app; only scroll when the pointer is over this list
+        widget = event.widget
+        while widget is not None and widget is not self.canvas:
+            widget = getattr(widget, "master", None)
+        if widget is None or self.canvas.yview() == (0.0, 1.0):
+            return
+        if sys.platform.startswith("win"):
+            self.canvas.yview_scroll(-int(event.delta / 6), "units")
+        elif sys.platform == "darwin":
+            self.canvas.yview_scroll(-event.delta, "units")
+        else:
+            self.canvas.yview_scroll(-1 if event.num == 4 else 1, "units")
+
+    def set_alarms(self, alarms, on_rendered=None):
+        """Replace the whole list, e.g. after loading; on_rendered() is called once its cards are placed"""
+        if on_rendered is not None:
+            self._on_rendered.append(on_rendered)
+        self._order = [alarm.id for alarm in alarms]
+        self._alarms = {alarm.id: alarm for alarm in alarms}
+        for card in self._visible.values():
+            card.place_forget()
+            self._pool.append(card)
+        self._visible = {}
+        self._update_scrollregion()
+        self.schedule_render()
+
+    def insert(self, alarm):
+        self._order.append(alarm.id)
+        self._alarms[alarm.id] = alarm
+        self._update_scrollregion()
+        self.schedule_render()
+
+    def update(self, alarm):
+        if alarm.id not in self._alarms:
+            return
+        self._alarms[alarm.id] = alarm
+        card = self._visible.get(alarm.id)
+        if card is not None:
+            self.bind_card(card, alarm)
+
+    def remove(self, alarm_id):
+        if self._alarms.pop(alarm_id, None) is None:
+            return
+        self._order.remove(alarm_id)
+        card = self._visible.pop(alarm_id, None)
+        if card is not None:
+            card.place_forget()
+            self._pool.append(card)
+        self._update_scrollregion()
+        self.schedule_render()
+
+    def _on_canvas_configure(self, event):
+        self.canvas.itemconfigure(self._window, width=self.canvas.winfo_width())
+        self._update_scrollregion()
+        self.schedule_render()
+
+    def _update_scrollregion(self):
+        height = max(len(self._order) * self.row_height * self._scaling(), self.canvas.winfo_height())
+        self.canvas.configure(scrollregion=(0, 0, self.canvas.winfo_width(), height))
+
+    def schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.frame.after_idle(self._render)
+
+    def _render(self):
+        self._render_pending = False
+        try:
+            self._place_cards()
+        finally:
+            callbacks, self._on_rendered = self._on_rendered, []
+            for callback in callbacks:
+                callback()
+
+    def _place_cards(self):
+        viewport = max(self.canvas.winfo_height(), 1)
+        top = self.canvas.canvasy(0)
+
+        # Keep the inner frame exactly over the viewport
+        self.canvas.coords(self._window, 0, top)
+        self.canvas.itemconfigure(self._window, height=viewport)
+
+        if not self._order:
+            self._show_empty(True)
+            return
+        self._show_empty(False)
+
+        # Canvas coordinates are in pixels, while CTk widgets scale place() arguments themselves
+        scale = self._scaling()
+        row_px = self.row_height * scale
+        first = max(0, int(top // row_px) - self.overscan)
+        last = min(len(self._order), int((top + viewport) // row_px) + 1 + self.overscan)
+        wanted = set(self._order[first:last])
+
+        for alarm_id in [alarm_id for alarm_id in self._visible if alarm_id not in wanted]:
+            card = self._visible.pop(alarm_id)
+            card.place_forget()
+            self._pool.append(card)
+
+        for row in range(first, last):
+            alarm_id = self._order[row]
+            card = self._visible.get(alarm_id)
+            if card is None:
+                card = self._pool.pop() if self._pool else self.create_card(self.frame)
+                self.bind_card(card, self._alarms[alarm_id])
+                self._visible[alarm_id] = card
+            card.place(x=self.padx, y=row * self.row_height + self.pady - top / scale, relwidth=1, width=-2 * self.padx)
+
+    def _show_empty(self, show):
+        if self.create_empty is None:
+            return
+        if show:
+            if self._empty_widget is None:
+                self._empty_widget = self.create_empty(self.frame)
+            self._empty_widget.place(x=self.padx, y=30, relwidth=1, width=-2 * self.padx)
+        elif self._empty_widget is not None:
+            self._empty_widget.place_forget()
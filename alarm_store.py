@@ -0,0 +1,205 @@
+"""
+Compact alarm storage
+
+Alarms are __slots__ records held in a slot array. An id -> slot dict gives
+constant-time lookup for toggle and delete, deleted slots go on a free-list to
+be reused, and ids are allocated monotonically so they never collide, even
+after a delete or a restart.
+"""
+import json
+import threading
+from datetime import datetime
+
+STORE_VERSION = 2
+
+
+class Alarm:
+    __slots__ = ("id", "hour", "minute", "label", "days", "ringtone", "enabled", "created",
+                 "snooze_of", "rrule", "dtstart", "timezone")
+
+    def __init__(self, id, hour, minute, label, days=(), ringtone="Default", enabled=True, created=None,
+                 snooze_of=None, rrule=None, dtstart=None, timezone=None):
+        self.id = id
+        self.hour = hour
+        self.minute = minute
+        self.label = label
+        self.days = list(days)
+        self.ringtone = ringtone
+        self.enabled = enabled
+        self.created = created or datetime.now().isoformat()
+        # Id of the alarm this one snoozes; snoozes ring once and are then removed
+        self.snooze_of = snooze_of
+        # iCalendar RRULE (see recurrence.py) for schedules that days can't express,
+        # and the ISO date it counts from; when set, days is ignored
+        self.rrule = rrule
+        self.dtstart = dtstart
+        # IANA zone the alarm time is in, e.g. "Europe/London"; None means the system's local time
+        self.timezone = timezone
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        for name in ("snooze_of", "rrule", "dtstart", "timezone"):
+            if data[name] is None:
+                del data[name]
+        return data
+
+    @classmethod
+    def from_dict(cls, data, alarm_id):
+        return cls(
+            id=alarm_id,
+            hour=int(data["hour"]),
+            minute=int(data["minute"]),
+            label=data.get("label") or f"Alarm {int(data['hour']):02d}:{int(data['minute']):02d}",
+            days=data.get("days") or [],
+            ringtone=data.get("ringtone", "Default"),
+            enabled=bool(data.get("enabled", True)),
+            created=data.get("created"),
+            snooze_of=data.get("snooze_of"),
+            rrule=data.get("rrule"),
+            dtstart=data.get("dtstart"),
+            timezone=data.get("timezone"),
+        )
+
+    def __repr__(self):
+        return f"Alarm(id={self.id}, {self.hour:02d}:{self.minute:02d}, {self.label!r})"
+
+
+class AlarmStore:
+    def __init__(self):
+        self._slots = []
+        self._free = []
+        # id -> slot; insertion order doubles as the display order
+        self._index = {}
+        self._next_id = 1
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        with self._lock:
+            alarms = [self._slots[slot] for slot in self._index.values()]
+        return iter(alarms)
+
+    def __contains__(self, alarm_id):
+        return alarm_id in self._index
+
+    def get(self, alarm_id):
+        slot = self._index.get(alarm_id)
+        return self._slots[slot] if slot is not None else None
+
+    def slot(self, alarm_id):
+        """Position of the alarm in the slot array, or None; stable until it is removed"""
+        return self._index.get(alarm_id)
+
+    def slots(self):
+        """Copy of the slot array, with None for free slots"""
+        with self._lock:
+            return list(self._slots)
+
+    def _insert(self, alarm):
+        if self._free:
+            slot = self._free.pop()
+            self._slots[slot] = alarm
+        else:
+            slot = len(self._slots)
+            self._slots.append(alarm)
+        self._index[alarm.id] = slot
+
+    def add(self, hour, minute, label, days=(), ringtone="Default", enabled=True, snooze_of=None,
+            rrule=None, dtstart=None, timezone=None):
+        with self._lock:
+            alarm = Alarm(self._next_id, hour, minute, label, days, ringtone, enabled, snooze_of=snooze_of,
+                          rrule=rrule, dtstart=dtstart, timezone=timezone)
+            self._next_id += 1
+            self._insert(alarm)
+            return alarm
+
+    def upsert(self, data):
+        """Insert or replace an alarm from its saved dict, keeping its id"""
+        with self._lock:
+            alarm = Alarm.from_dict(data, data["id"])
+            slot = self._index.get(alarm.id)
+            if slot is None:
+                self._insert(alarm)
+            else:
+                self._slots[slot] = alarm
+            self._next_id = max(self._next_id, alarm.id + 1)
+            return alarm
+
+    def set_enabled(self, alarm_id, enabled):
+        alarm = self.get(alarm_id)
+        if alarm is not None:
+            alarm.enabled = enabled
+        return alarm
+
+    def remove(self, alarm_id):
+        with self._lock:
+            slot = self._index.pop(alarm_id, None)
+            if slot is None:
+                return None
+            alarm = self._slots[slot]
+            self._slots[slot] = None
+            self._free.append(slot)
+            return alarm
+
+    def clear(self):
+        with self._lock:
+            self._slots = []
+            self._free = []
+            self._index = {}
+
+    def to_data(self):
+        with self._lock:
+            return {
+                "version": STORE_VERSION,
+                "next_id": self._next_id,
+                "alarms": [alarm.to_dict() for alarm in self],
+            }
+
+    def load_data(self, data):
+        """
+        Load alarms saved by to_data(), upgrading the old format on the way:
+        a bare list of dicts whose ids came from len(alarms) (so may collide)
+        and whose snoozes had string ids like "snooze_3_1700000000".
+        """
+        with self._lock:
+            self.clear()
+            if isinstance(data, list):
+                records, next_id = data, 1
+            else:
+                records, next_id = data.get("alarms", []), data.get("next_id", 1)
+
+            seen = set()
+            pending = []
+            for record in records:
+                alarm_id = record.get("id")
+                if isinstance(alarm_id, str) and alarm_id.startswith("snooze_"):
+                    # Legacy snooze: remember what it snoozes, give it a fresh integer id
+                    parts = alarm_id.split("_")
+                    if "snooze_of" not in record and len(parts) > 1 and parts[1].isdigit():
+                        record = dict(record, snooze_of=int(parts[1]))
+                    alarm_id = None
+                if not isinstance(alarm_id, int) or isinstance(alarm_id, bool) or alarm_id in seen:
+                    alarm_id = None
+                if alarm_id is not None:
+                    seen.add(alarm_id)
+                pending.append((record, alarm_id))
+
+            self._next_id = max([next_id] + [alarm_id + 1 for alarm_id in seen])
+            for record, alarm_id in pending:
+                if alarm_id is None:
+                    alarm_id = self._next_id
+                    self._next_id += 1
+                try:
+                    self._insert(Alarm.from_dict(record, alarm_id))
+                except (KeyError, TypeError, ValueError):
+                    continue
+
+    def load(self, path):
+        with open(path, "r") as f:
+            self.load_data(json.load(f))
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_data(), f, indent=2)
@@ -0,0 +1,178 @@
+"""
+Ringtone playback
+
+Ringtones are decoded once into in-memory pygame Sound buffers and kept in an
+LRU cache bounded by total decoded bytes, so starting an alarm (or clicking
+Test) doesn't have to read and decode the file from disk first. The ringtone of
+the next alarm is prefetched into the cache a few minutes before it is due.
+The "Default" ringtone has no file: its beep pattern is synthesized once into a
+PCM buffer in the mixer's own format and cached like any other ringtone.
+
+Playback goes through AudioEngine, which owns a fixed pool of mixer channels
+and gives every ringing alarm its own voice. Overlapping alarms no longer cut
+each other off, and stopping or changing the volume of one leaves the others
+alone.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+from ringtone_library import RINGTONES_PATH
+
+DEFAULT_RINGTONE = "Default"
+
+# numpy sample type for each pygame.mixer.get_init() format
+SAMPLE_TYPES = {8: np.uint8, -8: np.int8, 16: np.uint16, -16: np.int16, 32: np.float32, -32: np.float32}
+
+
+def synthesize_beep(frequency=1000, beep_ms=500, gap_ms=500, fade_ms=5):
+    """One beep-and-pause cycle of the default alarm tone as a Sound; loop it for the pattern"""
+    rate, sample_format, channels = pygame.mixer.get_init()
+    beep = int(rate * beep_ms / 1000)
+    t = np.arange(beep) / rate
+    wave = np.sin(2 * np.pi * frequency * t)
+    # Short ramps so the tone doesn't click on and off
+    fade = min(int(rate * fade_ms / 1000), beep // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade)
+        wave[:fade] *= ramp
+        wave[-fade:] *= ramp[::-1]
+    wave = np.concatenate([wave, np.zeros(int(rate * gap_ms / 1000))]) * 0.8
+
+    dtype = SAMPLE_TYPES[sample_format]
+    if dtype is np.float32:
+        samples = wave.astype(np.float32)
+    else:
+        info = np.iinfo(dtype)
+        mid = (int(info.max) + int(info.min) + 1) / 2
+        samples = (mid + wave * (info.max - mid)).astype(dtype)
+    samples = np.repeat(samples[:, None], channels, axis=1)
+    return pygame.mixer.Sound(buffer=samples.tobytes())
+
+
+class RingtoneCache:
+    def __init__(self, ringtones_path=RINGTONES_PATH, max_bytes=64 * 1024 * 1024):
+        self.ringtones_path = ringtones_path
+        self.max_bytes = max_bytes
+        # name -> (sound, decoded size, file mtime), least recently used first
+        self._sounds = OrderedDict()
+        self._bytes = 0
+        self._default = None
+        self._lock = threading.Lock()
+
+    def _decoded_size(self, sound):
+        frequency, sample_format, channels = pygame.mixer.get_init()
+        return int(sound.get_length() * frequency) * channels * (abs(sample_format) // 8)
+
+    def get(self, name):
+        """Return the decoded Sound for a ringtone file, or None if it can't be loaded"""
+        if name == DEFAULT_RINGTONE:
+            with self._lock:
+                if self._default is None:
+                    self._default = synthesize_beep()
+                return self._default
+
+        path = os.path.join(self.ringtones_path, name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            entry = self._sounds.get(name)
+            if entry is not None and entry[2] == mtime:
+                self._sounds.move_to_end(name)
+                return entry[0]
+
+        # Decode outside the lock so a prefetch doesn't hold up a cache hit
+        try:
+            sound = pygame.mixer.Sound(path)
+        except pygame.error as e:
+            print(f"Error loading ringtone {name}: {e}")
+            return None
+        size = self._decoded_size(sound)
+
+        with self._lock:
+            old = self._sounds.pop(name, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._sounds[name] = (sound, size, mtime)
+            self._bytes += size
+            # Always keep the newest entry, even if it alone is over budget
+            while self._bytes > self.max_bytes and len(self._sounds) > 1:
+                _, (_, evicted_size, _) = self._sounds.popitem(last=False)
+                self._bytes -= evicted_size
+        return sound
+
+    def prefetch(self, name):
+        """Decode a ringtone into the cache on a background thread"""
+        with self._lock:
+            if name in self._sounds or (name == DEFAULT_RINGTONE and self._default is not None):
+                return
+        threading.Thread(target=self.get, args=(name,), daemon=True).start()
+
+    def clear(self):
+        with self._lock:
+            self._sounds.clear()
+            self._bytes = 0
+
+
+class AudioEngine:
+    def __init__(self, max_voices=4):
+        # At most max_voices sounds play at once; a new one takes over the oldest voice
+        self.max_voices = max_voices
+        pygame.mixer.set_num_channels(max_voices)
+        self._channels = [pygame.mixer.Channel(i) for i in range(max_voices)]
+        # key -> channel, oldest first
+        self._voices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _reap(self):
+        for key, channel in list(self._voices.items()):
+            if not channel.get_busy():
+                del self._voices[key]
+
+    def play(self, key, sound, loops=-1, maxtime=0, volume=1.0):
+        """Play `sound` as the voice for `key` (usually an alarm id), replacing any it had"""
+        with self._lock:
+            old = self._voices.pop(key, None)
+            if old is not None:
+                old.stop()
+            self._reap()
+
+            in_use = set(self._voices.values())
+            channel = next((c for c in self._channels if c not in in_use and not c.get_busy()), None)
+            if channel is None:
+                _, channel = self._voices.popitem(last=False)
+                channel.stop()
+
+            channel.set_volume(volume)
+            channel.play(sound, loops=loops, maxtime=maxtime)
+            self._voices[key] = channel
+
+    def stop(self, key):
+        with self._lock:
+            channel = self._voices.pop(key, None)
+            if channel is not None:
+                channel.stop()
+
+    def stop_all(self):
+        with self._lock:
+            for channel in self._voices.values():
+                channel.stop()
+            self._voices.clear()
+
+    def set_volume(self, volume, key=None):
+        """Set the volume of one voice, or of every voice if key is None"""
+        with self._lock:
+            channels = self._voices.values() if key is None else [self._voices[key]] if key in self._voices else []
+            for channel in channels:
+                channel.set_volume(volume)
+
+    def is_playing(self, key):
+        with self._lock:
+            channel = self._voices.get(key)
+            return channel is not None and channel.get_busy()
@@ -0,0 +1,282 @@
+"""
+Startup benchmark for RingRing
+
+Launches AlarmApp against synthetic alarm files (0, 100 and 5,000 alarms by
+default) and records, for each size:
+  - import time per module (python -X importtime)
+  - time from process start to the Tk mainloop running
+  - time to the first alarm card (or the empty state) being on screen
+  - time to switch the theme, through CustomTkinter's own cascade and through
+    StyleRegistry.apply_theme (widgets on screen, and all widgets)
+  - peak RSS
+
+Each measurement runs in a fresh process with its own data/ folder. On Linux,
+a headless X server (Xvfb) is started when no DISPLAY is set. Results are
+written as JSON so startup regressions can be compared between builds.
+
+Usage:
+  python benchmark_startup.py [--sizes 0,100,5000] [--runs 3] [--output benchmark_results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Modules reported individually from -X importtime; everything else is in the total
+TRACKED_MODULES = [
+    "tkinter", "customtkinter", "numpy", "pygame", "PIL", "pystray",
+    "alarm_store", "occurrence", "storage", "sqlite_storage", "alarm_list",
+    "styles", "scheduler", "audio", "ringtone_library", "ringtone_import", "alarm_io", "engine", "dispatch", "timers",
+    "recurrence", "zones", "control", "metrics", "profiling", "main",
+]
+# Give up on a run that hasn't shown its first card by then
+CHILD_TIMEOUT = 120
+# Theme switches timed each way per run; the median is kept
+THEME_SWITCHES = 4
+
+
+def write_alarms(data_dir, count, seed=1234):
+    """Write a data/alarms.json snapshot with `count` random alarms"""
+    sys.path.insert(0, APP_DIR)
+    from alarm_store import AlarmStore
+
+    rng = random.Random(seed)
+    day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    store = AlarmStore()
+    for i in range(count):
+        days = [day for day in day_names if rng.random() < 0.4]
+        store.add(rng.randrange(24), rng.randrange(60), f"Alarm {i + 1}", days, "Default", rng.random() < 0.8)
+    os.makedirs(data_dir, exist_ok=True)
+    store.save(os.path.join(data_dir, "alarms.json"))
+
+
+def make_workdir(count):
+    """Temporary working directory with assets linked in and a synthetic data/ folder"""
+    workdir = tempfile.mkdtemp(prefix=f"ringring_bench_{count}_")
+    assets = os.path.join(APP_DIR, "assets")
+    if os.path.isdir(assets):
+        try:
+            os.symlink(assets, os.path.join(workdir, "assets"), target_is_directory=True)
+        except OSError:
+            shutil.copytree(assets, os.path.join(workdir, "assets"))
+    write_alarms(os.path.join(workdir, "data"), count)
+    return workdir
+
+
+def start_xvfb():
+    """Start Xvfb on a free display if there is no display yet; returns the process or None"""
+    if sys.platform != "linux" or os.environ.get("DISPLAY"):
+        return None
+    if not shutil.which("Xvfb"):
+        sys.exit("No DISPLAY set and Xvfb not found; install Xvfb (e.g. apt install xvfb)")
+
+    for display in range(99, 200):
+        if os.path.exists(f"/tmp/.X11-unix/X{display}") or os.path.exists(f"/tmp/.X{display}-lock"):
+            continue
+        proc = subprocess.Popen(["Xvfb", f":{display}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            if os.path.exists(f"/tmp/.X11-unix/X{display}"):
+                os.environ["DISPLAY"] = f":{display}"
+                return proc
+            if proc.poll() is not None:
+                break
+            time.sleep(0.05)
+        proc.kill()
+    sys.exit("Could not start Xvfb")
+
+
+def measure_imports(workdir):
+    """Cumulative import time in ms for each tracked module, plus the total for importing main"""
+    env = dict(os.environ, PYTHONPATH=APP_DIR)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=workdir, env=env, capture_output=True, text=True, timeout=CHILD_TIMEOUT)
+    imports = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue
+        module = parts[2].strip()
+        if module in TRACKED_MODULES:
+            imports[module] = round(cumulative / 1000, 2)
+    return imports
+
+
+def run_child(output_path):
+    """Runs inside the benchmark process: start the app and time it"""
+    t0 = time.perf_counter()
+    sys.path.insert(0, APP_DIR)
+    import main
+    t_import = time.perf_counter()
+
+    # A startup failure must fail the run, not wait in the error dialog
+    app = main.AlarmApp(raise_errors=True)
+    t_init = time.perf_counter()
+    timings = {}
+
+    def on_mainloop():
+        timings["mainloop_ms"] = (time.perf_counter() - t0) * 1000
+        poll_first_card()
+
+    def poll_first_card():
+        app.root.update_idletasks()
+        alarm_list = app.alarm_list
+        widgets = list(alarm_list._visible.values())
+        if alarm_list._empty_widget is not None:
+            widgets.append(alarm_list._empty_widget)
+        if any(widget.winfo_ismapped() for widget in widgets):
+            timings["first_card_ms"] = (time.perf_counter() - t0) * 1000
+            timings.update(measure_theme_switch(app))
+            app.root.after(0, app.root.quit)
+        elif time.perf_counter() - t0 > CHILD_TIMEOUT:
+            app.root.quit()
+        else:
+            app.root.after(5, poll_first_card)
+
+    app.root.after(0, on_mainloop)
+    try:
+        app.root.mainloop()
+    finally:
+        app.control.stop()
+        app.engine.close()
+
+    result = {
+        "import_main_ms": (t_import - t0) * 1000,
+        "init_ms": (t_init - t_import) * 1000,
+        "mainloop_ms": timings.get("mainloop_ms"),
+        "first_card_ms": timings.get("first_card_ms"),
+        "theme_cascade_ms": timings.get("theme_cascade_ms"),
+        "theme_batched_ms": timings.get("theme_batched_ms"),
+        "theme_batched_all_ms": timings.get("theme_batched_all_ms"),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+    with open(output_path, "w") as f:
+        json.dump(result, f)
+
+
+def measure_theme_switch(app):
+    """Median ms per theme switch: CustomTkinter's cascade, then apply_theme until on screen and until done"""
+    import customtkinter as ctk
+    root = app.root
+    modes = ["light", "dark"] if ctk.get_appearance_mode().lower() == "dark" else ["dark", "light"]
+    cascade, batched, batched_all = [], [], []
+    for i in range(THEME_SWITCHES * 2):
+        mode = modes[i % 2]
+        start = time.perf_counter()
+        if i < THEME_SWITCHES:
+            ctk.set_appearance_mode(mode)
+            root.update_idletasks()
+            cascade.append((time.perf_counter() - start) * 1000)
+        else:
+            app.styles.apply_theme(mode)
+            batched.append((time.perf_counter() - start) * 1000)
+            # Runs the deferred chunks for hidden widgets too
+            root.update()
+            batched_all.append((time.perf_counter() - start) * 1000)
+    return {
+        "theme_cascade_ms": statistics.median(cascade),
+        "theme_batched_ms": statistics.median(batched),
+        "theme_batched_all_ms": statistics.median(batched_all),
+    }
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_size(count, runs):
+    workdir = make_workdir(count)
+    try:
+        samples = []
+        for _ in range(runs):
+            out_path = os.path.join(workdir, "result.json")
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--child", out_path],
+                           cwd=workdir, timeout=CHILD_TIMEOUT + 30, check=True)
+            with open(out_path) as f:
+                sample = json.load(f)
+            sample["imports_ms"] = measure_imports(workdir)
+            samples.append(sample)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def median(key):
+        values = [sample[key] for sample in samples if sample.get(key) is not None]
+        return round(statistics.median(values), 2) if values else None
+
+    return {
+        "alarms": count,
+        "runs": runs,
+        "import_main_ms": median("import_main_ms"),
+        "init_ms": median("init_ms"),
+        "mainloop_ms": median("mainloop_ms"),
+        "first_card_ms": median("first_card_ms"),
+        "theme_cascade_ms": median("theme_cascade_ms"),
+        "theme_batched_ms": median("theme_batched_ms"),
+        "theme_batched_all_ms": median("theme_batched_all_ms"),
+        "peak_rss_kb": median("peak_rss_kb"),
+        "imports_ms": {module: round(statistics.median(sample["imports_ms"].get(module, 0) for sample in samples), 2)
+                       for module in TRACKED_MODULES if any(module in sample["imports_ms"] for sample in samples)},
+        "samples": samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RingRing startup benchmark")
+    parser.add_argument("--sizes", default="0,100,5000", help="comma-separated alarm counts")
+    parser.add_argument("--runs", type=int, default=3, help="runs per size; medians are reported")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child)
+        return
+
+    xvfb = start_xvfb()
+    try:
+        results = []
+        for count in [int(size) for size in args.sizes.split(",")]:
+            print(f"Benchmarking startup with {count} alarms...")
+            result = run_size(count, args.runs)
+            print(f"  mainloop {result['mainloop_ms']} ms, first card {result['first_card_ms']} ms, "
+                  f"peak RSS {result['peak_rss_kb']} KB")
+            print(f"  theme switch: cascade {result['theme_cascade_ms']} ms, batched {result['theme_batched_ms']} ms "
+                  f"on screen, {result['theme_batched_all_ms']} ms with hidden widgets")
+            results.append(result)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
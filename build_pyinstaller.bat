@@ -6,8 +6,10 @@ echo Installing PyInstaller...
 pip install pyinstaller
 
 echo Building executable...
-pyinstaller --onefile --windowed --icon=assets/logo/app_icon.ico --add-data "assets;assets" --add-data "data;data" --name RingRing main.py
+pyinstaller --onefile --windowed --icon=assets/logo/app_icon.ico --add-data "assets;assets" --add-data "data;data" --collect-data tzdata --name RingRing main.py
+pyinstaller --onefile --console --icon=assets/logo/app_icon.ico --collect-data tzdata --name ringring-cli cli.py
 
 echo Build completed!
 echo Your executable: dist\RingRing.exe
+echo Command line: dist\ringring-cli.exe
 pause
\ No newline at end of file
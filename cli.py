@@ -0,0 +1,220 @@
+"""
+Ring Ring command line
+
+    ringring-cli list [--json]      (python cli.py ... from source)
+    ringring-cli next [--json]
+    ringring-cli add 07:30 [--label TEXT] [--days Mon,Fri] [--ringtone NAME]
+                           [--rrule RULE] [--timezone ZONE] [--disabled]
+    ringring-cli toggle ID [--on | --off]
+    ringring-cli delete ID
+
+When the app is running, commands go through its control endpoint (see
+control.py) so the running scheduler and window stay in charge. Only when no
+instance is running are the alarm files read and written directly, with the
+same storage, recurrence and next-occurrence code the app uses; if the app may
+be running but doesn't answer, the command fails with exit status 1.
+
+Only the standard library and the app's pure-Python modules are imported here:
+no Tk, pygame, PIL, pystray or numpy, so a command takes tens of milliseconds.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from control import ControlError, InstanceLock, NotRunning, request
+
+if getattr(sys, "frozen", False):
+    APP_DIR = os.path.dirname(sys.executable)
+else:
+    APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SETTINGS_PATH = "data/settings.json"
+
+
+class LocalAlarms:
+    """The control operations, run against the data files when no instance is running"""
+
+    def __init__(self):
+        from alarm_store import AlarmStore
+        from zones import ZONES
+
+        try:
+            with open(SETTINGS_PATH, "r") as f:
+                settings = json.load(f)
+        except FileNotFoundError:
+            settings = {}
+
+        self.alarms = AlarmStore()
+        self.sqlite = settings.get("storage", "json") == "sqlite"
+        if self.sqlite:
+            from sqlite_storage import SqliteStorage
+            self.storage = SqliteStorage(self.alarms)
+            settings = self.storage.load_settings()
+        else:
+            from storage import JournalStorage
+            self.storage = JournalStorage(self.alarms)
+        self.storage.load()
+        try:
+            ZONES.set_policy(settings.get("dst_gap_policy"), settings.get("dst_fold_policy"))
+        except ValueError as e:
+            print(f"Error loading DST policy: {e}", file=sys.stderr)
+
+    def close(self):
+        self.storage.close()
+
+    def list(self, args):
+        return [alarm.to_dict() for alarm in self.alarms]
+
+    def next(self, args):
+        from occurrence import next_occurrence
+        now = datetime.now()
+        if self.sqlite:
+            # Index lookups, as in the app
+            upcoming = self.storage.next_alarm(now)
+            if upcoming is None:
+                return None
+            return {"time": upcoming[0].isoformat(), "alarm": self.alarms.get(upcoming[1]["id"]).to_dict()}
+        upcoming = None
+        for alarm in self.alarms:
+            if not alarm.enabled:
+                continue
+            when = next_occurrence(alarm, now)
+            if when is not None and (upcoming is None or when.timestamp() < upcoming[0].timestamp()):
+                upcoming = when, alarm
+        if upcoming is None:
+            return None
+        return {"time": upcoming[0].isoformat(), "alarm": upcoming[1].to_dict()}
+
+    def add(self, args):
+        from alarm_io import parse_days, parse_time, validate
+        hour, minute = parse_time(args["time"])
+        record = validate(hour, minute, args.get("label"), parse_days(args.get("days") or ""), args.get("ringtone"),
+                          args.get("enabled", True), args.get("rrule"), args.get("dtstart"), args.get("timezone"))
+        alarm = self.alarms.add(record["hour"], record["minute"], record["label"], record["days"], record["ringtone"],
+                                record["enabled"], rrule=record["rrule"], dtstart=record["dtstart"],
+                                timezone=record["timezone"])
+        self.storage.put(alarm)
+        return alarm.to_dict()
+
+    def toggle(self, args):
+        alarm = self.alarms.get(args["id"])
+        if alarm is None:
+            raise ValueError(f"no alarm {args['id']}")
+        alarm = self.alarms.set_enabled(alarm.id, args.get("enabled", not alarm.enabled))
+        self.storage.put(alarm)
+        return alarm.to_dict()
+
+    def delete(self, args):
+        if args["id"] not in self.alarms:
+            raise ValueError(f"no alarm {args['id']}")
+        self.alarms.remove(args["id"])
+        self.storage.delete(args["id"])
+        return {"id": args["id"]}
+
+
+def run(op, args):
+    """Result of an operation, from the running app if there is one, else from the files"""
+    # Holding the instance lock keeps the app from starting while the files are edited
+    lock = InstanceLock()
+    if not lock.acquire():
+        try:
+            return request(op, args)
+        except NotRunning:
+            raise ControlError("Ring Ring is starting up; try again in a moment") from None
+    try:
+        local = LocalAlarms()
+        try:
+            return getattr(local, op)(args)
+        finally:
+            local.close()
+    finally:
+        lock.release()
+
+
+def describe(alarm):
+    if alarm.get("rrule"):
+        from recurrence import describe_rrule
+        repeat = describe_rrule(alarm["rrule"])
+    elif alarm.get("days"):
+        repeat = ",".join(alarm["days"])
+    else:
+        repeat = "once"
+    if alarm.get("timezone"):
+        repeat += f" ({alarm['timezone']})"
+    return f"{alarm['id']:>4}  {alarm['hour']:02d}:{alarm['minute']:02d}  {'on ' if alarm['enabled'] else 'off'}  {repeat:<28}  {alarm['label']}"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="ringring-cli", description="Manage Ring Ring alarms from the command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, text in (("list", "show all alarms"), ("next", "show the next alarm to ring")):
+        command = commands.add_parser(name, help=text)
+        command.add_argument("--json", action="store_true", help="print JSON")
+
+    add = commands.add_parser("add", help="add an alarm")
+    add.add_argument("time", help="07:30, 7:30 PM or 19:30")
+    add.add_argument("--label")
+    add.add_argument("--days", help="e.g. Mon,Wed,Fri; leave out for a one-time alarm")
+    add.add_argument("--ringtone")
+    add.add_argument("--rrule", help="iCalendar rule, e.g. FREQ=WEEKLY;INTERVAL=2;BYDAY=MO")
+    add.add_argument("--timezone", help="IANA zone the time is in, e.g. Europe/London")
+    add.add_argument("--disabled", action="store_true", help="add it switched off")
+    add.add_argument("--json", action="store_true", help="print JSON")
+
+    toggle = commands.add_parser("toggle", help="switch an alarm on or off")
+    toggle.add_argument("id", type=int)
+    state = toggle.add_mutually_exclusive_group()
+    state.add_argument("--on", dest="enabled", action="store_const", const=True)
+    state.add_argument("--off", dest="enabled", action="store_const", const=False)
+
+    delete = commands.add_parser("delete", help="delete an alarm")
+    delete.add_argument("id", type=int)
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    # Data paths are relative to the app folder, as in the app itself
+    os.chdir(APP_DIR)
+
+    args = {}
+    if options.command == "add":
+        args = {"time": options.time, "label": options.label, "days": options.days, "ringtone": options.ringtone,
+                "rrule": options.rrule, "timezone": options.timezone, "enabled": not options.disabled}
+        if options.rrule:
+            args["dtstart"] = datetime.now().date().isoformat()
+    elif options.command == "toggle":
+        args = {"id": options.id}
+        if options.enabled is not None:
+            args["enabled"] = options.enabled
+    elif options.command == "delete":
+        args = {"id": options.id}
+
+    try:
+        result = run(options.command, args)
+    except (ControlError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if getattr(options, "json", False):
+        print(json.dumps(result, indent=2))
+    elif options.command == "list":
+        for alarm in result:
+            print(describe(alarm))
+    elif options.command == "next":
+        if result is None:
+            print("No upcoming alarms")
+        else:
+            when = datetime.fromisoformat(result["time"])
+            print(f"{when:%a %Y-%m-%d %H:%M}  {result['alarm']['label']}")
+    elif options.command == "delete":
+        print(f"Deleted alarm {result['id']}")
+    else:
+        print(describe(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
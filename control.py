@@ -0,0 +1,326 @@
+"""
+Local control endpoint and single-instance check
+
+The running app serves a small JSON protocol on a loopback-only TCP port, from
+an asyncio loop on its own thread. The port and a random token are written to
+data/instance.json (readable only by the user where the OS allows it); every
+request must carry the token. One request per line, one response per line:
+
+  {"token": "...", "op": "add", "args": {"time": "07:30", "days": "Mon,Fri"}}
+  {"ok": true, "result": {...}}   or   {"ok": false, "error": "..."}
+
+Operations: ping, list, next, add, toggle, delete, show.
+
+Only one instance runs at a time: it holds an OS lock on data/instance.lock
+from before anything is built until it exits. A launch that can't take the
+lock hands its request to the holder (claim_instance) and exits, so two
+launches at the same moment never both start a scheduler. The client side
+(request, claim_instance) uses only a plain socket, without importing asyncio,
+Tk or pygame.
+"""
+import json
+import os
+import socket
+import threading
+import time
+
+INSTANCE_PATH = "data/instance.json"
+LOCK_PATH = "data/instance.lock"
+HOST = "127.0.0.1"
+# How long a client waits for the running instance before assuming there is none
+CLIENT_TIMEOUT = 2.0
+# How long a launch keeps trying to reach an instance that holds the lock but is still starting
+STARTUP_WAIT = 15.0
+MAX_REQUEST = 64 * 1024
+
+
+class NotRunning(Exception):
+    """No instance is listening: no instance file, or nothing on its port"""
+
+
+class ControlError(Exception):
+    """The running instance rejected a request, or didn't answer it"""
+
+
+def read_instance(path=INSTANCE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            instance = json.load(f)
+        return instance if isinstance(instance.get("port"), int) and instance.get("token") else None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def request(op, args=None, path=INSTANCE_PATH, timeout=CLIENT_TIMEOUT):
+    """
+    Send one operation to the running instance and return its result. Raises
+    NotRunning only when there is certainly no instance, and ControlError when
+    one may be running but the request failed, so callers never act on the
+    data files behind a live app's back.
+    """
+    instance = read_instance(path)
+    if instance is None:
+        raise NotRunning()
+    message = json.dumps({"token": instance["token"], "op": op, "args": args or {}}) + "\n"
+    try:
+        sock = socket.create_connection((HOST, instance["port"]), timeout=timeout)
+    except ConnectionRefusedError as e:
+        # Left behind by an instance that didn't shut down cleanly
+        raise NotRunning() from e
+    except OSError as e:
+        raise ControlError(f"could not reach the running instance: {e}") from e
+    try:
+        with sock:
+            sock.sendall(message.encode("utf-8"))
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        response = json.loads(data)
+    except socket.timeout as e:
+        raise ControlError("the running instance did not answer in time") from e
+    except (OSError, ValueError) as e:
+        raise ControlError(f"no valid answer from the running instance: {e}") from e
+    if not isinstance(response, dict) or "ok" not in response:
+        raise ControlError("no valid answer from the running instance")
+    if not response["ok"]:
+        raise ControlError(response.get("error", "request failed"))
+    return response.get("result")
+
+
+class InstanceLock:
+    """
+    Exclusive lock held by the running app, and by the command line while it
+    edits the data files. The OS drops it when the process exits, even after a
+    crash, so a leftover file never blocks a start.
+    """
+
+    def __init__(self, path=LOCK_PATH):
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        """Take the lock without waiting; False if another process holds it"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        if os.name == "nt":
+            import msvcrt
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        # Closing drops a flock
+        os.close(self._fd)
+        self._fd = None
+
+
+def claim_instance(op="show", args=None, wait=STARTUP_WAIT, path=LOCK_PATH):
+    """
+    Take the single-instance lock, or hand `op` to the instance that holds it.
+    Returns the held InstanceLock if this launch should run, None if it should exit.
+    """
+    lock = InstanceLock(path)
+    deadline = time.monotonic() + wait
+    while True:
+        if lock.acquire():
+            return lock
+        try:
+            request(op, args)
+            return None
+        except NotRunning:
+            # The holder hasn't started serving yet, or is a command line edit about to finish
+            pass
+        except ControlError as e:
+            print(f"Error from running instance: {e}")
+            return None
+        if time.monotonic() >= deadline:
+            print("Ring Ring is already starting; not opening a second instance")
+            return None
+        time.sleep(0.1)
+
+
+class ControlServer:
+    def __init__(self, engine, on_change=None, on_show=None, path=INSTANCE_PATH):
+        # Imported here, with asyncio in _run, so clients don't pay for them
+        import secrets
+        self._compare_digest = secrets.compare_digest
+        self.engine = engine
+        # on_change() after an operation changed the alarms, on_show() for "show";
+        # both are called from a worker thread
+        self.on_change = on_change
+        self.on_show = on_show
+        self.path = path
+        self.token = secrets.token_hex(16)
+        self.port = None
+        self._loop = None
+        self._thread = None
+        self._ops = {
+            "ping": self.op_ping,
+            "list": self.op_list,
+            "next": self.op_next,
+            "add": self.op_add,
+            "toggle": self.op_toggle,
+            "delete": self.op_delete,
+            "show": self.op_show,
+        }
+
+    def start(self):
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="ControlServer", daemon=True)
+        self._thread.start()
+        ready.wait(5)
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        # Leave the file alone if another instance has taken over since
+        instance = read_instance(self.path)
+        if instance is not None and instance["token"] == self.token:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _run(self, ready):
+        import asyncio
+        loop = self._loop = asyncio.new_event_loop()
+        try:
+            server = loop.run_until_complete(asyncio.start_server(self._handle, HOST, 0, limit=MAX_REQUEST))
+            self.port = server.sockets[0].getsockname()[1]
+            self._write_instance()
+        except OSError as e:
+            print(f"Error starting control server: {e}")
+            self._loop = None
+            loop.close()
+            return
+        finally:
+            ready.set()
+
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.close()
+
+    def _write_instance(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"port": self.port, "token": self.token, "pid": os.getpid()}, f)
+        os.replace(tmp_path, self.path)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self._respond(line)
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # Dropped connections and over-long lines just end the session
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line):
+        try:
+            message = json.loads(line)
+            token, op, args = str(message.get("token", "")), message.get("op"), message.get("args") or {}
+        except (ValueError, AttributeError):
+            return {"ok": False, "error": "bad request"}
+        if not self._compare_digest(token, self.token):
+            return {"ok": False, "error": "bad token"}
+        handler = self._ops.get(op)
+        if handler is None:
+            return {"ok": False, "error": f"unknown operation {op!r}"}
+        # Engine calls can touch the disk, so they run off the event loop
+        try:
+            result = await self._loop.run_in_executor(None, handler, args)
+        except KeyError as e:
+            return {"ok": False, "error": f"missing argument {e}"}
+        except (AttributeError, TypeError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            # E.g. a failed write; the client must hear about it rather than see the connection drop
+            print(f"Error handling control request {op!r}: {e}")
+            return {"ok": False, "error": f"{op} failed: {e}"}
+        return {"ok": True, "result": result}
+
+    # Operations
+
+    def op_ping(self, args):
+        return {"pid": os.getpid()}
+
+    def op_list(self, args):
+        return [alarm.to_dict() for alarm in self.engine.alarms]
+
+    def op_next(self, args):
+        upcoming = self.engine.next_alarm()
+        if upcoming is None:
+            return None
+        when, alarm = upcoming
+        return {"time": when.isoformat(), "alarm": alarm.to_dict()}
+
+    def op_add(self, args):
+        """args: time ("07:30") or hour and minute; optional label, days, ringtone, enabled, rrule, dtstart, timezone"""
+        from alarm_io import parse_days, parse_time, validate
+        if "time" in args:
+            hour, minute = parse_time(str(args["time"]))
+        else:
+            hour, minute = int(args["hour"]), int(args["minute"])
+        days = args.get("days") or []
+        if isinstance(days, str):
+            days = parse_days(days)
+        else:
+            days = parse_days(" ".join(days))
+        record = validate(hour, minute, args.get("label"), days, args.get("ringtone"), bool(args.get("enabled", True)),
+                          args.get("rrule"), args.get("dtstart"), args.get("timezone"))
+        alarm = self.engine.add_alarms([record])[0]
+        self._changed()
+        return alarm.to_dict()
+
+    def op_toggle(self, args):
+        """args: id, and enabled (flips the alarm when left out)"""
+        alarm = self.engine.alarms.get(int(args["id"]))
+        if alarm is None:
+            raise ValueError(f"no alarm {args['id']}")
+        alarm = self.engine.set_enabled(alarm.id, bool(args.get("enabled", not alarm.enabled)))
+        self._changed()
+        return alarm.to_dict()
+
+    def op_delete(self, args):
+        alarm_id = int(args["id"])
+        if alarm_id not in self.engine.alarms:
+            raise ValueError(f"no alarm {alarm_id}")
+        self.engine.delete_alarm(alarm_id)
+        self._changed()
+        return {"id": alarm_id}
+
+    def op_show(self, args):
+        if self.on_show is not None:
+            self.on_show()
+        return None
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
@@ -0,0 +1,80 @@
+"""
+Hand work from background threads to the Tk thread
+
+Tk widgets may only be touched from the thread running the main loop, but
+alarms fire on the scheduler thread, ringtone scans and imports report from
+worker threads, and the control server and tray icon call in from theirs.
+Those threads post callbacks here; posting is a put on a SimpleQueue, so it
+never blocks on the UI. The Tk thread drains the queue in batches from
+root.after, and of several callbacks posted with the same key in one batch only
+the newest runs, so a burst of list or progress refreshes costs one redraw.
+(Periodic UI work such as the countdown runs on the main loop already; see
+timers.py.)
+
+The queue outlives any one window: while tray-only mode has no Tk root, posted
+callbacks wait until the next window attaches. Callbacks left in a batch when
+one of them tears the window down are held aside and run first on the next
+attach, ahead of anything posted since.
+"""
+import queue
+from collections import deque
+
+
+class UIDispatcher:
+    def __init__(self, interval_ms=50, max_batch=500):
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        # Left over from a batch cut short by a teardown; only touched on the Tk thread
+        self._held = deque()
+        self._root = None
+        self._after_id = None
+
+    def attach(self, root):
+        """Start draining on `root`'s main loop; call from the Tk thread"""
+        self._root = root
+        self._schedule()
+
+    def detach(self):
+        """Stop draining, e.g. before the root is destroyed; call from the Tk thread"""
+        if self._root is not None and self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._root = None
+        self._after_id = None
+
+    def post(self, callback, *args, key=None):
+        """Run callback(*args) on the Tk thread; safe to call from any thread"""
+        self._queue.put((key, callback, args))
+
+    def _schedule(self):
+        self._after_id = self._root.after(self.interval_ms, self._drain)
+
+    def _drain(self):
+        root = self._root
+        batch = list(self._held)
+        self._held.clear()
+        try:
+            while len(batch) < self.max_batch:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+
+        # Only the newest event per key runs
+        newest = {key: i for i, (key, _, _) in enumerate(batch) if key is not None}
+        for i, (key, callback, args) in enumerate(batch):
+            if self._root is not root:
+                # A callback tore the window down; keep the rest, in order, for the next one
+                self._held.extend(batch[i:])
+                break
+            if key is not None and newest[key] != i:
+                continue
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error in UI callback {getattr(callback, '__name__', callback)}: {e}")
+
+        if self._root is root:
+            self._schedule()
@@ -0,0 +1,332 @@
+"""
+GUI-independent alarm engine
+
+AlarmEngine owns everything that has to keep working while no window exists:
+the alarm store and its persistence, the occurrence index, the scheduler
+thread, the audio engine, the ringtone library and the settings. The Tk UI in
+main.py is a view on top of it and can be torn down and rebuilt (tray-only
+mode) without losing alarms, scheduling or a ringing alarm.
+
+Nothing here touches Tk. on_fire(alarm, scheduled) is called from the
+scheduler thread after an alarm's sound has started.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from alarm_store import AlarmStore
+from metrics import AUDIO_START, LOAD_ALARMS, METRICS
+from occurrence import OccurrenceIndex
+from profiling import PROFILER, requested_by_environment
+from recurrence import OCCURRENCES
+from ringtone_import import RingtoneImporter
+from ringtone_library import RingtoneLibrary
+from scheduler import AlarmScheduler, CATCH_UP_COALESCE
+from sqlite_storage import SqliteStorage
+from storage import JournalStorage
+from zones import FOLD_FIRST, GAP_SHIFT, ZONES
+
+SETTINGS_PATH = "data/settings.json"
+# Alarms that can ring at the same time, each on its own mixer channel
+MAX_ALARM_VOICES = 4
+# Longest a caller waits for the mixer to finish initializing in the background
+AUDIO_INIT_TIMEOUT = 10
+SNOOZE_MINUTES = 5
+
+
+class AlarmEngine:
+    def __init__(self, on_fire=None, on_ringtones_changed=None):
+        self.on_fire = on_fire
+        # Called from a worker thread after a library scan found changes
+        self.on_ringtones_changed = on_ringtones_changed
+        self.alarms = AlarmStore()
+        # Alarm changes come from the UI thread and the control server's workers
+        self.lock = threading.RLock()
+        self.occurrence_index = OccurrenceIndex()
+        self.running_alarms = {}
+
+        # pygame is imported and the mixer started in the background
+        self.audio = None
+        self.ringtone_cache = None
+        self.audio_ready = threading.Event()
+        threading.Thread(target=self.init_audio, daemon=True).start()
+
+        # The saved index is enough to list ringtones; scans run in the background
+        self.ringtones = RingtoneLibrary()
+        self.ringtones.load()
+        self._scanning = threading.Lock()
+        self.importer = RingtoneImporter(self.ringtones)
+
+        self.load_settings()
+        if self.profiling or requested_by_environment():
+            PROFILER.start()
+            PROFILER.instrument(self.storage, "load", "put", "put_many", "delete", "compact")
+        self.load_alarms()
+        # One pass of the scheduler loop: what is due, a rebuild after changes, and firing
+        PROFILER.instrument(self, "fire")
+        self.scheduler = AlarmScheduler(lambda: self.alarms, self.fire, self.catch_up_policy, self.catch_up_minutes)
+        PROFILER.instrument(self.scheduler, "_pop_due", "_rebuild")
+
+    def start(self):
+        self.scheduler.start()
+        self.rescan_ringtones()
+
+    def close(self):
+        self.scheduler.stop()
+        self.save_settings()
+        self.storage.close()
+        if self.audio is not None:
+            self.audio.stop_all()
+        PROFILER.stop()
+
+    # Settings
+
+    def create_storage(self, backend):
+        self.storage_backend = backend
+        if backend == "sqlite":
+            # Migrates data/alarms.json and data/settings.json on first use
+            self.storage = SqliteStorage(self.alarms)
+        else:
+            self.storage = JournalStorage(self.alarms)
+
+    def load_settings(self):
+        try:
+            with open(SETTINGS_PATH, "r") as f:
+                settings = json.load(f)
+        except FileNotFoundError:
+            settings = {}
+
+        # settings.json picks the storage backend; with SQLite everything else lives in the database
+        self.create_storage(settings.get("storage", "json"))
+        if self.storage_backend == "sqlite":
+            settings = self.storage.load_settings()
+
+        self.theme = settings.get("theme", "dark")
+        self.volume = settings.get("volume", 0.7)
+        self.catch_up_policy = settings.get("catch_up_policy", CATCH_UP_COALESCE)
+        self.catch_up_minutes = settings.get("catch_up_minutes", 10)
+        self.tray_only = settings.get("tray_only", False)
+        # What alarms do in the hour skipped or repeated by a daylight-saving change
+        self.dst_gap_policy = settings.get("dst_gap_policy", GAP_SHIFT)
+        self.dst_fold_policy = settings.get("dst_fold_policy", FOLD_FIRST)
+        # Write CPU and memory profiles to data/profiles (see profiling.py); read at startup
+        self.profiling = settings.get("profiling", False)
+        try:
+            ZONES.set_policy(self.dst_gap_policy, self.dst_fold_policy)
+        except ValueError as e:
+            print(f"Error loading DST policy: {e}")
+
+    def save_settings(self):
+        settings = {
+            "theme": self.theme,
+            "volume": self.volume,
+            "catch_up_policy": self.catch_up_policy,
+            "catch_up_minutes": self.catch_up_minutes,
+            "tray_only": self.tray_only,
+            "dst_gap_policy": self.dst_gap_policy,
+            "dst_fold_policy": self.dst_fold_policy,
+            "profiling": self.profiling,
+        }
+        if self.storage_backend == "sqlite":
+            self.storage.save_settings(settings)
+            settings = {"storage": "sqlite"}
+        os.makedirs(os.path.dirname(SETTINGS_PATH), exist_ok=True)
+        with open(SETTINGS_PATH, "w") as f:
+            json.dump(settings, f, indent=2)
+
+    def set_volume(self, volume):
+        self.volume = volume
+        if self.audio is not None:
+            self.audio.set_volume(volume)
+
+    def set_catch_up_policy(self, policy):
+        self.catch_up_policy = policy
+        self.scheduler.set_catch_up_policy(policy, self.catch_up_minutes)
+
+    def set_dst_policy(self, gap_policy=None, fold_policy=None):
+        ZONES.set_policy(gap_policy, fold_policy)
+        self.dst_gap_policy = ZONES.gap_policy
+        self.dst_fold_policy = ZONES.fold_policy
+        self.scheduler.reschedule()
+
+    # Alarms
+
+    def load_alarms(self):
+        # Snapshot plus journal replay
+        with METRICS.timer(LOAD_ALARMS):
+            self.storage.load()
+        self.occurrence_index.rebuild(self.alarms.slots())
+
+    def _changed(self, alarm_ids):
+        for alarm_id in alarm_ids:
+            slot = self.alarms.slot(alarm_id)
+            if slot is not None:
+                self.occurrence_index.set(slot, self.alarms.get(alarm_id))
+        self.scheduler.reschedule(alarm_ids)
+
+    def add_alarm(self, hour, minute, label, days=(), ringtone="Default", snooze_of=None, rrule=None, dtstart=None,
+                  timezone=None):
+        with self.lock:
+            alarm = self.alarms.add(hour, minute, label, days, ringtone, snooze_of=snooze_of, rrule=rrule, dtstart=dtstart,
+                                    timezone=timezone)
+            self.storage.put(alarm)
+            self._changed([alarm.id])
+            return alarm
+
+    def add_alarms(self, records):
+        """Add alarm dicts (as read by alarm_io) in one batch: one persistence write, one reschedule"""
+        with self.lock:
+            alarms = []
+            try:
+                for record in records:
+                    alarms.append(self.alarms.add(record["hour"], record["minute"], record["label"], record["days"],
+                                                  record["ringtone"], record["enabled"],
+                                                  rrule=record.get("rrule"), dtstart=record.get("dtstart"),
+                                                  timezone=record.get("timezone")))
+            finally:
+                # Whatever was added before a read error is still saved
+                self.storage.put_many(alarms)
+                self._changed([alarm.id for alarm in alarms])
+            return alarms
+
+    def set_enabled(self, alarm_id, enabled):
+        with self.lock:
+            alarm = self.alarms.set_enabled(alarm_id, enabled)
+            if alarm is not None:
+                self.storage.put(alarm)
+            self._changed([alarm_id])
+            return alarm
+
+    def delete_alarm(self, alarm_id):
+        with self.lock:
+            slot = self.alarms.slot(alarm_id)
+            if slot is not None:
+                self.occurrence_index.clear(slot)
+            self.alarms.remove(alarm_id)
+            self.storage.delete(alarm_id)
+            OCCURRENCES.forget(alarm_id)
+            self._changed([alarm_id])
+
+    def next_alarm(self, now=None):
+        """(fire time, alarm) of the next alarm to ring, or None"""
+        now = now or datetime.now()
+        if self.storage_backend == "sqlite":
+            # Index lookups in the database rather than a pass over every alarm
+            upcoming = self.storage.next_alarm(now)
+            if upcoming is None:
+                return None
+            alarm = self.alarms.get(upcoming[1]["id"])
+            return (upcoming[0], alarm) if alarm is not None else None
+        return self.occurrence_index.next_alarm(now)
+
+    def alarms_due_at(self, when):
+        """Enabled alarms that ring in `when`'s minute"""
+        if self.storage_backend == "sqlite":
+            due = (self.alarms.get(data["id"]) for data in self.storage.alarms_due_at(when))
+            return [alarm for alarm in due if alarm is not None]
+        return self.occurrence_index.due_at(when)
+
+    # Ringing
+
+    def fire(self, alarm, scheduled=None):
+        # Called from the scheduler thread when an alarm's deadline is reached;
+        # how late it was is kept in self.scheduler.fire_log
+        if alarm.id in self.running_alarms:
+            return
+        self.running_alarms[alarm.id] = True
+        # Time to sound, apart from how late the scheduler was
+        start = time.perf_counter()
+        if self.play_sound(alarm.ringtone, alarm_id=alarm.id):
+            METRICS.record(AUDIO_START, (time.perf_counter() - start) * 1000)
+        if self.on_fire is not None:
+            self.on_fire(alarm, scheduled)
+
+    def finish_alarm(self, alarm_id):
+        """Stop a ringing alarm; returns True if it was a snooze and has been removed"""
+        if self.audio is not None:
+            self.audio.stop(alarm_id)
+        self.running_alarms.pop(alarm_id, None)
+
+        # Snoozes only ring once
+        alarm = self.alarms.get(alarm_id)
+        if alarm is not None and alarm.snooze_of is not None:
+            self.delete_alarm(alarm_id)
+            return True
+        return False
+
+    def snooze_alarm(self, alarm, minutes=SNOOZE_MINUTES):
+        """Stop a ringing alarm and add a one-off snooze alarm; returns the snooze"""
+        self.finish_alarm(alarm.id)
+        snooze_time = datetime.now() + timedelta(minutes=minutes)
+        snooze_of = alarm.snooze_of if alarm.snooze_of is not None else alarm.id
+        label = alarm.label if alarm.label.startswith("Snooze: ") else f"Snooze: {alarm.label}"
+        return self.add_alarm(snooze_time.hour, snooze_time.minute, label, [], alarm.ringtone, snooze_of=snooze_of)
+
+    # Audio
+
+    def init_audio(self):
+        try:
+            import pygame
+            from audio import AudioEngine, RingtoneCache
+            pygame.mixer.init()
+            self.ringtone_cache = RingtoneCache()
+            self.audio = AudioEngine(max_voices=MAX_ALARM_VOICES)
+        except Exception as e:
+            print(f"Error initializing audio: {e}")
+        finally:
+            self.audio_ready.set()
+
+    def play_sound(self, ringtone, test=False, alarm_id=None):
+        """Start a ringtone; True if it is playing"""
+        try:
+            # An alarm due right at startup may arrive before the mixer is up
+            if not self.audio_ready.wait(AUDIO_INIT_TIMEOUT) or self.audio is None:
+                return False
+            # Usually already decoded by prefetch_ringtone;
+            # "Default" is a synthesized beep cycle that loops like any ringtone
+            sound = self.ringtone_cache.get(ringtone)
+            if sound is None:
+                return False
+            # Each running alarm has its own voice, keyed like running_alarms
+            if test:
+                self.audio.play("test", sound, loops=-1, maxtime=3000, volume=self.volume)
+            else:
+                self.audio.play(alarm_id, sound, loops=-1, volume=self.volume)
+            return True
+        except Exception as e:
+            print(f"Error playing sound: {e}")
+            return False
+
+    def rescan_ringtones(self):
+        """Update the ringtone index on a worker thread, unless a scan is already running"""
+        if self._scanning.acquire(blocking=False):
+            threading.Thread(target=self._scan_ringtones, daemon=True).start()
+
+    def _scan_ringtones(self):
+        try:
+            # Probing decodes new files, which needs the mixer
+            self.audio_ready.wait(AUDIO_INIT_TIMEOUT)
+            changed = self.ringtones.scan()
+        except Exception as e:
+            print(f"Error scanning ringtones: {e}")
+            changed = False
+        finally:
+            self._scanning.release()
+        if changed and self.on_ringtones_changed is not None:
+            self.on_ringtones_changed()
+
+    def import_ringtone(self, source, on_progress=None, on_done=None):
+        """Copy a ringtone into the library on a worker thread; see RingtoneImporter.start"""
+        def done(status, name):
+            if on_done is not None:
+                on_done(status, name)
+            if self.on_ringtones_changed is not None:
+                self.on_ringtones_changed()
+
+        return self.importer.start(source, on_progress, done)
+
+    def prefetch_ringtone(self, ringtone):
+        if self.ringtone_cache is not None:
+            self.ringtone_cache.prefetch(ringtone)
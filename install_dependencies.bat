@@ -9,6 +9,8 @@ pip install customtkinter==5.2.0
 pip install pygame==2.5.2
 pip install Pillow==10.0.1
 pip install pystray==0.19.4
+pip install numpy==1.26.4
+pip install tzdata==2024.1
 
 echo.
 echo Testing installation...
@@ -1,19 +1,44 @@
+import sys
+
+# Take the single-instance lock before paying for Tk and pygame; a second
+# launch, even one started at the same moment, hands over and exits
+if __name__ == "__main__":
+    from control import claim_instance
+    # Held until the process exits
+    instance_lock = claim_instance("show")
+    if instance_lock is None:
+        sys.exit(0)
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import customtkinter as ctk
 from datetime import datetime, timedelta
 import threading
 import time
-import pygame
-import json
 import os
-from PIL import Image, ImageTk
-import pystray
-from pystray import MenuItem as item
-import sys
 import traceback
 import logging
-import webbrowser
+# pygame (via audio), PIL, pystray and webbrowser are imported on first use to keep startup fast
+from engine import AlarmEngine
+from control import ControlServer
+from alarm_io import InvalidAlarm, parse_rrule, read_alarms, write_alarms
+from dispatch import UIDispatcher
+from timers import TimerHeap
+from alarm_list import VirtualAlarmList
+from metrics import DESCRIPTIONS, METRICS, POPUP_VISIBLE, REFRESH_ALARMS_LIST
+from profiling import PROFILE_DIR, PROFILER
+from recurrence import describe_rrule
+from styles import StyleRegistry
+from scheduler import CATCH_UP_FIRE_LATE, CATCH_UP_COALESCE, CATCH_UP_DROP
+from occurrence import seconds_until
+from zones import FOLD_BOTH, FOLD_FIRST, FOLD_SECOND, GAP_SHIFT, GAP_SKIP, get_zone
+
+# Card height plus vertical padding is one row of the virtual alarm list
+ALARM_CARD_HEIGHT = 140
+ALARM_CARD_PADDING = 8
+# Decode the next alarm's ringtone this long before it is due
+RINGTONE_PREFETCH_WINDOW = timedelta(minutes=5)
+RINGTONE_RESCAN_INTERVAL = 300
 
 def setup_logging():
     logging.basicConfig(filename='error.log', level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -46,55 +71,84 @@ def show_error_dialog(error_msg, full_traceback):
     close_btn.pack(side="left", padx=10)
 
 class AlarmApp:
-    def __init__(self):
+    def __init__(self, raise_errors=False):
+        # raise_errors: let a startup failure propagate instead of showing the error dialog (benchmarks, scripts)
         try:
             setup_logging()
-            pygame.mixer.init()
             
-            # Windows 11 style colors
-            ctk.set_appearance_mode("dark")
-            ctk.set_default_color_theme("blue")
-            
-            self.root = ctk.CTk()
-            self.root.title("Ring Ring")
-            self.root.geometry("1000x750")
-            self.root.minsize(900, 650)
-            
-            # Windows 11 style - rounded corners effect
-            self.root.configure(corner_radius=12)
-            
-            try:
-                self.root.iconbitmap("assets/logo/app_icon.ico")
-            except:
-                pass
+            # Alarms, storage, scheduling and audio keep running without a window
+            self.engine = AlarmEngine(on_fire=self.on_alarm_fired, on_ringtones_changed=self.on_ringtones_changed)
+            self.alarms = self.engine.alarms
+            # Background threads hand Tk work to the main loop through this
+            self.dispatcher = UIDispatcher()
+            # All periodic UI work shares one main-loop timer
+            self.timers = TimerHeap()
             
-            self.alarms = []
-            self.running_alarms = {}
+            self.root = None
+            self.window_open = False
+            self.window_lock = threading.Lock()
+            self.pending_popups = []
             self.is_minimized = False
+            self.quitting = False
             self.tray_icon = None
             
-            self.load_settings()
-            self.create_ui()
-            self.load_alarms()
-            
-            self.alarm_thread = threading.Thread(target=self.check_alarms, daemon=True)
-            self.alarm_thread.start()
+            # Windows 11 style colors
+            ctk.set_appearance_mode(self.engine.theme)
+            ctk.set_default_color_theme("blue")
             
-            # Start countdown update thread
-            self.countdown_thread = threading.Thread(target=self.countdown_updater, daemon=True)
-            self.countdown_thread.start()
+            # Only wrapped when profiling is on; see profiling.py
+            PROFILER.instrument(self, "create_alarm_widget", "bind_alarm_widget", "refresh_alarms_list", "get_next_alarm")
+            self.build_window()
+            self.engine.start()
+            # Local endpoint for scripts and later launches; see control.py
+            self.control = ControlServer(self.engine, on_change=self.on_alarms_changed, on_show=self.show_from_tray)
+            self.control.start()
             
-            self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+            # Countdown ticks exactly on the minute
+            self.timers.every(60, self.update_countdown, align=True)
+            self.timers.every(60, self.prefetch_next_ringtone, align=True, run_now=True)
+            # Pick up ringtones added to or removed from the folder by hand
+            self.timers.every(RINGTONE_RESCAN_INTERVAL, self.engine.rescan_ringtones)
         except Exception as e:
             error_msg = str(e)
             full_traceback = traceback.format_exc()
             logging.error(f"Initialization error: {error_msg}\n{full_traceback}")
+            if raise_errors:
+                raise
             
             root = tk.Tk()
             root.withdraw()
             show_error_dialog(error_msg, full_traceback)
             root.mainloop()
     
+    def build_window(self):
+        # Also used to bring the window back after tray-only mode destroyed it
+        self.root = ctk.CTk()
+        self.root.title("Ring Ring")
+        self.root.geometry("1000x750")
+        self.root.minsize(900, 650)
+        
+        # Windows 11 style - rounded corners effect
+        self.root.configure(corner_radius=12)
+        
+        try:
+            self.root.iconbitmap("assets/logo/app_icon.ico")
+        except:
+            pass
+        
+        # Fonts belong to a Tk root, so each window gets its own registry
+        self.styles = StyleRegistry(self.root)
+        self.create_ui()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.dispatcher.attach(self.root)
+        self.timers.attach(self.root)
+        
+        with self.window_lock:
+            self.window_open = True
+            pending, self.pending_popups = self.pending_popups, []
+        for alarm, scheduled in pending:
+            self.show_alarm_popup(alarm, scheduled)
+    
     def create_ui(self):
         # Windows 11 style main container
         main_container = ctk.CTkFrame(self.root, corner_radius=0, fg_color="transparent")
@@ -109,11 +163,11 @@ class AlarmApp:
         header_content = ctk.CTkFrame(header_frame, fg_color="transparent")
         header_content.pack(fill="both", expand=True, padx=30, pady=15)
         
-        title_label = ctk.CTkLabel(header_content, text="Ring Ring", font=ctk.CTkFont(size=28, weight="bold"))
+        title_label = ctk.CTkLabel(header_content, text="Ring Ring", font=self.styles.font(28, "bold"))
         title_label.pack(side="left")
         
         # Countdown timer for next alarm
-        self.countdown_label = ctk.CTkLabel(header_content, text="", font=ctk.CTkFont(size=14))
+        self.countdown_label = ctk.CTkLabel(header_content, text="", font=self.styles.font(14))
         self.countdown_label.pack(side="left", padx=(30, 0))
         
         # Windows 11 style theme toggle
@@ -123,12 +177,14 @@ class AlarmApp:
         self.theme_switch = ctk.CTkSwitch(
             theme_container, 
             text="Dark Mode", 
-            font=ctk.CTkFont(size=12),
+            font=self.styles.font(12),
             command=self.toggle_theme,
             width=60,
             height=28
         )
         self.theme_switch.pack()
+        if self.engine.theme == "light":
+            self.theme_switch.select()
         
         # Start countdown timer
         self.update_countdown()
@@ -138,16 +194,25 @@ class AlarmApp:
         nav_frame.pack(fill="x", padx=0, pady=0)
         nav_frame.pack_propagate(False)
         
-        self.notebook = ctk.CTkTabview(main_container, corner_radius=8)
+        self.notebook = ctk.CTkTabview(main_container, corner_radius=8, command=self.on_tab_change)
         self.notebook.pack(fill="both", expand=True, padx=20, pady=(10, 20))
         
         self.notebook.add("🏠 Alarms")
         self.notebook.add("➕ Add Alarm")
         self.notebook.add("⚙️ Settings")
         
+        # Only the alarm list is built up front; the other tabs are built on first visit
+        self.ringtone_combo = None
         self.create_alarms_tab()
-        self.create_add_alarm_tab()
-        self.create_settings_tab()
+        self.tab_builders = {
+            "➕ Add Alarm": self.create_add_alarm_tab,
+            "⚙️ Settings": self.create_settings_tab,
+        }
+    
+    def on_tab_change(self):
+        builder = self.tab_builders.pop(self.notebook.get(), None)
+        if builder is not None:
+            builder()
     
     def create_alarms_tab(self):
         alarms_frame = self.notebook.tab("🏠 Alarms")
@@ -160,13 +225,21 @@ class AlarmApp:
         header_content = ctk.CTkFrame(header_card, fg_color="transparent")
         header_content.pack(fill="both", expand=True, padx=20, pady=15)
         
-        self.alarm_count_label = ctk.CTkLabel(header_content, text="No alarms", font=ctk.CTkFont(size=18, weight="bold"))
+        self.alarm_count_label = ctk.CTkLabel(header_content, text="No alarms", font=self.styles.font(18, "bold"))
         self.alarm_count_label.pack(side="left")
         
         # Scrollable alarms list with Windows 11 style
-        self.alarms_list_frame = ctk.CTkScrollableFrame(alarms_frame, corner_radius=12)
-        self.alarms_list_frame.pack(fill="both", expand=True, padx=15, pady=(0, 15))
-        
+        # Only cards in view are built; they are recycled as the list scrolls
+        self.alarm_list = VirtualAlarmList(
+            alarms_frame,
+            ALARM_CARD_HEIGHT + 2 * ALARM_CARD_PADDING,
+            self.create_alarm_widget,
+            self.bind_alarm_widget,
+            create_empty=self.create_empty_state,
+            pady=ALARM_CARD_PADDING,
+            corner_radius=12
+        )
+        self.alarm_list.container.pack(fill="both", expand=True, padx=15, pady=(0, 15))
         self.refresh_alarms_list()
     
     def create_add_alarm_tab(self):
@@ -180,7 +253,7 @@ class AlarmApp:
         time_card = ctk.CTkFrame(scroll_container, corner_radius=12)
         time_card.pack(fill="x", pady=(0, 15))
         
-        ctk.CTkLabel(time_card, text="⏰ Set Time", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=(20, 15))
+        ctk.CTkLabel(time_card, text="⏰ Set Time", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
         
         # Time selectors in a grid
         time_grid = ctk.CTkFrame(time_card, fg_color="transparent")
@@ -189,71 +262,85 @@ class AlarmApp:
         # Hour
         hour_container = ctk.CTkFrame(time_grid, corner_radius=8)
         hour_container.grid(row=0, column=0, padx=10, pady=5)
-        ctk.CTkLabel(hour_container, text="Hour", font=ctk.CTkFont(size=14, weight="bold")).pack(pady=(10, 5))
+        ctk.CTkLabel(hour_container, text="Hour", font=self.styles.font(14, "bold")).pack(pady=(10, 5))
         self.hour_var = tk.StringVar(value="12")
-        self.hour_combo = ctk.CTkComboBox(hour_container, values=[f"{i:02d}" for i in range(1, 13)], variable=self.hour_var, width=100, height=40, font=ctk.CTkFont(size=14))
+        self.hour_combo = ctk.CTkComboBox(hour_container, values=[f"{i:02d}" for i in range(1, 13)], variable=self.hour_var, width=100, height=40, font=self.styles.font(14))
         self.hour_combo.pack(pady=(0, 10))
         
         # Minute
         minute_container = ctk.CTkFrame(time_grid, corner_radius=8)
         minute_container.grid(row=0, column=1, padx=10, pady=5)
-        ctk.CTkLabel(minute_container, text="Minute", font=ctk.CTkFont(size=14, weight="bold")).pack(pady=(10, 5))
+        ctk.CTkLabel(minute_container, text="Minute", font=self.styles.font(14, "bold")).pack(pady=(10, 5))
         self.minute_var = tk.StringVar(value="00")
-        self.minute_combo = ctk.CTkComboBox(minute_container, values=[f"{i:02d}" for i in range(0, 60, 5)], variable=self.minute_var, width=100, height=40, font=ctk.CTkFont(size=14))
+        self.minute_combo = ctk.CTkComboBox(minute_container, values=[f"{i:02d}" for i in range(0, 60, 5)], variable=self.minute_var, width=100, height=40, font=self.styles.font(14))
         self.minute_combo.pack(pady=(0, 10))
         
         # AM/PM
         ampm_container = ctk.CTkFrame(time_grid, corner_radius=8)
         ampm_container.grid(row=0, column=2, padx=10, pady=5)
-        ctk.CTkLabel(ampm_container, text="Period", font=ctk.CTkFont(size=14, weight="bold")).pack(pady=(10, 5))
+        ctk.CTkLabel(ampm_container, text="Period", font=self.styles.font(14, "bold")).pack(pady=(10, 5))
         self.ampm_var = tk.StringVar(value="AM")
-        self.ampm_combo = ctk.CTkComboBox(ampm_container, values=["AM", "PM"], variable=self.ampm_var, width=100, height=40, font=ctk.CTkFont(size=14))
+        self.ampm_combo = ctk.CTkComboBox(ampm_container, values=["AM", "PM"], variable=self.ampm_var, width=100, height=40, font=self.styles.font(14))
         self.ampm_combo.pack(pady=(0, 10))
         
         # Label card
         label_card = ctk.CTkFrame(scroll_container, corner_radius=12)
         label_card.pack(fill="x", pady=(0, 15))
         
-        ctk.CTkLabel(label_card, text="📝 Alarm Label", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=(20, 15))
-        self.label_entry = ctk.CTkEntry(label_card, placeholder_text="Enter alarm name...", height=45, font=ctk.CTkFont(size=14), corner_radius=8)
-        self.label_entry.pack(fill="x", padx=20, pady=(0, 20))
+        ctk.CTkLabel(label_card, text="📝 Alarm Label", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
+        self.label_entry = ctk.CTkEntry(label_card, placeholder_text="Enter alarm name...", height=45, font=self.styles.font(14), corner_radius=8)
+        self.label_entry.pack(fill="x", padx=20, pady=(0, 10))
+        
+        # Optional zone for people who travel: the alarm keeps that zone's time
+        self.timezone_entry = ctk.CTkEntry(label_card, placeholder_text="Time zone (optional), e.g. Europe/London", height=40, font=self.styles.font(13), corner_radius=8)
+        self.timezone_entry.pack(fill="x", padx=20, pady=(0, 20))
         
         # Days card
         days_card = ctk.CTkFrame(scroll_container, corner_radius=12)
         days_card.pack(fill="x", pady=(0, 15))
         
-        ctk.CTkLabel(days_card, text="📅 Repeat Days", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=(20, 15))
+        ctk.CTkLabel(days_card, text="📅 Repeat Days", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
         
         days_grid = ctk.CTkFrame(days_card, fg_color="transparent")
-        days_grid.pack(pady=(0, 20))
+        days_grid.pack(pady=(0, 10))
         
         self.days_vars = {}
         days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
         for i, day in enumerate(days):
             var = tk.BooleanVar()
             self.days_vars[day] = var
-            checkbox = ctk.CTkCheckBox(days_grid, text=day, variable=var, font=ctk.CTkFont(size=13), corner_radius=6)
+            checkbox = ctk.CTkCheckBox(days_grid, text=day, variable=var, font=self.styles.font(13), corner_radius=6)
             checkbox.grid(row=0, column=i, padx=8, pady=5)
         
+        # Anything the day checkboxes can't express, as an iCalendar rule
+        self.rrule_entry = ctk.CTkEntry(days_card, placeholder_text="Advanced: FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR", height=40, font=self.styles.font(13), corner_radius=8)
+        self.rrule_entry.pack(fill="x", padx=20, pady=(0, 20))
+        
         # Ringtone card
         ringtone_card = ctk.CTkFrame(scroll_container, corner_radius=12)
         ringtone_card.pack(fill="x", pady=(0, 15))
         
-        ctk.CTkLabel(ringtone_card, text="🎵 Ringtone", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=(20, 15))
+        ctk.CTkLabel(ringtone_card, text="🎵 Ringtone", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
         
         ringtone_controls = ctk.CTkFrame(ringtone_card, fg_color="transparent")
         ringtone_controls.pack(pady=(0, 20))
         
         self.ringtone_var = tk.StringVar(value="Default")
-        self.ringtone_combo = ctk.CTkComboBox(ringtone_controls, variable=self.ringtone_var, width=250, height=40, font=ctk.CTkFont(size=14))
+        self.ringtone_combo = ctk.CTkComboBox(ringtone_controls, variable=self.ringtone_var, width=250, height=40, font=self.styles.font(14))
         self.ringtone_combo.pack(side="left", padx=(0, 10))
         
-        browse_btn = ctk.CTkButton(ringtone_controls, text="Browse", command=self.browse_ringtone, width=80, height=40, corner_radius=8)
-        browse_btn.pack(side="left", padx=5)
+        self.browse_btn = ctk.CTkButton(ringtone_controls, text="Browse", command=self.browse_ringtone, width=80, height=40, corner_radius=8)
+        self.browse_btn.pack(side="left", padx=5)
         
         test_btn = ctk.CTkButton(ringtone_controls, text="Test", command=self.test_ringtone, width=60, height=40, corner_radius=8)
         test_btn.pack(side="left", padx=5)
         
+        # Files in the ringtones folder that don't decode
+        self.ringtone_warning = ctk.CTkLabel(ringtone_card, text="", font=self.styles.font(12), text_color=self.styles.color("danger"))
+        
+        # Import progress, shown while a ringtone is being copied in
+        self.import_progress = ctk.CTkProgressBar(ringtone_card, width=300)
+        
         self.update_ringtone_list()
         
         # Add button - Windows 11 style
@@ -261,7 +348,7 @@ class AlarmApp:
             scroll_container, 
             text="➕ Add Alarm", 
             command=self.add_alarm, 
-            font=ctk.CTkFont(size=16, weight="bold"), 
+            font=self.styles.font(16, "bold"), 
             height=50, 
             width=200,
             corner_radius=25
@@ -269,80 +356,291 @@ class AlarmApp:
         add_btn.pack(pady=20)
     
     def create_settings_tab(self):
-        settings_frame = self.notebook.tab("⚙️ Settings")
+        # Scrollable like the Add Alarm tab: the cards are taller than the window
+        settings_frame = ctk.CTkScrollableFrame(self.notebook.tab("⚙️ Settings"), corner_radius=0, fg_color="transparent")
+        settings_frame.pack(fill="both", expand=True)
         
         # Volume card
         volume_card = ctk.CTkFrame(settings_frame, corner_radius=12)
         volume_card.pack(fill="x", padx=15, pady=15)
         
-        ctk.CTkLabel(volume_card, text="🔊 Volume", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=(20, 15))
+        ctk.CTkLabel(volume_card, text="🔊 Volume", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
         
         volume_container = ctk.CTkFrame(volume_card, fg_color="transparent")
         volume_container.pack(fill="x", padx=20, pady=(0, 20))
         
-        self.volume_var = tk.DoubleVar(value=0.7)
+        self.volume_var = tk.DoubleVar(value=self.engine.volume)
         volume_slider = ctk.CTkSlider(volume_container, from_=0.0, to=1.0, variable=self.volume_var, command=self.change_volume, height=20, corner_radius=10)
         volume_slider.pack(fill="x", pady=(0, 10))
         
-        self.volume_label = ctk.CTkLabel(volume_container, text="70%", font=ctk.CTkFont(size=14))
+        self.volume_label = ctk.CTkLabel(volume_container, text=f"{int(self.engine.volume * 100)}%", font=self.styles.font(14))
         self.volume_label.pack()
         
+        self.create_catch_up_card(settings_frame)
+        self.create_dst_card(settings_frame)
+        self.create_tray_mode_card(settings_frame)
+        self.create_import_export_card(settings_frame)
+        self.create_diagnostics_card(settings_frame)
+        
         # About card
         about_card = ctk.CTkFrame(settings_frame, corner_radius=12)
         about_card.pack(fill="x", padx=15, pady=(0, 15))
         
-        ctk.CTkLabel(about_card, text="ℹ️ About", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=(20, 15))
+        ctk.CTkLabel(about_card, text="ℹ️ About", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
         
         about_content = ctk.CTkFrame(about_card, fg_color="transparent")
         about_content.pack(fill="x", padx=20, pady=(0, 20))
         
-        ctk.CTkLabel(about_content, text="Ring Ring", font=ctk.CTkFont(size=24, weight="bold")).pack(pady=(0, 5))
-        ctk.CTkLabel(about_content, text="Modern Alarm Clock App v1.0", font=ctk.CTkFont(size=14)).pack(pady=2)
-        ctk.CTkLabel(about_content, text="Created with ❤️ by ShaazKazi", font=ctk.CTkFont(size=14)).pack(pady=2)
+        ctk.CTkLabel(about_content, text="Ring Ring", font=self.styles.font(24, "bold")).pack(pady=(0, 5))
+        ctk.CTkLabel(about_content, text="Modern Alarm Clock App v1.0", font=self.styles.font(14)).pack(pady=2)
+        ctk.CTkLabel(about_content, text="Created with ❤️ by ShaazKazi", font=self.styles.font(14)).pack(pady=2)
         
         github_btn = ctk.CTkButton(about_content, text="Visit GitHub", command=self.open_github, height=40, width=140, corner_radius=20)
         github_btn.pack(pady=15)
     
+    def create_catch_up_card(self, settings_frame):
+        # Missed alarms card - what to do with alarms due while asleep or suspended
+        catch_up_card = ctk.CTkFrame(settings_frame, corner_radius=12)
+        catch_up_card.pack(fill="x", padx=15, pady=(0, 15))
+        
+        ctk.CTkLabel(catch_up_card, text="⏱️ Missed Alarms", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
+        
+        self.catch_up_labels = {
+            CATCH_UP_FIRE_LATE: "Ring every missed alarm",
+            CATCH_UP_COALESCE: "Ring once per alarm",
+            CATCH_UP_DROP: f"Skip if over {self.engine.catch_up_minutes} min late",
+        }
+        self.catch_up_var = tk.StringVar(value=self.catch_up_labels.get(self.engine.catch_up_policy, self.catch_up_labels[CATCH_UP_COALESCE]))
+        catch_up_combo = ctk.CTkComboBox(catch_up_card, values=list(self.catch_up_labels.values()), variable=self.catch_up_var, command=self.change_catch_up_policy, width=250, height=40, font=self.styles.font(14))
+        catch_up_combo.pack(pady=(0, 20))
+    
+    def create_dst_card(self, settings_frame):
+        # Daylight saving card - alarms in the hour that is skipped or repeated
+        dst_card = ctk.CTkFrame(settings_frame, corner_radius=12)
+        dst_card.pack(fill="x", padx=15, pady=(0, 15))
+        
+        ctk.CTkLabel(dst_card, text="🕑 Daylight Saving", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
+        
+        self.dst_gap_labels = {
+            GAP_SHIFT: "Skipped hour: ring an hour later",
+            GAP_SKIP: "Skipped hour: don't ring",
+        }
+        self.dst_fold_labels = {
+            FOLD_FIRST: "Repeated hour: ring the first time",
+            FOLD_SECOND: "Repeated hour: ring the second time",
+            FOLD_BOTH: "Repeated hour: ring both times",
+        }
+        self.dst_gap_var = tk.StringVar(value=self.dst_gap_labels.get(self.engine.dst_gap_policy, self.dst_gap_labels[GAP_SHIFT]))
+        gap_combo = ctk.CTkComboBox(dst_card, values=list(self.dst_gap_labels.values()), variable=self.dst_gap_var, command=self.change_dst_policy, width=300, height=40, font=self.styles.font(14))
+        gap_combo.pack(pady=(0, 10))
+        self.dst_fold_var = tk.StringVar(value=self.dst_fold_labels.get(self.engine.dst_fold_policy, self.dst_fold_labels[FOLD_FIRST]))
+        fold_combo = ctk.CTkComboBox(dst_card, values=list(self.dst_fold_labels.values()), variable=self.dst_fold_var, command=self.change_dst_policy, width=300, height=40, font=self.styles.font(14))
+        fold_combo.pack(pady=(0, 20))
+    
+    def create_tray_mode_card(self, settings_frame):
+        # Tray-only mode - close the whole window when minimized, keep only the engine and tray icon
+        tray_card = ctk.CTkFrame(settings_frame, corner_radius=12)
+        tray_card.pack(fill="x", padx=15, pady=(0, 15))
+        
+        ctk.CTkLabel(tray_card, text="🪶 Background Mode", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
+        
+        self.tray_only_switch = ctk.CTkSwitch(tray_card, text="Free the window while in the tray (uses less memory)", font=self.styles.font(14), command=self.toggle_tray_only)
+        self.tray_only_switch.pack(pady=(0, 20))
+        if self.engine.tray_only:
+            self.tray_only_switch.select()
+    
+    def create_import_export_card(self, settings_frame):
+        # Bulk import/export - CSV or iCalendar files
+        io_card = ctk.CTkFrame(settings_frame, corner_radius=12)
+        io_card.pack(fill="x", padx=15, pady=(0, 15))
+        
+        ctk.CTkLabel(io_card, text="📦 Import / Export", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
+        
+        io_buttons = ctk.CTkFrame(io_card, fg_color="transparent")
+        io_buttons.pack(pady=(0, 20))
+        
+        import_btn = ctk.CTkButton(io_buttons, text="Import Alarms", command=self.import_alarms, width=140, height=40, corner_radius=20)
+        import_btn.pack(side="left", padx=10)
+        
+        export_btn = ctk.CTkButton(io_buttons, text="Export Alarms", command=self.export_alarms, width=140, height=40, corner_radius=20)
+        export_btn.pack(side="left", padx=10)
+    
+    def import_alarms(self):
+        file_path = filedialog.askopenfilename(title="Import Alarms", filetypes=[("Alarm files", "*.csv *.ics"), ("CSV files", "*.csv"), ("iCalendar files", "*.ics"), ("All files", "*.*")])
+        if not file_path:
+            return
+        
+        # Records are parsed lazily and committed as one batch with a single list refresh
+        errors = []
+        try:
+            alarms = self.engine.add_alarms(read_alarms(file_path, errors))
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            messagebox.showerror("Import Failed", f"Could not read {os.path.basename(file_path)}: {e}")
+            alarms = None
+        self.refresh_alarms_list()
+        self.update_countdown()
+        if alarms is None:
+            return
+        
+        message = f"Imported {len(alarms)} alarm{'s' if len(alarms) != 1 else ''}."
+        if errors:
+            details = "\n".join(f"Line {line}: {error}" for line, error in errors[:5])
+            more = f"\n...and {len(errors) - 5} more" if len(errors) > 5 else ""
+            message += f"\n\nSkipped {len(errors)} invalid record{'s' if len(errors) != 1 else ''}:\n{details}{more}"
+        messagebox.showinfo("Import Alarms", message)
+    
+    def export_alarms(self):
+        file_path = filedialog.asksaveasfilename(title="Export Alarms", defaultextension=".csv", filetypes=[("CSV files", "*.csv"), ("iCalendar files", "*.ics")])
+        if not file_path:
+            return
+        try:
+            count = write_alarms(self.alarms, file_path)
+        except OSError as e:
+            messagebox.showerror("Export Failed", f"Could not write {os.path.basename(file_path)}: {e}")
+            return
+        messagebox.showinfo("Export Alarms", f"Exported {count} alarm{'s' if count != 1 else ''}.")
+    
+    def create_diagnostics_card(self, settings_frame):
+        # Diagnostics card - latency and timing histograms since startup
+        diagnostics_card = ctk.CTkFrame(settings_frame, corner_radius=12)
+        diagnostics_card.pack(fill="x", padx=15, pady=(0, 15))
+        
+        ctk.CTkLabel(diagnostics_card, text="📊 Diagnostics", font=self.styles.font(20, "bold")).pack(pady=(20, 15))
+        
+        self.diagnostics_label = ctk.CTkLabel(diagnostics_card, text="", font=self.styles.font(12), justify="left", anchor="w")
+        self.diagnostics_label.pack(fill="x", padx=20, pady=(0, 10))
+        
+        self.profiling_switch = ctk.CTkSwitch(diagnostics_card, text=f"Record performance profiles to {PROFILE_DIR} (after restart)", font=self.styles.font(14), command=self.toggle_profiling)
+        self.profiling_switch.pack(pady=(0, 10))
+        if self.engine.profiling:
+            self.profiling_switch.select()
+        if PROFILER.enabled:
+            ctk.CTkLabel(diagnostics_card, text=f"Profiling is on: CPU and memory profiles go to {os.path.abspath(PROFILER.directory)} every {PROFILER.interval // 60} min", font=self.styles.font(12), wraplength=600).pack(padx=20, pady=(0, 10))
+        
+        diagnostics_buttons = ctk.CTkFrame(diagnostics_card, fg_color="transparent")
+        diagnostics_buttons.pack(pady=(0, 20))
+        
+        refresh_btn = ctk.CTkButton(diagnostics_buttons, text="Refresh", command=self.update_diagnostics, width=140, height=40, corner_radius=20)
+        refresh_btn.pack(side="left", padx=10)
+        
+        export_btn = ctk.CTkButton(diagnostics_buttons, text="Export JSON", command=self.export_metrics, width=140, height=40, corner_radius=20)
+        export_btn.pack(side="left", padx=10)
+        
+        self.update_diagnostics()
+    
+    def update_diagnostics(self):
+        lines = []
+        for name, histogram in METRICS.snapshot()["metrics"].items():
+            description = DESCRIPTIONS.get(name, name)
+            if not histogram["count"]:
+                lines.append(f"{description}: no data yet")
+                continue
+            lines.append(f"{description}: {histogram['count']}×, p50 ≤ {histogram['p50_ms']:.0f} ms, "
+                         f"p95 ≤ {histogram['p95_ms']:.0f} ms, max {histogram['max_ms']:.0f} ms")
+        self.diagnostics_label.configure(text="\n".join(lines))
+    
+    def export_metrics(self):
+        file_path = filedialog.asksaveasfilename(title="Export Diagnostics", defaultextension=".json", initialfile="ringring-metrics.json", filetypes=[("JSON files", "*.json")])
+        if not file_path:
+            return
+        try:
+            METRICS.export(file_path)
+        except OSError as e:
+            messagebox.showerror("Export Failed", f"Could not write {os.path.basename(file_path)}: {e}")
+            return
+        self.update_diagnostics()
+        messagebox.showinfo("Export Diagnostics", f"Saved diagnostics to {os.path.basename(file_path)}.")
+    
+    def toggle_profiling(self):
+        self.engine.profiling = bool(self.profiling_switch.get())
+        self.engine.save_settings()
+    
+    def toggle_tray_only(self):
+        self.engine.tray_only = bool(self.tray_only_switch.get())
+        self.engine.save_settings()
+    
     def toggle_theme(self):
-        if self.theme_switch.get():
-            ctk.set_appearance_mode("light")
-            self.theme_var = "light"
-        else:
-            ctk.set_appearance_mode("dark")
-            self.theme_var = "dark"
-        self.save_settings()
+        self.engine.theme = "light" if self.theme_switch.get() else "dark"
+        self.styles.apply_theme(self.engine.theme)
+        self.engine.save_settings()
     
     def change_volume(self, value):
-        pygame.mixer.music.set_volume(float(value))
+        self.engine.set_volume(float(value))
         self.volume_label.configure(text=f"{int(float(value) * 100)}%")
-        self.save_settings()
+        self.engine.save_settings()
+    
+    def change_catch_up_policy(self, label):
+        for policy, policy_label in self.catch_up_labels.items():
+            if policy_label == label:
+                self.engine.set_catch_up_policy(policy)
+                break
+        self.engine.save_settings()
+    
+    def change_dst_policy(self, label):
+        gap = next((policy for policy, text in self.dst_gap_labels.items() if text == self.dst_gap_var.get()), None)
+        fold = next((policy for policy, text in self.dst_fold_labels.items() if text == self.dst_fold_var.get()), None)
+        self.engine.set_dst_policy(gap, fold)
+        self.engine.save_settings()
+        self.update_countdown()
     
     def open_github(self):
+        import webbrowser
         webbrowser.open("https://github.com/ShaazKazi")
     
+    def on_alarms_changed(self):
+        # Called on a control server worker after a scripted change
+        self.dispatcher.post(self.refresh_alarms_list, key="alarms")
+        self.dispatcher.post(self.update_countdown, key="countdown")
+    
+    def on_ringtones_changed(self):
+        # Called on the engine's scan thread
+        self.dispatcher.post(self.update_ringtone_list, key="ringtones")
+    
     def update_ringtone_list(self):
-        ringtones = ["Default"]
-        ringtones_path = "assets/ringtones"
-        if os.path.exists(ringtones_path):
-            for file in os.listdir(ringtones_path):
-                if file.endswith(('.mp3', '.wav', '.ogg')):
-                    ringtones.append(file)
-        self.ringtone_combo.configure(values=ringtones)
+        if self.ringtone_combo is None:
+            return
+        # Filled from the library index; broken files are left out and warned about
+        self.ringtone_combo.configure(values=["Default"] + self.engine.ringtones.names())
+        broken = self.engine.ringtones.broken()
+        if broken:
+            self.ringtone_warning.configure(text=f"⚠️ Can't play: {', '.join(broken)}")
+            self.ringtone_warning.pack(pady=(0, 15))
+        else:
+            self.ringtone_warning.pack_forget()
     
     def browse_ringtone(self):
         file_path = filedialog.askopenfilename(title="Select Ringtone", filetypes=[("Audio files", "*.mp3 *.wav *.ogg"), ("All files", "*.*")])
         if file_path:
-            filename = os.path.basename(file_path)
-            ringtones_path = "assets/ringtones"
-            os.makedirs(ringtones_path, exist_ok=True)
-            import shutil
-            shutil.copy2(file_path, os.path.join(ringtones_path, filename))
-            self.update_ringtone_list()
-            self.ringtone_var.set(filename)
+            # Copied, hashed and deduplicated on a worker thread
+            self.browse_btn.configure(state="disabled")
+            self.import_progress.set(0)
+            self.import_progress.pack(pady=(0, 15))
+            self.engine.import_ringtone(
+                file_path,
+                on_progress=lambda done, total: self.dispatcher.post(self.show_import_progress, done, total, key="ringtone_import"),
+                on_done=lambda status, name: self.dispatcher.post(self.finish_ringtone_import, status, name),
+            )
+    
+    def show_import_progress(self, done, total):
+        if self.ringtone_combo is not None:
+            self.import_progress.set(done / total if total else 1)
+    
+    def finish_ringtone_import(self, status, name):
+        if self.ringtone_combo is None:
+            return
+        self.import_progress.pack_forget()
+        self.browse_btn.configure(state="normal")
+        self.update_ringtone_list()
+        if status == "failed":
+            messagebox.showerror("Import Failed", "The ringtone could not be imported.")
+            return
+        if status == "duplicate":
+            messagebox.showinfo("Already Imported", f"This ringtone is already in your library as '{name}'.")
+        self.ringtone_var.set(name)
     
     def test_ringtone(self):
         ringtone = self.ringtone_var.get()
-        self.play_alarm_sound(ringtone, test=True)
+        self.engine.play_sound(ringtone, test=True)
     
     def add_alarm(self):
         hour = int(self.hour_var.get())
@@ -358,23 +656,29 @@ class AlarmApp:
         days = [day for day, var in self.days_vars.items() if var.get()]
         ringtone = self.ringtone_var.get()
         
-        alarm = {
-            "id": len(self.alarms),
-            "hour": hour,
-            "minute": minute,
-            "label": label,
-            "days": days,
-            "ringtone": ringtone,
-            "enabled": True,
-            "created": datetime.now().isoformat()
-        }
+        rrule = self.rrule_entry.get().strip() or None
+        if rrule:
+            try:
+                days, rrule = parse_rrule(rrule)
+            except InvalidAlarm as e:
+                messagebox.showerror("Invalid repeat rule", str(e))
+                return
         
-        self.alarms.append(alarm)
-        self.save_alarms()
-        self.refresh_alarms_list()
+        timezone = self.timezone_entry.get().strip() or None
+        try:
+            get_zone(timezone)
+        except ValueError as e:
+            messagebox.showerror("Invalid time zone", str(e))
+            return
+        
+        alarm = self.engine.add_alarm(hour, minute, label, days, ringtone, rrule=rrule, dtstart=datetime.now().date().isoformat() if rrule else None, timezone=timezone)
+        self.alarm_list.insert(alarm)
+        self.update_alarm_count()
         self.update_countdown()  # Update countdown after adding alarm
         
         self.label_entry.delete(0, tk.END)
+        self.rrule_entry.delete(0, tk.END)
+        self.timezone_entry.delete(0, tk.END)
         for var in self.days_vars.values():
             var.set(False)
         
@@ -382,34 +686,34 @@ class AlarmApp:
         self.notebook.set("🏠 Alarms")
     
     def refresh_alarms_list(self):
-        for widget in self.alarms_list_frame.winfo_children():
-            widget.destroy()
-        
+        # Timed until the idle render has placed the cards, which is where the work is
+        start = time.perf_counter()
+        self.update_alarm_count()
+        self.alarm_list.set_alarms(self.alarms, on_rendered=lambda: METRICS.record(REFRESH_ALARMS_LIST, (time.perf_counter() - start) * 1000))
+    
+    def update_alarm_count(self):
         count = len(self.alarms)
         self.alarm_count_label.configure(text=f"{count} alarm{'s' if count != 1 else ''}")
-        
-        if not self.alarms:
-            # Windows 11 style empty state
-            empty_card = ctk.CTkFrame(self.alarms_list_frame, height=250, corner_radius=12)
-            empty_card.pack(fill="x", padx=10, pady=30)
-            empty_card.pack_propagate(False)
-            
-            empty_content = ctk.CTkFrame(empty_card, fg_color="transparent")
-            empty_content.pack(expand=True, fill="both")
-            
-            ctk.CTkLabel(empty_content, text="⏰", font=ctk.CTkFont(size=64)).pack(pady=(50, 15))
-            ctk.CTkLabel(empty_content, text="No alarms set", font=ctk.CTkFont(size=20, weight="bold")).pack(pady=(0, 5))
-            ctk.CTkLabel(empty_content, text="Add your first alarm to get started!", font=ctk.CTkFont(size=14)).pack()
-            return
-        
-        for alarm in self.alarms:
-            self.create_alarm_widget(alarm)
     
-    def create_alarm_widget(self, alarm):
-        # Windows 11 style alarm card with proper height
-        alarm_card = ctk.CTkFrame(self.alarms_list_frame, height=140, corner_radius=12)
-        alarm_card.pack(fill="x", padx=10, pady=8)
+    def create_empty_state(self, master):
+        # Windows 11 style empty state
+        empty_card = ctk.CTkFrame(master, height=250, corner_radius=12)
+        empty_card.pack_propagate(False)
+        
+        empty_content = ctk.CTkFrame(empty_card, fg_color="transparent")
+        empty_content.pack(expand=True, fill="both")
+        
+        ctk.CTkLabel(empty_content, text="⏰", font=self.styles.font(64)).pack(pady=(50, 15))
+        ctk.CTkLabel(empty_content, text="No alarms set", font=self.styles.font(20, "bold")).pack(pady=(0, 5))
+        ctk.CTkLabel(empty_content, text="Add your first alarm to get started!", font=self.styles.font(14)).pack()
+        return empty_card
+    
+    def create_alarm_widget(self, master):
+        # Windows 11 style alarm card with proper height; cards are recycled by the
+        # virtual list, so everything alarm-specific is filled in by bind_alarm_widget
+        alarm_card = ctk.CTkFrame(master, height=ALARM_CARD_HEIGHT, corner_radius=12)
         alarm_card.pack_propagate(False)
+        alarm_card.alarm_id = None
         
         card_content = ctk.CTkFrame(alarm_card, fg_color="transparent")
         card_content.pack(fill="both", expand=True, padx=20, pady=20)
@@ -419,22 +723,11 @@ class AlarmApp:
         time_container.pack(side="left", fill="y", padx=(0, 20))
         time_container.pack_propagate(False)
         
-        display_hour = alarm['hour']
-        ampm = "AM"
-        if display_hour == 0:
-            display_hour = 12
-        elif display_hour > 12:
-            display_hour -= 12
-            ampm = "PM"
-        elif display_hour == 12:
-            ampm = "PM"
-        
-        time_str = f"{display_hour:02d}:{alarm['minute']:02d}"
-        time_label = ctk.CTkLabel(time_container, text=time_str, font=ctk.CTkFont(size=24, weight="bold"))
-        time_label.pack(pady=(20, 5))
+        alarm_card.time_label = ctk.CTkLabel(time_container, text="", font=self.styles.font(24, "bold"))
+        alarm_card.time_label.pack(pady=(20, 5))
         
-        ampm_label = ctk.CTkLabel(time_container, text=ampm, font=ctk.CTkFont(size=12))
-        ampm_label.pack()
+        alarm_card.ampm_label = ctk.CTkLabel(time_container, text="", font=self.styles.font(12))
+        alarm_card.ampm_label.pack()
         
         # Details - expandable
         details_container = ctk.CTkFrame(card_content, corner_radius=8)
@@ -443,28 +736,14 @@ class AlarmApp:
         details_content = ctk.CTkFrame(details_container, fg_color="transparent")
         details_content.pack(fill="both", expand=True, padx=15, pady=15)
         
-        # Truncate long labels
-        label_text = alarm['label']
-        if len(label_text) > 25:
-            label_text = label_text[:22] + "..."
-        
-        label_widget = ctk.CTkLabel(details_content, text=label_text, font=ctk.CTkFont(size=15, weight="bold"), anchor="w")
-        label_widget.pack(fill="x", pady=(0, 8))
+        alarm_card.label_widget = ctk.CTkLabel(details_content, text="", font=self.styles.font(15, "bold"), anchor="w")
+        alarm_card.label_widget.pack(fill="x", pady=(0, 8))
         
-        if alarm['days']:
-            days_text = f"Repeats: {', '.join(alarm['days'])}"
-            if len(days_text) > 30:
-                days_text = days_text[:27] + "..."
-            days_widget = ctk.CTkLabel(details_content, text=days_text, font=ctk.CTkFont(size=11), anchor="w")
-        else:
-            days_widget = ctk.CTkLabel(details_content, text="One-time alarm", font=ctk.CTkFont(size=11), anchor="w")
-        days_widget.pack(fill="x", pady=2)
+        alarm_card.days_widget = ctk.CTkLabel(details_content, text="", font=self.styles.font(11), anchor="w")
+        alarm_card.days_widget.pack(fill="x", pady=2)
         
-        ringtone_text = f"🎵 {alarm['ringtone']}"
-        if len(ringtone_text) > 25:
-            ringtone_text = ringtone_text[:22] + "..."
-        ringtone_widget = ctk.CTkLabel(details_content, text=ringtone_text, font=ctk.CTkFont(size=11), anchor="w")
-        ringtone_widget.pack(fill="x", pady=2)
+        alarm_card.ringtone_widget = ctk.CTkLabel(details_content, text="", font=self.styles.font(11), anchor="w")
+        alarm_card.ringtone_widget.pack(fill="x", pady=2)
         
         # Controls - side by side layout
         controls_container = ctk.CTkFrame(card_content, width=140, corner_radius=8)
@@ -478,51 +757,80 @@ class AlarmApp:
         controls_row = ctk.CTkFrame(controls_content, fg_color="transparent")
         controls_row.pack(expand=True)
         
-        enabled_var = tk.BooleanVar(value=alarm['enabled'])
-        enabled_switch = ctk.CTkSwitch(controls_row, text="", variable=enabled_var, command=lambda: self.toggle_alarm(alarm['id'], enabled_var.get()), width=50)
+        alarm_card.enabled_var = tk.BooleanVar(value=False)
+        enabled_switch = ctk.CTkSwitch(controls_row, text="", variable=alarm_card.enabled_var, command=lambda: self.toggle_alarm(alarm_card.alarm_id, alarm_card.enabled_var.get()), width=50)
         enabled_switch.pack(pady=(0, 15))
         
-        delete_btn = ctk.CTkButton(controls_row, text="Delete", command=lambda: self.delete_alarm(alarm['id']), width=90, height=32, fg_color="#dc3545", hover_color="#c82333", corner_radius=8, font=ctk.CTkFont(size=12))
+        delete_btn = ctk.CTkButton(controls_row, text="Delete", command=lambda: self.delete_alarm(alarm_card.alarm_id), width=90, height=32, fg_color=self.styles.color("danger"), hover_color=self.styles.color("danger_hover"), corner_radius=8, font=self.styles.font(12))
         delete_btn.pack()
+        return alarm_card
+    
+    def bind_alarm_widget(self, alarm_card, alarm):
+        alarm_card.alarm_id = alarm.id
+        
+        display_hour = alarm.hour
+        ampm = "AM"
+        if display_hour == 0:
+            display_hour = 12
+        elif display_hour > 12:
+            display_hour -= 12
+            ampm = "PM"
+        elif display_hour == 12:
+            ampm = "PM"
+        
+        alarm_card.time_label.configure(text=f"{display_hour:02d}:{alarm.minute:02d}")
+        alarm_card.ampm_label.configure(text=ampm)
+        
+        # Truncate long labels
+        label_text = alarm.label
+        if len(label_text) > 25:
+            label_text = label_text[:22] + "..."
+        alarm_card.label_widget.configure(text=label_text)
+        
+        if alarm.rrule:
+            days_text = describe_rrule(alarm.rrule)
+        elif alarm.days:
+            days_text = f"Repeats: {', '.join(alarm.days)}"
+        else:
+            days_text = "One-time alarm"
+        if alarm.timezone:
+            days_text = f"🌐 {alarm.timezone} · {days_text}"
+        if len(days_text) > 30:
+            days_text = days_text[:27] + "..."
+        alarm_card.days_widget.configure(text=days_text)
+        
+        ringtone_text = f"🎵 {alarm.ringtone}"
+        if len(ringtone_text) > 25:
+            ringtone_text = ringtone_text[:22] + "..."
+        alarm_card.ringtone_widget.configure(text=ringtone_text)
+        
+        alarm_card.enabled_var.set(alarm.enabled)
     
     def toggle_alarm(self, alarm_id, enabled):
-        for alarm in self.alarms:
-            if alarm['id'] == alarm_id:
-                alarm['enabled'] = enabled
-                break
-        self.save_alarms()
+        alarm = self.engine.set_enabled(alarm_id, enabled)
+        if alarm is not None:
+            self.alarm_list.update(alarm)
         self.update_countdown()  # Update countdown when toggling alarm
     
     def delete_alarm(self, alarm_id):
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this alarm?"):
-            self.alarms = [alarm for alarm in self.alarms if alarm['id'] != alarm_id]
-            self.save_alarms()
-            self.refresh_alarms_list()
+            self.engine.delete_alarm(alarm_id)
+            self.alarm_list.remove(alarm_id)
+            self.update_alarm_count()
             self.update_countdown()  # Update countdown after deleting alarm
     
-    def check_alarms(self):
-        while True:
-            current_time = datetime.now()
-            current_day = current_time.strftime("%a")
-            
-            for alarm in self.alarms:
-                if not alarm['enabled']:
-                    continue
-                
-                if (current_time.hour == alarm['hour'] and current_time.minute == alarm['minute'] and current_time.second == 0):
-                    if not alarm['days'] or current_day in alarm['days']:
-                        if alarm['id'] not in self.running_alarms:
-                            self.trigger_alarm(alarm)
-            
-            time.sleep(1)
-    
-    def trigger_alarm(self, alarm):
-        self.running_alarms[alarm['id']] = True
-        self.show_alarm_popup(alarm)
-        sound_thread = threading.Thread(target=self.play_alarm_sound, args=(alarm['ringtone'],), daemon=True)
-        sound_thread.start()
+    def on_alarm_fired(self, alarm, scheduled=None):
+        # Called from the scheduler thread once the alarm is already ringing
+        with self.window_lock:
+            if not self.window_open:
+                # Tray-only mode: bring the window back, build_window shows the popup
+                self.pending_popups.append((alarm, scheduled))
+                if self.tray_icon:
+                    self.tray_icon.stop()
+                return
+        self.dispatcher.post(self.show_alarm_popup, alarm, scheduled)
     
-    def show_alarm_popup(self, alarm):
+    def show_alarm_popup(self, alarm, scheduled=None):
         popup = ctk.CTkToplevel(self.root)
         popup.title("⏰ ALARM - Ring Ring")
         popup.geometry("500x400")
@@ -552,10 +860,10 @@ class AlarmApp:
         content_frame = ctk.CTkFrame(popup, corner_radius=12)
         content_frame.pack(fill="both", expand=True, padx=20, pady=20)
         
-        alarm_icon = ctk.CTkLabel(content_frame, text="⏰", font=ctk.CTkFont(size=80))
+        alarm_icon = ctk.CTkLabel(content_frame, text="⏰", font=self.styles.font(80))
         alarm_icon.pack(pady=(40, 20))
         
-        display_hour = alarm['hour']
+        display_hour = alarm.hour
         ampm = "AM"
         if display_hour == 0:
             display_hour = 12
@@ -565,10 +873,10 @@ class AlarmApp:
         elif display_hour == 12:
             ampm = "PM"
         
-        time_label = ctk.CTkLabel(content_frame, text=f"{display_hour:02d}:{alarm['minute']:02d} {ampm}", font=ctk.CTkFont(size=36, weight="bold"))
+        time_label = ctk.CTkLabel(content_frame, text=f"{display_hour:02d}:{alarm.minute:02d} {ampm}", font=self.styles.font(36, "bold"))
         time_label.pack(pady=10)
         
-        label_text = ctk.CTkLabel(content_frame, text=alarm['label'], font=ctk.CTkFont(size=18))
+        label_text = ctk.CTkLabel(content_frame, text=alarm.label, font=self.styles.font(18))
         label_text.pack(pady=10)
         
         button_frame = ctk.CTkFrame(content_frame, fg_color="transparent")
@@ -578,77 +886,95 @@ class AlarmApp:
         buttons_container = ctk.CTkFrame(button_frame, fg_color="transparent")
         buttons_container.pack()
         
-        stop_btn = ctk.CTkButton(buttons_container, text="Stop", command=lambda: self.stop_alarm(alarm['id'], popup), width=130, height=45, font=ctk.CTkFont(size=15, weight="bold"), corner_radius=22)
+        stop_btn = ctk.CTkButton(buttons_container, text="Stop", command=lambda: self.stop_alarm(alarm.id, popup), width=130, height=45, font=self.styles.font(15, "bold"), corner_radius=22)
         stop_btn.pack(side="left", padx=10)
         
-        snooze_btn = ctk.CTkButton(buttons_container, text="Snooze (5 min)", command=lambda: self.snooze_alarm(alarm, popup), width=150, height=45, font=ctk.CTkFont(size=15, weight="bold"), corner_radius=22)
+        snooze_btn = ctk.CTkButton(buttons_container, text="Snooze (5 min)", command=lambda: self.snooze_alarm(alarm, popup), width=150, height=45, font=self.styles.font(15, "bold"), corner_radius=22)
         snooze_btn.pack(side="left", padx=10)
+        
+        # Time from the alarm being due to Tk having drawn its popup
+        if scheduled is not None:
+            popup.update_idletasks()
+            METRICS.record(POPUP_VISIBLE, seconds_until(datetime.now(), scheduled) * 1000)
+    
+    def finish_alarm(self, alarm_id):
+        # Snoozes only ring once; the engine drops them when they are stopped
+        if self.engine.finish_alarm(alarm_id):
+            self.alarm_list.remove(alarm_id)
+            self.update_alarm_count()
+            self.update_countdown()
     
     def stop_alarm(self, alarm_id, popup):
-        pygame.mixer.music.stop()
-        if alarm_id in self.running_alarms:
-            del self.running_alarms[alarm_id]
+        self.finish_alarm(alarm_id)
         popup.destroy()
     
     def snooze_alarm(self, alarm, popup):
-        pygame.mixer.music.stop()
-        if alarm['id'] in self.running_alarms:
-            del self.running_alarms[alarm['id']]
+        snooze = self.engine.snooze_alarm(alarm)
         popup.destroy()
         
-        snooze_time = datetime.now() + timedelta(minutes=5)
-        snooze_alarm = alarm.copy()
-        snooze_alarm['id'] = f"snooze_{alarm['id']}_{int(time.time())}"
-        snooze_alarm['hour'] = snooze_time.hour
-        snooze_alarm['minute'] = snooze_time.minute
-        snooze_alarm['label'] = f"Snooze: {alarm['label']}"
-        snooze_alarm['days'] = []
-        
-        self.alarms.append(snooze_alarm)
-    
-    def play_alarm_sound(self, ringtone, test=False):
-        try:
-            if ringtone == "Default":
-                for _ in range(10 if not test else 3):
-                    import winsound
-                    winsound.Beep(1000, 500)
-                    if test:
-                        break
-                    time.sleep(0.5)
-            else:
-                ringtone_path = os.path.join("assets/ringtones", ringtone)
-                if os.path.exists(ringtone_path):
-                    pygame.mixer.music.load(ringtone_path)
-                    pygame.mixer.music.set_volume(self.volume_var.get())
-                    if test:
-                        pygame.mixer.music.play()
-                        time.sleep(3)
-                        pygame.mixer.music.stop()
-                    else:
-                        pygame.mixer.music.play(-1)
-        except Exception as e:
-            print(f"Error playing sound: {e}")
+        if alarm.id not in self.alarms:
+            self.alarm_list.remove(alarm.id)
+        self.alarm_list.insert(snooze)
+        self.update_alarm_count()
+        self.update_countdown()
     
     def minimize_to_tray(self):
-        self.root.withdraw()
-        self.is_minimized = True
+        import pystray
+        from pystray import MenuItem as item
+        from PIL import Image
         
         try:
             image = Image.open("assets/logo/tray_icon.png")
         except:
             image = Image.new('RGB', (64, 64), color='blue')
         
-        menu = pystray.Menu(item('Show', self.show_from_tray), item('Quit', self.quit_app))
+        menu = pystray.Menu(item('Show', self.show_from_tray), item('Quit', self.quit_from_tray))
         self.tray_icon = pystray.Icon("Ring Ring", image, "Ring Ring Alarm", menu)
-        threading.Thread(target=self.tray_icon.run, daemon=True).start()
+        self.is_minimized = True
+        
+        if self.engine.tray_only:
+            # Tear down the whole widget tree; run() hands the main thread to the tray icon
+            with self.window_lock:
+                self.window_open = False
+            self.dispatcher.detach()
+            self.timers.detach()
+            self.root.destroy()
+            self.root = None
+        else:
+            self.root.withdraw()
+            threading.Thread(target=self.tray_icon.run, daemon=True).start()
+    
+    def tray_ready(self, icon):
+        icon.visible = True
+        # An alarm that fired while the icon was starting up
+        with self.window_lock:
+            if self.pending_popups:
+                icon.stop()
     
     def show_from_tray(self):
+        # Called on the tray icon's thread, or the control server's for a second launch
+        self.is_minimized = False
+        if not self.window_open:
+            if self.tray_icon is None:
+                return
+            # Tray-only mode: run() rebuilds the window once the icon stops
+            self.tray_icon.stop()
+            return
+        self.dispatcher.post(self.restore_window)
+    
+    def restore_window(self):
         self.root.deiconify()
         self.root.lift()
-        self.is_minimized = False
         if self.tray_icon:
             self.tray_icon.stop()
     
+    def quit_from_tray(self):
+        # Called on the tray icon's thread; the window, if any, is closed from the Tk thread
+        if self.window_open:
+            self.dispatcher.post(self.quit_app)
+        else:
+            self.quit_app()
+    
     def on_closing(self):
         if messagebox.askyesno("Minimize to Tray", "Do you want to minimize to system tray instead of closing?"):
             self.minimize_to_tray()
@@ -656,86 +982,27 @@ class AlarmApp:
             self.quit_app()
     
     def quit_app(self):
-        self.save_settings()
+        self.quitting = True
+        self.control.stop()
+        self.engine.close()
         if self.tray_icon:
             self.tray_icon.stop()
-        self.root.quit()
-        sys.exit()
-    
-    def save_alarms(self):
-        os.makedirs("data", exist_ok=True)
-        with open("data/alarms.json", "w") as f:
-            json.dump(self.alarms, f, indent=2)
-    
-    def load_alarms(self):
-        try:
-            with open("data/alarms.json", "r") as f:
-                self.alarms = json.load(f)
-        except FileNotFoundError:
-            self.alarms = []
-    
-    def save_settings(self):
-        settings = {"theme": getattr(self, 'theme_var', 'dark'), "volume": self.volume_var.get()}
-        os.makedirs("data", exist_ok=True)
-        with open("data/settings.json", "w") as f:
-            json.dump(settings, f, indent=2)
-    
-    def load_settings(self):
-        try:
-            with open("data/settings.json", "r") as f:
-                settings = json.load(f)
-                self.theme_var = settings.get("theme", "dark")
-                if hasattr(self, 'volume_var'):
-                    self.volume_var.set(settings.get("volume", 0.7))
-                if hasattr(self, 'theme_switch'):
-                    self.theme_switch.set(self.theme_var == "light")
-        except FileNotFoundError:
-            self.theme_var = "dark"
+        if self.window_open:
+            self.root.quit()
+            sys.exit()
     
     def get_next_alarm(self):
         """Get the next upcoming alarm"""
-        if not self.alarms:
-            return None
-        
-        now = datetime.now()
-        upcoming_alarms = []
-        
-        for alarm in self.alarms:
-            if not alarm['enabled']:
-                continue
-            
-            # Calculate next occurrence
-            alarm_time = now.replace(hour=alarm['hour'], minute=alarm['minute'], second=0, microsecond=0)
-            
-            if alarm['days']:  # Recurring alarm
-                days_map = {'Mon': 0, 'Tue': 1, 'Wed': 2, 'Thu': 3, 'Fri': 4, 'Sat': 5, 'Sun': 6}
-                current_weekday = now.weekday()
-                
-                for day in alarm['days']:
-                    day_num = days_map[day]
-                    days_ahead = (day_num - current_weekday) % 7
-                    
-                    if days_ahead == 0:  # Today
-                        if alarm_time > now:
-                            upcoming_alarms.append((alarm_time, alarm))
-                        else:
-                            # Next week
-                            next_week = alarm_time + timedelta(days=7)
-                            upcoming_alarms.append((next_week, alarm))
-                    else:
-                        next_occurrence = alarm_time + timedelta(days=days_ahead)
-                        upcoming_alarms.append((next_occurrence, alarm))
-            else:  # One-time alarm
-                if alarm_time > now:
-                    upcoming_alarms.append((alarm_time, alarm))
-                else:
-                    # Tomorrow
-                    tomorrow = alarm_time + timedelta(days=1)
-                    upcoming_alarms.append((tomorrow, alarm))
-        
-        if upcoming_alarms:
-            return min(upcoming_alarms, key=lambda x: x[0])
-        return None
+        return self.engine.next_alarm()
+    
+    def prefetch_next_ringtone(self):
+        # Decode the ringtones of the next alarms shortly before they are due,
+        # including every alarm that rings in the same minute
+        next_alarm = self.get_next_alarm()
+        if next_alarm and seconds_until(next_alarm[0], datetime.now()) <= RINGTONE_PREFETCH_WINDOW.total_seconds():
+            due = self.engine.alarms_due_at(next_alarm[0])
+            for ringtone in {next_alarm[1].ringtone} | {alarm.ringtone for alarm in due}:
+                self.engine.prefetch_ringtone(ringtone)
     
     def update_countdown(self):
         """Update countdown display"""
@@ -743,20 +1010,21 @@ class AlarmApp:
         if next_alarm:
             alarm_time, alarm = next_alarm
             now = datetime.now()
-            time_diff = alarm_time - now
+            # Real elapsed time, so a DST change before the alarm is counted
+            time_diff = seconds_until(alarm_time, now)
             
-            if time_diff.total_seconds() > 0:
-                hours = int(time_diff.total_seconds() // 3600)
-                minutes = int((time_diff.total_seconds() % 3600) // 60)
+            if time_diff > 0:
+                hours = int(time_diff // 3600)
+                minutes = int((time_diff % 3600) // 60)
                 
                 if hours > 24:
                     days = hours // 24
                     hours = hours % 24
-                    countdown_text = f"⏳ Next: {alarm['label']} in {days}d {hours}h {minutes}m"
+                    countdown_text = f"⏳ Next: {alarm.label} in {days}d {hours}h {minutes}m"
                 elif hours > 0:
-                    countdown_text = f"⏳ Next: {alarm['label']} in {hours}h {minutes}m"
+                    countdown_text = f"⏳ Next: {alarm.label} in {hours}h {minutes}m"
                 else:
-                    countdown_text = f"⏳ Next: {alarm['label']} in {minutes}m"
+                    countdown_text = f"⏳ Next: {alarm.label} in {minutes}m"
                 
                 if hasattr(self, 'countdown_label'):
                     self.countdown_label.configure(text=countdown_text)
@@ -767,17 +1035,17 @@ class AlarmApp:
             if hasattr(self, 'countdown_label'):
                 self.countdown_label.configure(text="")
     
-    def countdown_updater(self):
-        """Background thread to update countdown every minute"""
+    def run(self):
         while True:
-            try:
-                self.update_countdown()
-                time.sleep(60)  # Update every minute
-            except:
+            self.root.mainloop()
+            if self.quitting or self.window_open:
                 break
-    
-    def run(self):
-        self.root.mainloop()
+            # Tray-only mode: the tray icon owns the main thread until Show, Quit or an alarm
+            self.tray_icon.run(setup=self.tray_ready)
+            self.tray_icon = None
+            if self.quitting:
+                break
+            self.build_window()
 
 if __name__ == "__main__":
     try:
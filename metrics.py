@@ -0,0 +1,125 @@
+"""
+Runtime metrics
+
+Fixed-size latency histograms for the things that decide whether an alarm is
+on time: how late the scheduler fired it, how long its sound took to start,
+how long until its popup was on screen, and how long disk writes, loading and
+list refreshes take. Each histogram is a fixed set of log-spaced millisecond
+buckets plus count, sum, min and max, so recording is O(1) and memory never
+grows. A snapshot can be shown in the Settings tab or exported as JSON to
+attach to a bug report.
+"""
+import bisect
+import json
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Upper bounds (ms) of the buckets; one more bucket takes everything slower
+BUCKET_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000, 300000]
+SNAPSHOT_VERSION = 1
+
+# Recorded metrics, in display order
+FIRE_LATENESS = "fire_lateness"
+AUDIO_START = "audio_start"
+POPUP_VISIBLE = "popup_visible"
+LOAD_ALARMS = "load_alarms"
+SAVE_ALARMS = "save_alarms"
+REFRESH_ALARMS_LIST = "refresh_alarms_list"
+DESCRIPTIONS = {
+    FIRE_LATENESS: "Alarm fired after its scheduled time",
+    AUDIO_START: "Starting an alarm's sound",
+    POPUP_VISIBLE: "Alarm due to popup on screen",
+    LOAD_ALARMS: "Loading alarms",
+    SAVE_ALARMS: "Writing alarms to disk",
+    REFRESH_ALARMS_LIST: "Refreshing the alarm list",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, ms):
+        ms = max(0.0, ms)
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.min = ms if self.min is None else min(self.min, ms)
+        self.max = ms if self.max is None else max(self.max, ms)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile (the max for the open-ended bucket)"""
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return min(BUCKET_BOUNDS[i], self.max) if i < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "min_ms": self.min,
+            "max_ms": self.max,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "buckets": {str(bound): n for bound, n in zip(BUCKET_BOUNDS + ["inf"], self.counts) if n},
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self._histograms = {name: Histogram() for name in DESCRIPTIONS}
+        self._lock = threading.Lock()
+        self.started = datetime.now()
+
+    def record(self, name, ms):
+        """Add one measurement in milliseconds; safe from any thread"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(ms)
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {name: histogram.snapshot() for name, histogram in self._histograms.items()}
+        return {
+            "version": SNAPSHOT_VERSION,
+            "taken": datetime.now().isoformat(timespec="seconds"),
+            "since": self.started.isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "metrics": histograms,
+        }
+
+    def export(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+METRICS = Metrics()
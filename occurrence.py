@@ -0,0 +1,258 @@
+"""
+Next-occurrence calculations for alarms
+
+Alarm times are wall-clock times in the alarm's zone (see zones.py); the
+occurrences returned are naive system-local datetimes whose .timestamp() is
+the exact instant, including across daylight-saving changes.
+"""
+from datetime import datetime, timedelta
+
+from zones import MAX_FOLD, ZONES, alarm_zone
+
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+# Wall-clock candidates tried before giving up (gap-skipped days, times already passed)
+MAX_CANDIDATES = 16
+
+
+def next_wall_time(alarm, after):
+    """First wall-clock time strictly after the naive wall time `after` matching the alarm's schedule"""
+    if alarm.rrule:
+        # Imported here: recurrence depends on this module for DAY_NAMES
+        from recurrence import OCCURRENCES
+        return OCCURRENCES.next_after(alarm, after)
+
+    candidate = after.replace(hour=alarm.hour, minute=alarm.minute, second=0, microsecond=0)
+    if candidate <= after:
+        candidate += timedelta(days=1)
+
+    if not alarm.days:
+        return candidate
+
+    for _ in range(7):
+        if DAY_NAMES[candidate.weekday()] in alarm.days:
+            return candidate
+        candidate += timedelta(days=1)
+    return None
+
+
+def next_occurrence(alarm, after):
+    """Return the first time strictly after `after` at which the alarm rings, or None"""
+    zone = alarm_zone(alarm.timezone)
+    after_timestamp = after.timestamp()
+    # Start a little early: in a repeated hour the next ring can be at an earlier wall time
+    wall = ZONES.to_wall(after_timestamp, zone) - MAX_FOLD
+    for _ in range(MAX_CANDIDATES):
+        wall = next_wall_time(alarm, wall)
+        if wall is None:
+            return None
+        for timestamp in ZONES.resolve(wall, zone):
+            if timestamp > after_timestamp:
+                return datetime.fromtimestamp(timestamp)
+    return None
+
+
+def seconds_until(when, now):
+    """Real seconds from `now` to `when` (naive local times), counting any DST change between"""
+    return when.timestamp() - now.timestamp()
+
+
+ALL_DAYS = 0x7F
+
+
+def days_to_mask(days):
+    """Pack a list of day names into a 7-bit weekday mask (bit 0 = Monday)"""
+    mask = 0
+    for day in days:
+        if day in DAY_NAMES:
+            mask |= 1 << DAY_NAMES.index(day)
+    return mask
+
+
+def mask_to_days(mask):
+    return [day for i, day in enumerate(DAY_NAMES) if mask & (1 << i)]
+
+
+class OccurrenceIndex:
+    """
+    Struct-of-arrays view of the alarm set for batch next-occurrence queries.
+
+    Hour and minute (as minute-of-day), the weekday mask and the enabled flag are
+    held in NumPy arrays, so the next fire time of every alarm is computed in one
+    vectorized pass instead of building datetimes per alarm and per weekday.
+    Alarms with an RRULE or their own time zone are left out of the arrays (mask
+    0, so never valid) and go through next_occurrence, as do alarms whose time
+    falls in a local wall-clock hour that a DST change in the window skips or
+    repeats; everything else is plain wall-clock arithmetic.
+
+    Positions are the AlarmStore's slots, so a single add, toggle or delete is
+    set() or clear() on one position; the arrays grow only when a slot lands
+    past their capacity.
+    """
+    # Eight day offsets: today, the next six days, and today next week
+    DAY_OFFSETS = 8
+    NEVER = 2 ** 62
+    MIN_CAPACITY = 64
+
+    def __init__(self, alarms=()):
+        import numpy as np
+        self._np = np
+        self._offsets = np.arange(self.DAY_OFFSETS, dtype=np.int64)
+        self.rebuild(alarms)
+
+    def _allocate(self, capacity, state=None):
+        np = self._np
+        alarms = [None] * capacity
+        minute_of_day = np.zeros(capacity, dtype=np.int64)
+        # Empty slots have mask 0 and are disabled, so they never ring
+        mask = np.zeros(capacity, dtype=np.uint8)
+        enabled = np.zeros(capacity, dtype=bool)
+        candidates = np.zeros((self.DAY_OFFSETS, capacity), dtype=np.int64)
+        if state is not None:
+            used = len(state[0])
+            alarms[:used] = state[0]
+            for new, old in zip((minute_of_day, mask, enabled), state[1:4]):
+                new[:used] = old
+            candidates[:, :used] = state[4]
+        return alarms, minute_of_day, mask, enabled, candidates
+
+    def rebuild(self, alarms):
+        """Reload every position; `alarms` is indexed by slot, with None for empty slots"""
+        alarms = list(alarms)
+        state = self._allocate(max(len(alarms), self.MIN_CAPACITY))
+        scalar = set()
+        for slot, alarm in enumerate(alarms):
+            if alarm is not None:
+                self._write(state, slot, alarm)
+                if alarm.rrule or alarm.timezone:
+                    scalar.add(slot)
+        # Swapped in together so readers on other threads always see a consistent set
+        self._state, self._scalar = state, frozenset(scalar)
+
+    def _write(self, state, slot, alarm):
+        alarms, minute_of_day, mask, enabled, candidates = state
+        # Disabled while half-written
+        enabled[slot] = False
+        alarms[slot] = alarm
+        minute_of_day[slot] = alarm.hour * 60 + alarm.minute
+        # One-time alarms ring at the next matching time on any day
+        mask[slot] = 0 if alarm.rrule or alarm.timezone else days_to_mask(alarm.days) or ALL_DAYS
+        candidates[:, slot] = self._offsets * 86400 + minute_of_day[slot] * 60
+        enabled[slot] = bool(alarm.enabled)
+
+    def set(self, slot, alarm):
+        """Put `alarm` at the store slot `slot`, replacing whatever was there"""
+        state = self._state
+        if slot >= len(state[0]):
+            state = self._allocate(max(slot + 1, 2 * len(state[0])), state)
+            self._state = state
+        self._write(state, slot, alarm)
+        scalar = bool(alarm.rrule or alarm.timezone)
+        if scalar != (slot in self._scalar):
+            self._scalar = self._scalar | {slot} if scalar else self._scalar - {slot}
+
+    def clear(self, slot):
+        """Empty the store slot `slot`, e.g. after its alarm was deleted"""
+        state = self._state
+        if slot >= len(state[0]):
+            return
+        state[3][slot] = False
+        state[2][slot] = 0
+        state[0][slot] = None
+        if slot in self._scalar:
+            self._scalar = self._scalar - {slot}
+
+    def _snapshot(self):
+        return self._state, self._scalar
+
+    def _scalar_positions(self, state, scalar, now):
+        alarms, minute_of_day = state[:2]
+        # Read apart from the arrays, so it may name a slot a concurrent rebuild() just dropped
+        scalar = {i for i in scalar if i < len(alarms)}
+        start = now.timestamp()
+        # From a little before now: just after a change, `now` can still be in its skipped or repeated hour
+        unstable = ZONES.unstable_walls(None, start - MAX_FOLD.total_seconds(), start + self.DAY_OFFSETS * 86400)
+        if not unstable:
+            return sorted(scalar)
+        # Local times a DST change skips or repeats need the policy-aware path
+        affected = self._np.zeros(len(alarms), dtype=bool)
+        for first, last in unstable:
+            first_minute = first.hour * 60 + first.minute
+            span = -(-(last - first).total_seconds() // 60)
+            affected |= (minute_of_day - first_minute) % 1440 < span
+        return sorted(scalar | set(self._np.flatnonzero(affected).tolist()))
+
+    def _next_fire_seconds(self, snapshot, now):
+        """(wall-clock seconds after `now`'s midnight per alarm, {position: exact datetime} from the scalar path)"""
+        np = self._np
+        state, scalar = snapshot
+        alarms, _, mask, enabled, candidates = state
+        now_seconds = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+        day_bits = (1 << ((now.weekday() + self._offsets) % 7)).astype(np.uint8)
+
+        valid = (mask[None, :] & day_bits[:, None]) != 0
+        valid[0] &= candidates[0] > now_seconds
+        valid &= enabled[None, :]
+
+        seconds = np.where(valid, candidates, self.NEVER).min(axis=0)
+        exact = {}
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0, fold=0)
+        for i in self._scalar_positions(state, scalar, now):
+            when = next_occurrence(alarms[i], now) if enabled[i] else None
+            if when is None:
+                seconds[i] = self.NEVER
+            else:
+                seconds[i] = int((when.replace(fold=0) - midnight).total_seconds())
+                exact[i] = when
+        return seconds, exact
+
+    def next_fire_seconds(self, now):
+        """Seconds after midnight of `now`'s day at which each alarm next rings (NEVER if it won't)"""
+        return self._next_fire_seconds(self._snapshot(), now)[0]
+
+    def _to_datetime(self, now, seconds, exact=None):
+        if exact is not None:
+            return exact
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0, fold=0)
+        return midnight + timedelta(seconds=int(seconds))
+
+    def next_alarm(self, now):
+        """Return (fire_time, alarm) for the alarm that rings soonest after `now`, or None"""
+        snapshot = self._snapshot()
+        alarms = snapshot[0][0]
+        if not alarms:
+            return None
+        seconds, exact = self._next_fire_seconds(snapshot, now)
+        position = int(seconds.argmin())
+        if seconds[position] == self.NEVER:
+            return None
+        return self._to_datetime(now, seconds[position], exact.get(position)), alarms[position]
+
+    def due_at(self, when):
+        """Alarms that ring in `when`'s minute"""
+        snapshot = self._snapshot()
+        alarms = snapshot[0][0]
+        minute = when.replace(second=0, microsecond=0)
+        after = datetime.fromtimestamp(minute.timestamp() - 60)
+        if not alarms:
+            return []
+        seconds, exact = self._next_fire_seconds(snapshot, after)
+        target = int((minute.replace(fold=0) - after.replace(hour=0, minute=0, second=0, fold=0)).total_seconds())
+        due = []
+        for i in self._np.flatnonzero(seconds == target).tolist():
+            # Around a DST change one wall time can be two instants; the scalar path knows which
+            if i not in exact or exact[i].timestamp() == minute.timestamp():
+                due.append(alarms[i])
+        return due
+
+    def top_k(self, now, k):
+        """Return the next k (fire_time, alarm) pairs in firing order"""
+        np = self._np
+        snapshot = self._snapshot()
+        alarms = snapshot[0][0]
+        if not alarms or k <= 0:
+            return []
+        seconds, exact = self._next_fire_seconds(snapshot, now)
+        k = min(k, len(seconds))
+        nearest = np.argpartition(seconds, k - 1)[:k]
+        nearest = nearest[np.argsort(seconds[nearest], kind="stable")]
+        return [(self._to_datetime(now, seconds[i], exact.get(int(i))), alarms[i]) for i in nearest if seconds[i] != self.NEVER]
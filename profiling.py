@@ -0,0 +1,168 @@
+"""
+Opt-in profiling of the UI and scheduler hot paths
+
+Switched on by the RINGRING_PROFILE environment variable (any value but "0")
+or the "profiling" setting. Chosen methods on live objects are wrapped so that
+cProfile runs only while one of them is executing, with one profile per thread.
+Every WRITE_INTERVAL seconds, and on quit, the CPU profile for that interval
+is written to data/profiles/ with a tracemalloc snapshot. Only the newest
+MAX_FILES of each kind are kept.
+
+    python -m pstats data/profiles/cpu-20250101-120000.pstats
+    tracemalloc.Snapshot.load("data/profiles/mem-20250101-120000.tracemalloc")
+
+When profiling is off nothing is wrapped, so the hot paths cost nothing extra.
+"""
+import functools
+import os
+import threading
+from datetime import datetime
+
+PROFILE_DIR = "data/profiles"
+ENV_VAR = "RINGRING_PROFILE"
+WRITE_INTERVAL = 300
+MAX_FILES = 12
+# Stack depth kept per allocation; deeper costs more memory while tracing
+TRACEMALLOC_FRAMES = 10
+
+
+def requested_by_environment():
+    return os.environ.get(ENV_VAR, "0") not in ("", "0")
+
+
+class _ThreadProfile:
+    """A thread's cProfile.Profile; the lock is held while it is collecting"""
+    __slots__ = ("profile", "lock", "depth")
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.lock = threading.Lock()
+        self.depth = 0
+
+
+class Profiler:
+    def __init__(self, directory=PROFILE_DIR, interval=WRITE_INTERVAL, max_files=MAX_FILES):
+        self.directory = directory
+        self.interval = interval
+        self.max_files = max_files
+        self.enabled = False
+        self._local = threading.local()
+        self._threads = []
+        self._threads_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._writer = None
+
+    def start(self):
+        if self.enabled:
+            return
+        # Imported here so a normal start doesn't pay for them
+        import cProfile
+        import tracemalloc
+        self._new_profile = cProfile.Profile
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.enabled = True
+        self._stopped.clear()
+        self._writer = threading.Thread(target=self._run, name="Profiler", daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self._stopped.set()
+        self._writer.join(5)
+        self.write()
+        self.enabled = False
+        import tracemalloc
+        tracemalloc.stop()
+
+    def instrument(self, obj, *names):
+        """Wrap the named methods of one object (an instance attribute shadows the class's method)"""
+        if not self.enabled:
+            return
+        for name in names:
+            setattr(obj, name, self.wrap(getattr(obj, name)))
+
+    def wrap(self, func):
+        @functools.wraps(func)
+        def profiled(*args, **kwargs):
+            state = self._enter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit(state)
+        return profiled
+
+    def _thread_profile(self):
+        state = getattr(self._local, "state", None)
+        if state is None:
+            state = self._local.state = _ThreadProfile(self._new_profile())
+            with self._threads_lock:
+                self._threads.append(state)
+        return state
+
+    def _enter(self):
+        state = self._thread_profile()
+        if state.depth == 0:
+            state.lock.acquire()
+            try:
+                state.profile.enable()
+            except ValueError:
+                # Another profiler (or debugger) owns the hook; skip this call
+                state.lock.release()
+                return None
+        state.depth += 1
+        return state
+
+    def _exit(self, state):
+        if state is None:
+            return
+        state.depth -= 1
+        if state.depth == 0:
+            state.profile.disable()
+            state.lock.release()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        """Write the CPU profile since the last write and a memory snapshot, then rotate old files"""
+        import pstats
+        import tracemalloc
+
+        stats = None
+        with self._threads_lock:
+            threads = list(self._threads)
+        for state in threads:
+            # Waits for the thread to leave the call it is profiling
+            with state.lock:
+                profile, state.profile = state.profile, self._new_profile()
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                # Nothing collected on that thread
+                pass
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if stats is not None and stats.stats:
+                stats.dump_stats(os.path.join(self.directory, f"cpu-{stamp}.pstats"))
+            if tracemalloc.is_tracing():
+                tracemalloc.take_snapshot().dump(os.path.join(self.directory, f"mem-{stamp}.tracemalloc"))
+            self._rotate()
+        except OSError as e:
+            print(f"Error writing profile: {e}")
+
+    def _rotate(self):
+        for prefix in ("cpu-", "mem-"):
+            # Timestamped names sort oldest first
+            files = sorted(name for name in os.listdir(self.directory) if name.startswith(prefix))
+            for name in files[:-self.max_files]:
+                os.remove(os.path.join(self.directory, name))
+
+
+PROFILER = Profiler()
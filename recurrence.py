@@ -0,0 +1,292 @@
+"""
+iCalendar-style recurrence rules for alarms
+
+Supports the RRULE parts that matter for alarm schedules: FREQ (DAILY, WEEKLY,
+MONTHLY), INTERVAL, BYDAY (with ordinals like 1MO or -1FR for monthly rules),
+BYMONTHDAY (negative counts from the month end), COUNT and UNTIL.
+
+Occurrences are produced lazily by a generator, one period (day, week or month)
+at a time. Rules without COUNT start at the period containing the time asked
+about instead of walking from DTSTART, and OccurrenceCache keeps each alarm's
+generator and next occurrence between queries, so a scheduler tick is normally
+a comparison against a cached datetime.
+"""
+import calendar
+import functools
+import threading
+from datetime import date, datetime, time, timedelta, timezone
+
+from occurrence import DAY_NAMES
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+WEEKDAY_CODES = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+# A rule that matches nothing for this many periods in a row is treated as finished
+MAX_EMPTY_PERIODS = 1000
+
+
+def _parse_until(value):
+    if "T" in value:
+        until = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+        if value.endswith("Z"):
+            until = until.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        return until
+    # A date-only UNTIL includes the whole day
+    return datetime.combine(datetime.strptime(value, "%Y%m%d").date(), time.max)
+
+
+class RecurrenceRule:
+    __slots__ = ("freq", "interval", "byday", "bymonthday", "count", "until", "text")
+
+    def __init__(self, freq, interval=1, byday=(), bymonthday=(), count=None, until=None, text=None):
+        self.freq = freq
+        self.interval = interval
+        # (ordinal or None, weekday 0-6)
+        self.byday = list(byday)
+        self.bymonthday = list(bymonthday)
+        self.count = count
+        self.until = until
+        self.text = text
+
+    @classmethod
+    def parse(cls, text):
+        """Parse 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR' (an 'RRULE:' prefix is allowed); raises ValueError"""
+        body = text.strip()
+        if body.upper().startswith("RRULE:"):
+            body = body[len("RRULE:"):]
+        parts = {}
+        for part in body.split(";"):
+            if not part.strip():
+                continue
+            name, sep, value = part.partition("=")
+            if not sep:
+                raise ValueError(f"bad rule part {part!r}")
+            parts[name.strip().upper()] = value.strip().upper()
+
+        freq = parts.pop("FREQ", None)
+        if freq not in FREQUENCIES:
+            raise ValueError(f"unsupported FREQ {freq!r}")
+        interval = int(parts.pop("INTERVAL", "1"))
+        if interval < 1:
+            raise ValueError("INTERVAL must be at least 1")
+
+        byday = []
+        for item in filter(None, parts.pop("BYDAY", "").split(",")):
+            code, ordinal = item[-2:], item[:-2]
+            if code not in WEEKDAY_CODES:
+                raise ValueError(f"bad BYDAY {item!r}")
+            ordinal = int(ordinal) if ordinal else None
+            if ordinal is not None and (freq != "MONTHLY" or ordinal == 0 or abs(ordinal) > 5):
+                raise ValueError(f"bad BYDAY ordinal {item!r}")
+            byday.append((ordinal, WEEKDAY_CODES.index(code)))
+
+        bymonthday = [int(day) for day in filter(None, parts.pop("BYMONTHDAY", "").split(","))]
+        if any(day == 0 or abs(day) > 31 for day in bymonthday):
+            raise ValueError("BYMONTHDAY out of range")
+
+        count = int(parts.pop("COUNT")) if "COUNT" in parts else None
+        if count is not None and count < 1:
+            raise ValueError("COUNT must be at least 1")
+        until = _parse_until(parts.pop("UNTIL")) if "UNTIL" in parts else None
+        if count is not None and until is not None:
+            raise ValueError("COUNT and UNTIL can't both be set")
+        parts.pop("WKST", None)
+        if parts:
+            raise ValueError(f"unsupported rule parts {', '.join(sorted(parts))}")
+        return cls(freq, interval, byday, bymonthday, count, until, body)
+
+    def __str__(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            parts.append("BYDAY=" + ",".join(f"{n or ''}{WEEKDAY_CODES[wd]}" for n, wd in self.byday))
+        if self.bymonthday:
+            parts.append("BYMONTHDAY=" + ",".join(str(day) for day in self.bymonthday))
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until:%Y%m%dT%H%M%S}")
+        return ";".join(parts)
+
+    def simple_days(self):
+        """Day names if this rule is just 'every week on these days', else None"""
+        if self.interval != 1 or self.bymonthday or self.count is not None or self.until is not None:
+            return None
+        if self.freq == "DAILY" and not self.byday:
+            return list(DAY_NAMES)
+        if self.freq in ("DAILY", "WEEKLY") and self.byday:
+            weekdays = {wd for _, wd in self.byday}
+            return [day for i, day in enumerate(DAY_NAMES) if i in weekdays]
+        return None
+
+    def describe(self):
+        """Short human-readable summary for the alarm list"""
+        unit = {"DAILY": "day", "WEEKLY": "week", "MONTHLY": "month"}[self.freq]
+        text = f"Every {unit}" if self.interval == 1 else f"Every {self.interval} {unit}s"
+        if self.byday:
+            names = []
+            for n, wd in self.byday:
+                ordinal = {1: "1st ", 2: "2nd ", 3: "3rd ", -1: "last "}.get(n, f"{n}th " if n else "")
+                names.append(ordinal + DAY_NAMES[wd])
+            text += " on " + ", ".join(names)
+        if self.bymonthday:
+            text += " on day " + ", ".join(str(day) for day in self.bymonthday)
+        if self.count is not None:
+            text += f", {self.count} times"
+        if self.until is not None:
+            text += f", until {self.until:%Y-%m-%d}"
+        return text
+
+    # Expansion
+
+    def _periods_between(self, start, moment):
+        """Whole periods from the one containing `start` to the one containing `moment`"""
+        if self.freq == "DAILY":
+            periods = (moment.date() - start.date()).days
+        elif self.freq == "WEEKLY":
+            periods = (moment.date() - start.date()).days + start.weekday() - moment.weekday()
+            periods //= 7
+        else:
+            periods = (moment.year - start.year) * 12 + moment.month - start.month
+        return max(0, periods // self.interval)
+
+    def _period(self, start, index):
+        """(first day of the period, sorted occurrence days in it)"""
+        step = index * self.interval
+        weekdays = {wd for _, wd in self.byday}
+        if self.freq == "DAILY":
+            day = start.date() + timedelta(days=step)
+            days = [day]
+            first = day
+        elif self.freq == "WEEKLY":
+            first = start.date() - timedelta(days=start.weekday()) + timedelta(weeks=step)
+            days = [first + timedelta(days=wd) for wd in sorted(weekdays or {start.weekday()})]
+            weekdays = set()
+        else:
+            month_index = start.month - 1 + step
+            year, month = start.year + month_index // 12, month_index % 12 + 1
+            first = date(year, month, 1)
+            return first, self._month_days(start, year, month)
+
+        if weekdays:
+            days = [day for day in days if day.weekday() in weekdays]
+        if self.bymonthday:
+            days = [day for day in days if self._matches_monthday(day)]
+        return first, days
+
+    def _matches_monthday(self, day):
+        length = calendar.monthrange(day.year, day.month)[1]
+        return any(day.day == (d if d > 0 else length + 1 + d) for d in self.bymonthday)
+
+    def _month_days(self, start, year, month):
+        length = calendar.monthrange(year, month)[1]
+        by_monthday = None
+        if self.bymonthday:
+            by_monthday = {d if d > 0 else length + 1 + d for d in self.bymonthday}
+            by_monthday = {d for d in by_monthday if 1 <= d <= length}
+        by_weekday = None
+        if self.byday:
+            by_weekday = set()
+            for ordinal, wd in self.byday:
+                first_wd = (wd - calendar.weekday(year, month, 1)) % 7 + 1
+                matches = list(range(first_wd, length + 1, 7))
+                if ordinal is None:
+                    by_weekday.update(matches)
+                elif -len(matches) <= ordinal <= len(matches):
+                    by_weekday.add(matches[ordinal - 1 if ordinal > 0 else ordinal])
+        if by_monthday is not None and by_weekday is not None:
+            days = by_monthday & by_weekday
+        elif by_monthday is not None or by_weekday is not None:
+            days = by_monthday if by_monthday is not None else by_weekday
+        else:
+            # Plain monthly: the day of DTSTART, skipping months that are too short
+            days = {start.day} if start.day <= length else set()
+        return [date(year, month, d) for d in sorted(days)]
+
+    def occurrences(self, start, after=None):
+        """
+        Yield occurrences from `start` (DTSTART) on, in order. With `after`, rules
+        without COUNT begin at the period containing it rather than at DTSTART.
+        """
+        index = 0
+        if after is not None and self.count is None and after > start:
+            index = self._periods_between(start, after)
+        emitted = 0
+        empty = 0
+        while empty < MAX_EMPTY_PERIODS:
+            first, days = self._period(start, index)
+            if self.until is not None and first > self.until.date():
+                return
+            found = False
+            for day in days:
+                when = datetime.combine(day, start.time())
+                if when < start:
+                    continue
+                if self.until is not None and when > self.until:
+                    return
+                found = True
+                yield when
+                emitted += 1
+                if self.count is not None and emitted >= self.count:
+                    return
+            empty = 0 if found else empty + 1
+            index += 1
+
+
+def alarm_start(alarm):
+    """DTSTART of a recurring alarm: its dtstart date (or creation date) at the alarm's time"""
+    start = alarm.dtstart or alarm.created
+    try:
+        day = datetime.fromisoformat(start).date()
+    except (TypeError, ValueError):
+        day = date.today()
+    return datetime.combine(day, time(alarm.hour, alarm.minute))
+
+
+class OccurrenceCache:
+    """Per-alarm lazy occurrence generators; an entry is dropped when its alarm's schedule changes"""
+
+    def __init__(self):
+        # alarm id -> [schedule key, generator, low, next occurrence after low]
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def next_after(self, alarm, after):
+        key = (alarm.rrule, alarm.dtstart, alarm.hour, alarm.minute)
+        with self._lock:
+            entry = self._entries.get(alarm.id)
+            if entry is None or entry[0] != key or after < entry[2]:
+                try:
+                    rule = RecurrenceRule.parse(alarm.rrule)
+                except ValueError as e:
+                    print(f"Error in recurrence of alarm {alarm.id}: {e}")
+                    return None
+                generator = rule.occurrences(alarm_start(alarm), after)
+                entry = [key, generator, after, self._advance(generator, after)]
+                self._entries[alarm.id] = entry
+            elif entry[3] is not None and entry[3] <= after:
+                entry[2] = after
+                entry[3] = self._advance(entry[1], after)
+            return entry[3]
+
+    def _advance(self, generator, after):
+        for when in generator:
+            if when > after:
+                return when
+        return None
+
+    def forget(self, alarm_id):
+        with self._lock:
+            self._entries.pop(alarm_id, None)
+
+
+OCCURRENCES = OccurrenceCache()
+
+
+@functools.lru_cache(maxsize=256)
+def describe_rrule(text):
+    """RecurrenceRule.describe for a stored rule string; cached for list redraws"""
+    try:
+        return RecurrenceRule.parse(text).describe()
+    except ValueError:
+        return "Invalid repeat rule"
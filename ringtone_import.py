@@ -0,0 +1,109 @@
+"""
+Ringtone import pipeline
+
+Importing a ringtone used to be a shutil.copy2 on the UI thread. Now the file
+is copied on a worker thread in chunks, hashed as it streams and reported
+through a progress callback. The content hash is looked up in the ringtone
+library first: a file that is already there (under any name) is not copied
+again. New files keep their human-readable name, with " (2)" etc. added if a
+different file already has it. Large WAVs are transcoded to OGG Vorbis when
+ffmpeg is on PATH, which keeps assets/ringtones small and loads faster.
+"""
+import hashlib
+import os
+import shutil
+import subprocess
+import threading
+import uuid
+
+from ringtone_library import HASH_CHUNK_SIZE, RINGTONES_PATH
+
+# WAVs bigger than this are transcoded to OGG when ffmpeg is available
+TRANSCODE_WAV_OVER = 5 * 1024 * 1024
+
+IMPORTED = "imported"
+DUPLICATE = "duplicate"
+FAILED = "failed"
+
+
+class RingtoneImporter:
+    def __init__(self, library, ringtones_path=RINGTONES_PATH, transcode_wav_over=TRANSCODE_WAV_OVER):
+        self.library = library
+        self.ringtones_path = ringtones_path
+        self.transcode_wav_over = transcode_wav_over
+        self.ffmpeg = shutil.which("ffmpeg")
+
+    def start(self, source, on_progress=None, on_done=None):
+        """Import on a worker thread; on_progress(done, total) and on_done(status, name) run on it too"""
+        def run():
+            status, name = self.import_file(source, on_progress)
+            if on_done is not None:
+                on_done(status, name)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def import_file(self, source, on_progress=None):
+        """Returns (status, ringtone name); name is the existing ringtone for a duplicate"""
+        os.makedirs(self.ringtones_path, exist_ok=True)
+        part_path = os.path.join(self.ringtones_path, f".import-{uuid.uuid4().hex}.part")
+        try:
+            sha256 = self._copy(source, part_path, on_progress)
+            existing = self.library.find_by_hash(sha256)
+            if existing is not None:
+                return DUPLICATE, existing
+
+            stem, ext = os.path.splitext(os.path.basename(source))
+            if ext.lower() == ".wav" and self.ffmpeg and os.path.getsize(part_path) > self.transcode_wav_over:
+                ogg_path = part_path[:-len(".part")] + ".ogg.part"
+                if self._transcode(part_path, ogg_path):
+                    os.remove(part_path)
+                    part_path, ext = ogg_path, ".ogg"
+
+            name = self._free_name(stem, ext)
+            os.replace(part_path, os.path.join(self.ringtones_path, name))
+            self.library.add(name, source_sha256=sha256)
+            return IMPORTED, name
+        except OSError as e:
+            print(f"Error importing ringtone {source}: {e}")
+            return FAILED, None
+        finally:
+            for path in (part_path, part_path[:-len(".part")] + ".ogg.part"):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _copy(self, source, destination, on_progress):
+        digest = hashlib.sha256()
+        total = os.path.getsize(source)
+        done = 0
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            for chunk in iter(lambda: src.read(HASH_CHUNK_SIZE), b""):
+                dst.write(chunk)
+                digest.update(chunk)
+                done += len(chunk)
+                if on_progress is not None:
+                    on_progress(done, total)
+        return digest.hexdigest()
+
+    def _transcode(self, source, destination):
+        try:
+            result = subprocess.run(
+                [self.ffmpeg, "-y", "-loglevel", "error", "-i", source, "-c:a", "libvorbis", "-q:a", "5", "-f", "ogg", destination],
+                capture_output=True, timeout=300,
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"Error transcoding ringtone: {e}")
+            return False
+        if result.returncode != 0:
+            print(f"Error transcoding ringtone: {result.stderr.decode(errors='replace').strip()}")
+            return False
+        return True
+
+    def _free_name(self, stem, ext):
+        name = stem + ext
+        n = 2
+        while os.path.exists(os.path.join(self.ringtones_path, name)):
+            name = f"{stem} ({n}){ext}"
+            n += 1
+        return name
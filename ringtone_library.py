@@ -0,0 +1,165 @@
+"""
+Ringtone library index
+
+Keeps data/ringtones.json with one entry per file in assets/ringtones: size,
+mtime, SHA-256 of the content, duration, sample rate, channel count and whether
+the file actually decodes. Loading the index is enough to fill the ringtone
+list, so the UI never has to list or open the folder itself.
+
+scan() brings the index up to date incrementally: files whose size and mtime
+match their entry are only stat()ed, and just the new or changed ones are hashed
+and probed. Files that fail to decode stay in the index flagged as broken, so
+they can be warned about and kept out of the picker.
+"""
+import hashlib
+import json
+import os
+import struct
+import threading
+import wave
+
+RINGTONES_PATH = "assets/ringtones"
+INDEX_PATH = "data/ringtones.json"
+RINGTONE_EXTENSIONS = (".mp3", ".wav", ".ogg")
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _probe_header(path):
+    """(sample_rate, channels, duration) from the file header where the format allows it"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".wav":
+        try:
+            with wave.open(path, "rb") as w:
+                return w.getframerate(), w.getnchannels(), w.getnframes() / w.getframerate()
+        except (wave.Error, EOFError, ZeroDivisionError):
+            # Compressed WAVs are not readable by the wave module; pygame may still play them
+            return None, None, None
+    if ext == ".ogg":
+        # The Vorbis identification header sits in the first page
+        with open(path, "rb") as f:
+            head = f.read(4096)
+        i = head.find(b"\x01vorbis")
+        if i >= 0 and len(head) >= i + 16:
+            channels, sample_rate = struct.unpack_from("<BI", head, i + 11)
+            return sample_rate, channels, None
+    return None, None, None
+
+
+def probe(path):
+    """Metadata for one ringtone file; decodes it with pygame when the mixer is running"""
+    info = {"sample_rate": None, "channels": None, "duration": None, "ok": True, "error": None}
+    try:
+        info["sample_rate"], info["channels"], info["duration"] = _probe_header(path)
+    except OSError as e:
+        info.update(ok=False, error=str(e))
+        return info
+
+    try:
+        import pygame
+        if pygame.mixer.get_init():
+            info["duration"] = pygame.mixer.Sound(path).get_length()
+    except Exception as e:
+        info.update(ok=False, error=str(e))
+    return info
+
+
+class RingtoneLibrary:
+    def __init__(self, ringtones_path=RINGTONES_PATH, index_path=INDEX_PATH):
+        self.ringtones_path = ringtones_path
+        self.index_path = index_path
+        # name -> metadata dict; replaced wholesale by scan() so readers never see it half-updated
+        self._entries = {}
+        self._scan_lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f).get("ringtones", {})
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def save(self, entries):
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "ringtones": entries}, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def get(self, name):
+        return self._entries.get(name)
+
+    def names(self, include_broken=False):
+        entries = self._entries
+        return sorted(name for name, entry in entries.items() if include_broken or entry["ok"])
+
+    def broken(self):
+        entries = self._entries
+        return sorted(name for name, entry in entries.items() if not entry["ok"])
+
+    def find_by_hash(self, sha256):
+        """Name of the ringtone with this content, or that was imported (e.g. transcoded) from it"""
+        for name, entry in self._entries.items():
+            if sha256 in (entry["sha256"], entry.get("source_sha256")):
+                return name
+        return None
+
+    def _index_file(self, name, path, stat):
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_sha256(path)}
+        entry.update(probe(path))
+        if not entry["ok"]:
+            print(f"Ringtone {name} can't be played: {entry['error']}")
+        return entry
+
+    def add(self, name, **extra):
+        """Index one file that was just placed in the folder; extra fields are kept with its entry"""
+        path = os.path.join(self.ringtones_path, name)
+        with self._scan_lock:
+            entry = self._index_file(name, path, os.stat(path))
+            entry.update(extra)
+            entries = dict(self._entries)
+            entries[name] = entry
+            self._entries = entries
+            self.save(entries)
+        return entry
+
+    def scan(self):
+        """Bring the index in line with the folder; returns True if anything changed"""
+        with self._scan_lock:
+            old = self._entries
+            entries = {}
+            changed = False
+            try:
+                files = [e for e in os.scandir(self.ringtones_path)
+                         if e.is_file() and e.name.lower().endswith(RINGTONE_EXTENSIONS)]
+            except FileNotFoundError:
+                files = []
+
+            for file in files:
+                stat = file.stat()
+                entry = old.get(file.name)
+                if entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                    entries[file.name] = entry
+                    continue
+                try:
+                    entries[file.name] = self._index_file(file.name, file.path, stat)
+                except OSError as e:
+                    print(f"Error reading ringtone {file.name}: {e}")
+                    continue
+                changed = True
+
+            changed = changed or entries.keys() != old.keys()
+            if changed:
+                self._entries = entries
+                try:
+                    self.save(entries)
+                except OSError as e:
+                    print(f"Error saving ringtone index: {e}")
+            return changed
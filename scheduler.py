@@ -0,0 +1,269 @@
+"""
+Deadline-driven alarm scheduler
+
+Instead of waking every second and scanning every alarm, the scheduler keeps a
+min-heap of upcoming fire times and sleeps until the earliest one is due. A
+change to one alarm (add, toggle, delete, snooze) calls reschedule() with its
+id, which wakes the thread to push that alarm's next occurrence; the entry it
+had is left in the heap and skipped when it surfaces. Only changes that affect
+every alarm (startup, a clock jump, a DST policy) rebuild the whole heap, and
+that is computed with the lock released so callers never wait on it.
+
+Firing never depends on hitting an exact second: every deadline at or before
+the current time is due, so sleep drift, GC pauses and suspend/resume only make
+an alarm late, never lost. Wall-clock jumps are detected by comparing wall time
+against the monotonic clock, and what happens to occurrences that were missed
+is decided by the catch-up policy.
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from metrics import FIRE_LATENESS, METRICS
+from occurrence import next_occurrence
+from zones import ZONES
+
+# Catch-up policies for occurrences missed while asleep, suspended or busy
+CATCH_UP_FIRE_LATE = "fire_late"   # fire every missed occurrence, late
+CATCH_UP_COALESCE = "coalesce"     # fire once per alarm, however many were missed
+CATCH_UP_DROP = "drop"             # like coalesce, but drop if later than the window
+CATCH_UP_POLICIES = (CATCH_UP_FIRE_LATE, CATCH_UP_COALESCE, CATCH_UP_DROP)
+
+# Never sleep longer than this, so suspend and clock changes are noticed promptly
+MAX_SLEEP = 60
+# Wall vs monotonic disagreement (seconds) treated as a clock jump
+CLOCK_JUMP_THRESHOLD = 5
+# A backward jump larger than this is treated as a clock correction, not a repeat
+MAX_BACKWARD_GUARD = 6 * 3600
+
+
+class AlarmScheduler:
+    def __init__(self, get_alarms, on_fire, catch_up_policy=CATCH_UP_COALESCE, catch_up_minutes=10):
+        # get_alarms() returns the current AlarmStore,
+        # on_fire(alarm, scheduled) is called when an occurrence is due
+        self._get_alarms = get_alarms
+        self._on_fire = on_fire
+        # (timestamp, entry, alarm_id); an entry is live while _entries[alarm_id] is its number
+        self._heap = []
+        self._alarms_by_id = {}
+        self._entries = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._dirty = True
+        # Ids of alarms changed since the last pass
+        self._changed = set()
+        self._running = False
+        self._thread = None
+
+        self.catch_up_policy = catch_up_policy
+        self.catch_up_minutes = catch_up_minutes
+
+        # Last evaluation point on both clocks, and the furthest wall time already handled
+        self._last_wall = None
+        self._last_mono = None
+        self._evaluated_until = None
+
+        # (alarm_id, scheduled, fired_at, lateness_seconds) for recent fires and drops
+        self.fire_log = deque(maxlen=200)
+        self.dropped_log = deque(maxlen=200)
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="AlarmScheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+    def reschedule(self, alarm_ids=None):
+        """Wake the scheduler thread for changes to the given alarms, or to every alarm when alarm_ids is None"""
+        with self._cond:
+            if alarm_ids is None:
+                self._dirty = True
+            else:
+                self._changed.update(alarm_ids)
+            self._cond.notify()
+
+    def set_catch_up_policy(self, policy, minutes=None):
+        if policy not in CATCH_UP_POLICIES:
+            raise ValueError(f"Unknown catch-up policy: {policy}")
+        with self._cond:
+            self.catch_up_policy = policy
+            if minutes is not None:
+                self.catch_up_minutes = minutes
+
+    def next_deadline(self):
+        """Return (fire_time, alarm) for the earliest scheduled alarm, or None"""
+        with self._cond:
+            self._drop_stale()
+            if not self._heap:
+                return None
+            timestamp, _, alarm_id = self._heap[0]
+            return datetime.fromtimestamp(timestamp), self._alarms_by_id[alarm_id]
+
+    def _push(self, alarm, after):
+        fire_time = next_occurrence(alarm, after)
+        if fire_time is not None:
+            entry = next(self._seq)
+            self._entries[alarm.id] = entry
+            heapq.heappush(self._heap, (fire_time.timestamp(), entry, alarm.id))
+
+    def _build(self, alarms, after):
+        """A fresh heap for the enabled alarms; touches no shared state, so it runs without the lock"""
+        heap, alarms_by_id, entries = [], {}, {}
+        for alarm in alarms:
+            if not alarm.enabled:
+                continue
+            fire_time = next_occurrence(alarm, after)
+            if fire_time is None:
+                continue
+            entry = next(self._seq)
+            heap.append((fire_time.timestamp(), entry, alarm.id))
+            alarms_by_id[alarm.id] = alarm
+            entries[alarm.id] = entry
+        heapq.heapify(heap)
+        return heap, alarms_by_id, entries
+
+    def _rebuild(self, after):
+        """Replace the heap; called with the lock held, which is released while occurrences are computed"""
+        self._dirty = False
+        # The build reads every alarm as it is now, so earlier single-alarm changes are included
+        self._changed.clear()
+        alarms = list(self._get_alarms())
+        self._cond.release()
+        try:
+            built = self._build(alarms, after)
+        finally:
+            self._cond.acquire()
+        self._heap, self._alarms_by_id, self._entries = built
+
+    def _apply_changes(self, after):
+        """Re-push each changed alarm; whatever it had in the heap goes stale"""
+        alarms = self._get_alarms()
+        changed, self._changed = self._changed, set()
+        for alarm_id in changed:
+            self._entries.pop(alarm_id, None)
+            self._alarms_by_id.pop(alarm_id, None)
+            alarm = alarms.get(alarm_id)
+            if alarm is not None and alarm.enabled:
+                self._alarms_by_id[alarm_id] = alarm
+                self._push(alarm, after)
+        # Stale entries are skipped when they surface; clear them out once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [item for item in self._heap if self._entries.get(item[2]) == item[1]]
+            heapq.heapify(self._heap)
+
+    def _drop_stale(self):
+        while self._heap and self._entries.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+
+    def _latest_missed(self, alarm, scheduled, now):
+        """Walk forward from a missed occurrence to the most recent one not after now"""
+        while True:
+            following = next_occurrence(alarm, scheduled)
+            if following is None or following > now:
+                return scheduled
+            scheduled = following
+
+    def _pop_due(self, now):
+        due = []
+        timestamp = now.timestamp()
+        alarms = self._get_alarms()
+        while self._heap and self._heap[0][0] <= timestamp:
+            fire_timestamp, entry, alarm_id = heapq.heappop(self._heap)
+            if self._entries.get(alarm_id) != entry:
+                # Superseded by a change to the alarm
+                continue
+            alarm = self._alarms_by_id[alarm_id]
+            if not alarm.enabled or alarm_id not in alarms:
+                # Disabled or deleted since it was scheduled, before the change was applied
+                del self._entries[alarm_id]
+                del self._alarms_by_id[alarm_id]
+                continue
+            scheduled = datetime.fromtimestamp(fire_timestamp)
+
+            if self.catch_up_policy == CATCH_UP_FIRE_LATE:
+                # The next occurrence may be overdue too; it comes round on this same pass
+                due.append((alarm, scheduled))
+                self._push(alarm, scheduled)
+                continue
+
+            scheduled = self._latest_missed(alarm, scheduled, now)
+            lateness = timestamp - scheduled.timestamp()
+            if self.catch_up_policy == CATCH_UP_DROP and lateness > self.catch_up_minutes * 60:
+                self.dropped_log.append((alarm_id, scheduled, now, lateness))
+            else:
+                due.append((alarm, scheduled))
+            self._push(alarm, now)
+        return due
+
+    def _check_clock(self, now, mono):
+        """Detect wall-clock jumps; returns the wall time from which to rebuild, or None"""
+        rebuild_from = None
+        if self._last_wall is not None:
+            skew = (now.timestamp() - self._last_wall) - (mono - self._last_mono)
+            if abs(skew) > CLOCK_JUMP_THRESHOLD:
+                # Possibly a change of system time zone: rebuild the local offset tables too
+                ZONES.clear()
+                rebuild_from = now
+                if skew < 0 and -skew <= MAX_BACKWARD_GUARD:
+                    # Clock went back: don't ring again for times we already handled
+                    rebuild_from = max(now, self._evaluated_until)
+                elif skew < 0:
+                    self._evaluated_until = now
+        self._last_wall = now.timestamp()
+        self._last_mono = mono
+        return rebuild_from
+
+    def _tick(self, now, mono):
+        """One pass of the loop, called with the lock held; returns the (alarm, scheduled) pairs now due"""
+        rebuild_from = self._check_clock(now, mono)
+
+        # Collect what the old heap says is due before rebuilding, so a
+        # change landing right on a deadline cannot swallow that alarm
+        due = self._pop_due(now)
+        if self._evaluated_until is None or now > self._evaluated_until:
+            self._evaluated_until = now
+
+        # After the clock went back, `now` can be behind times already handled
+        if self._dirty or rebuild_from is not None:
+            self._rebuild(rebuild_from or self._evaluated_until)
+        if self._changed:
+            self._apply_changes(self._evaluated_until)
+        self._drop_stale()
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = datetime.now()
+                due = self._tick(now, time.monotonic())
+                if not due:
+                    if self._dirty or self._changed:
+                        # Changed while the heap was being rebuilt without the lock
+                        continue
+                    timeout = MAX_SLEEP
+                    if self._heap:
+                        timeout = min(timeout, max(0, self._heap[0][0] - now.timestamp()))
+                    self._cond.wait(timeout)
+                    continue
+
+            for alarm, scheduled in due:
+                fired_at = datetime.now()
+                lateness = fired_at.timestamp() - scheduled.timestamp()
+                self.fire_log.append((alarm.id, scheduled, fired_at, lateness))
+                METRICS.record(FIRE_LATENESS, lateness * 1000)
+                try:
+                    self._on_fire(alarm, scheduled)
+                except Exception as e:
+                    print(f"Error firing alarm: {e}")
@@ -4,7 +4,7 @@ import os
 
 # Dependencies are automatically detected, but it might need fine tuning.
 build_options = {
-    'packages': ['tkinter', 'customtkinter', 'pygame', 'PIL', 'pystray', 'threading', 'json', 'datetime', 'distutils'],
+    'packages': ['tkinter', 'customtkinter', 'pygame', 'PIL', 'pystray', 'numpy', 'zoneinfo', 'tzdata', 'threading', 'json', 'datetime', 'distutils'],
     'excludes': [],
     'include_files': [
         ('assets/', 'assets/'),
@@ -23,7 +23,15 @@ executables = [
         base=base,
         target_name='RingRing.exe',
         icon='assets/logo/app_icon.ico'
-    )
+    ),
+    # Console command line; never imports the GUI libraries. Named apart from
+    # RingRing.exe because Windows file names are case-insensitive
+    Executable(
+        'cli.py',
+        base=None,
+        target_name='ringring-cli.exe',
+        icon='assets/logo/app_icon.ico'
+    ),
 ]
 
 setup(
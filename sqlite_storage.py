@@ -0,0 +1,255 @@
+"""
+SQLite storage backend
+
+An alternative to the JSON snapshot/journal files. Alarms and settings live in
+data/ringring.db, one row per alarm, so a change writes one row instead of the
+whole list. The alarms table is indexed on (enabled, hour, minute) and on
+(enabled, days_mask), so "what rings at this minute" and "what rings next" are
+index lookups rather than table scans. Alarms with an RRULE or their own time
+zone, and local alarms in an hour a DST change skips or repeats, go through
+next_occurrence, as they do in the occurrence index.
+
+The database runs in WAL mode and all writes go through one writer thread, so
+the UI thread only ever enqueues a write and its reads never wait on a writer.
+On first use, data/alarms.json (with its journal) and data/settings.json are
+migrated in once.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from alarm_store import Alarm, AlarmStore
+from metrics import METRICS, SAVE_ALARMS
+from occurrence import days_to_mask, next_occurrence
+from storage import JournalStorage
+from zones import MAX_FOLD, ZONES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alarms (
+    id INTEGER PRIMARY KEY,
+    hour INTEGER NOT NULL,
+    minute INTEGER NOT NULL,
+    days_mask INTEGER NOT NULL DEFAULT 0,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS alarms_by_time ON alarms (enabled, hour, minute);
+CREATE INDEX IF NOT EXISTS alarms_by_days ON alarms (enabled, days_mask);
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+# days_mask of alarms with an RRULE or their own time zone: outside the weekday
+# bits, so the SQL day filters never match them and they are evaluated in Python instead
+SCALAR_MASK = 0x80
+# Queued by compact(); run by the writer after a commit, never inside a transaction
+CHECKPOINT = "checkpoint"
+# Days ahead next_alarm looks: today, the next six days, and today next week
+DAYS_AHEAD = 8
+
+UPSERT_ALARM = "INSERT OR REPLACE INTO alarms (id, hour, minute, days_mask, enabled, data) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+def _alarm_row(alarm):
+    data = alarm.to_dict()
+    days_mask = SCALAR_MASK if alarm.rrule or alarm.timezone else days_to_mask(alarm.days)
+    return (alarm.id, alarm.hour, alarm.minute, days_mask, int(alarm.enabled), json.dumps(data))
+
+
+def _unstable_ranges(start, end):
+    """
+    SQL condition and parameters matching the local wall times that DST changes
+    between two POSIX times skip or repeat, as (hour, minute) ranges so the time
+    index serves them; ("0", []) when there are none
+    """
+    ranges = []
+    for first, last in ZONES.unstable_walls(None, start - MAX_FOLD.total_seconds(), end):
+        low = first.hour * 60 + first.minute
+        high = low + int(-(-(last - first).total_seconds() // 60))
+        # A range running past midnight is split in two
+        for low, high in [(low, min(high, 1440))] + ([(0, high - 1440)] if high > 1440 else []):
+            ranges.append((low // 60, low % 60, high // 60, high % 60))
+    if not ranges:
+        return "0", []
+    condition = " OR ".join(["((hour, minute) >= (?, ?) AND (hour, minute) < (?, ?))"] * len(ranges))
+    return f"({condition})", [value for bounds in ranges for value in bounds]
+
+
+class SqliteStorage:
+    def __init__(self, store, path="data/ringring.db", legacy_alarms="data/alarms.json", legacy_settings="data/settings.json"):
+        self.store = store
+        self.path = path
+        self._local = threading.local()
+        self._queue = queue.Queue()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._reader()
+        conn.executescript(SCHEMA)
+        self._migrate(conn, legacy_alarms, legacy_settings)
+
+        self._writer = threading.Thread(target=self._write_loop, name="SqliteWriter", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        # One connection per thread; under WAL, readers never block on the writer
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _migrate(self, conn, legacy_alarms, legacy_settings):
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated'").fetchone():
+            return
+
+        legacy = AlarmStore()
+        if os.path.exists(legacy_alarms):
+            JournalStorage(legacy, legacy_alarms, os.path.splitext(legacy_alarms)[0] + ".journal").load()
+        settings = {}
+        try:
+            with open(legacy_settings, "r") as f:
+                settings = json.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+
+        with conn:
+            conn.executemany(UPSERT_ALARM, [_alarm_row(alarm) for alarm in legacy])
+            conn.executemany("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                             [(key, json.dumps(value)) for key, value in settings.items()])
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (str(legacy.to_data()["next_id"]),))
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated', '1')")
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            # Whatever queued up meanwhile goes into the same transaction
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            try:
+                # Timed here, where the transaction commits, not where it was queued
+                with METRICS.timer(SAVE_ALARMS), conn:
+                    for op in batch:
+                        if op is None or op == CHECKPOINT:
+                            continue
+                        sql, params = op
+                        if isinstance(params, list):
+                            conn.executemany(sql, params)
+                        else:
+                            conn.execute(sql, params)
+                if CHECKPOINT in batch:
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                print(f"Error writing alarms database: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                conn.close()
+                return
+
+    def load(self):
+        """Load every alarm into the in-memory store"""
+        conn = self._reader()
+        records = [json.loads(data) for (data,) in conn.execute("SELECT data FROM alarms ORDER BY id")]
+        row = conn.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        self.store.load_data({"next_id": int(row[0]) if row else 1, "alarms": records})
+
+    def put(self, alarm):
+        self._queue.put((UPSERT_ALARM, _alarm_row(alarm)))
+        self._queue.put(("UPDATE meta SET value = max(CAST(value AS INTEGER), ?) WHERE key = 'next_id'", (alarm.id + 1,)))
+
+    def put_many(self, alarms):
+        rows = [_alarm_row(alarm) for alarm in alarms]
+        if rows:
+            self._queue.put((UPSERT_ALARM, rows))
+            self._queue.put(("UPDATE meta SET value = max(CAST(value AS INTEGER), ?) WHERE key = 'next_id'", (max(row[0] for row in rows) + 1,)))
+
+    def delete(self, alarm_id):
+        self._queue.put(("DELETE FROM alarms WHERE id = ?", (alarm_id,)))
+
+    def compact(self):
+        self._queue.put(CHECKPOINT)
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+
+    def load_settings(self):
+        rows = self._reader().execute("SELECT key, value FROM settings")
+        return {key: json.loads(value) for key, value in rows}
+
+    def save_settings(self, settings):
+        rows = [(key, json.dumps(value)) for key, value in settings.items()]
+        self._queue.put(("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", rows))
+
+    def _wait_for_writes(self):
+        # Queries see every write queued before them, e.g. an alarm just added
+        self._queue.join()
+
+    def alarms_due_at(self, when):
+        """Enabled alarms (as dicts) that ring in `when`'s minute"""
+        self._wait_for_writes()
+        minute = when.replace(second=0, microsecond=0)
+        start = minute.timestamp()
+        unstable, params = _unstable_ranges(start, start + 60)
+        due = [json.loads(data) for (data,) in self._reader().execute(
+            "SELECT data FROM alarms WHERE enabled = 1 AND hour = ? AND minute = ? "
+            f"AND (days_mask = 0 OR days_mask & ?) AND NOT {unstable}",
+            [minute.hour, minute.minute, 1 << minute.weekday()] + params,
+        )]
+        after = datetime.fromtimestamp(start - 60)
+        for data in self._scalar(unstable, params):
+            when = next_occurrence(Alarm.from_dict(data, data["id"]), after)
+            if when is not None and when.timestamp() == start:
+                due.append(data)
+        return due
+
+    def next_alarm(self, now):
+        """Return (fire_time, alarm dict) for the next enabled alarm after `now`, or None"""
+        self._wait_for_writes()
+        start = now.timestamp()
+        unstable, params = _unstable_ranges(start, start + DAYS_AHEAD * 86400)
+        best = self._next_weekly(now, unstable, params)
+        for data in self._scalar(unstable, params):
+            when = next_occurrence(Alarm.from_dict(data, data["id"]), now)
+            if when is not None and (best is None or when.timestamp() < best[0].timestamp()):
+                best = when, data
+        return best
+
+    def _scalar(self, unstable, params):
+        """Enabled alarms that need next_occurrence: RRULE and time-zone alarms, and local ones at unstable times"""
+        conn = self._reader()
+        rows = conn.execute("SELECT data FROM alarms WHERE enabled = 1 AND days_mask = ?", (SCALAR_MASK,)).fetchall()
+        if params:
+            rows += conn.execute(f"SELECT data FROM alarms WHERE enabled = 1 AND days_mask != ? AND {unstable}",
+                                 [SCALAR_MASK] + params).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def _next_weekly(self, now, unstable, params):
+        """The earliest local alarm by plain wall-clock arithmetic, leaving out times at unstable hours"""
+        conn = self._reader()
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0, fold=0)
+        for offset in range(DAYS_AHEAD):
+            day_bit = 1 << ((now.weekday() + offset) % 7)
+            # Walks the time index in order and stops at the first alarm set for that day
+            sql = (f"SELECT hour, minute, data FROM alarms WHERE enabled = 1 AND (days_mask = 0 OR days_mask & ?) "
+                   f"AND NOT {unstable}{' AND (hour, minute) > (?, ?)' if offset == 0 else ''} "
+                   "ORDER BY hour, minute LIMIT 1")
+            row = conn.execute(sql, [day_bit] + params + ([now.hour, now.minute] if offset == 0 else [])).fetchone()
+            if row:
+                hour, minute, data = row
+                return midnight + timedelta(days=offset, hours=hour, minutes=minute), json.loads(data)
+        return None
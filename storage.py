@@ -0,0 +1,140 @@
+"""
+Write-ahead journal persistence for alarms
+
+data/alarms.json holds a snapshot of the AlarmStore. Every mutation after that
+is appended as one small JSON line to data/alarms.journal, so clicking a switch
+costs a few hundred bytes of I/O instead of re-serializing the whole list. On
+startup the store is rebuilt by loading the snapshot and replaying the journal.
+Once the journal grows past a threshold it is folded into a fresh snapshot on a
+background thread; the snapshot is written to a temp file and swapped in with an
+atomic rename, so a crash at any point leaves a loadable pair of files.
+"""
+import json
+import os
+import threading
+
+from metrics import METRICS, SAVE_ALARMS
+
+
+class JournalStorage:
+    def __init__(self, store, snapshot_path="data/alarms.json", journal_path="data/alarms.journal", compact_after=500):
+        self.store = store
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        # Journal being folded into a snapshot; replayed on startup if a compaction was interrupted
+        self.compacting_path = journal_path + ".compacting"
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._journal = None
+        self._records = 0
+        self._compacting = False
+
+    def load(self):
+        """Rebuild the store from snapshot plus journal"""
+        store = self.store
+        with self._lock:
+            try:
+                # Older files (a bare list with colliding ids) are upgraded on load
+                store.load(self.snapshot_path)
+            except FileNotFoundError:
+                store.clear()
+
+            self._records = 0
+            for path in (self.compacting_path, self.journal_path):
+                self._records += self._replay(store, path)
+
+    def _replay(self, store, path):
+        count = 0
+        good_length = 0
+        try:
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete record")
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash mid-append: cut it off so new
+                        # records don't get glued onto the fragment
+                        f.close()
+                        with open(path, "r+b") as torn:
+                            torn.truncate(good_length)
+                        break
+                    if record.get("op") == "put":
+                        store.upsert(record["alarm"])
+                    elif record.get("op") == "delete":
+                        store.remove(record["id"])
+                    good_length += len(line)
+                    count += 1
+        except FileNotFoundError:
+            pass
+        return count
+
+    def _append(self, *records):
+        # Several records go out in one write and one fsync
+        lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        with self._lock:
+            if self._journal is None:
+                os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+                self._journal = open(self.journal_path, "a", encoding="utf-8")
+            with METRICS.timer(SAVE_ALARMS):
+                self._journal.write(lines)
+                self._journal.flush()
+                os.fsync(self._journal.fileno())
+            self._records += len(records)
+            compact = self._records >= self.compact_after and not self._compacting
+            if compact:
+                self._compacting = True
+        if compact:
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def put(self, alarm):
+        self._append({"op": "put", "alarm": alarm.to_dict()})
+
+    def put_many(self, alarms):
+        records = [{"op": "put", "alarm": alarm.to_dict()} for alarm in alarms]
+        if records:
+            self._append(*records)
+
+    def delete(self, alarm_id):
+        self._append({"op": "delete", "id": alarm_id})
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot"""
+        with self._compact_lock:
+            self._compact()
+
+    def _compact(self):
+        with self._lock:
+            self._compacting = True
+            # Take the snapshot and start a new journal at the same instant, so every
+            # record is either in the snapshot or in the new journal
+            data = self.store.to_data()
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if os.path.exists(self.journal_path) and not os.path.exists(self.compacting_path):
+                os.replace(self.journal_path, self.compacting_path)
+            self._records = 0
+
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+            tmp_path = self.snapshot_path + ".tmp"
+            with METRICS.timer(SAVE_ALARMS):
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+            if os.path.exists(self.compacting_path):
+                os.remove(self.compacting_path)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
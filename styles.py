@@ -0,0 +1,85 @@
+"""
+Shared fonts, colours and theme switching
+
+Widgets used to create a fresh CTkFont for nearly every label, which meant
+dozens of Tk named fonts per alarm card. The registry interns one font per
+(size, weight) and one colour pair per role, and every widget gets a shared
+handle.
+
+Theme changes go through apply_theme() rather than ctk.set_appearance_mode,
+which redraws every widget of every tab, in creation order, before returning.
+apply_theme collects the widgets itself: the ones on screen are restyled in
+one pass and painted with a single update_idletasks, and the hidden ones
+(other tabs, pooled cards out of view) follow in idle-time chunks.
+"""
+import customtkinter as ctk
+
+# (light, dark) colour pairs by role
+COLORS = {
+    "danger": ("#dc3545", "#dc3545"),
+    "danger_hover": ("#c82333", "#c82333"),
+}
+# Hidden widgets restyled per idle callback after a theme switch
+RESTYLE_CHUNK = 100
+
+
+class StyleRegistry:
+    def __init__(self, root):
+        self.root = root
+        self._fonts = {}
+        # Bumped by each theme switch, so a newer switch cancels an older one's deferred chunks
+        self._switches = 0
+
+    def font(self, size, weight="normal"):
+        """Shared CTkFont for this size and weight; needs a Tk root to exist"""
+        key = (size, weight)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts[key] = ctk.CTkFont(size=size, weight=weight)
+        return font
+
+    def color(self, role):
+        return COLORS[role]
+
+    def apply_theme(self, mode):
+        """Switch appearance mode ("light" or "dark") with one redraw pass; a no-op if already in effect"""
+        if ctk.get_appearance_mode().lower() == mode:
+            return
+        tracker = ctk.AppearanceModeTracker
+        # Widgets register a callback that restyles and redraws them
+        callbacks = list(tracker.callback_list)
+        # Record the mode without CustomTkinter's own cascade over every callback
+        tracker.appearance_mode_set_by = "user"
+        tracker.appearance_mode = 1 if mode == "dark" else 0
+        mode_name = "Dark" if mode == "dark" else "Light"
+
+        visible, hidden = [], []
+        for callback in callbacks:
+            widget = getattr(callback, "__self__", None)
+            try:
+                on_screen = widget is None or not hasattr(widget, "winfo_viewable") or widget.winfo_viewable()
+            except Exception:
+                # Destroyed; its callback is about to be removed
+                continue
+            (visible if on_screen else hidden).append(callback)
+
+        self._restyle(visible, mode_name)
+        self.root.update_idletasks()
+        self._switches += 1
+        if hidden:
+            self.root.after_idle(self._restyle_later, hidden, mode_name, self._switches)
+
+    def _restyle(self, callbacks, mode_name):
+        for callback in callbacks:
+            try:
+                callback(mode_name)
+            except Exception:
+                # As in CustomTkinter: one broken widget doesn't stop the rest
+                continue
+
+    def _restyle_later(self, callbacks, mode_name, switch):
+        if switch != self._switches:
+            return
+        self._restyle(callbacks[:RESTYLE_CHUNK], mode_name)
+        if len(callbacks) > RESTYLE_CHUNK:
+            self.root.after_idle(self._restyle_later, callbacks[RESTYLE_CHUNK:], mode_name, switch)
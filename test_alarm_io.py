@@ -0,0 +1,105 @@
+"""
+Tests for CSV and iCalendar import/export
+"""
+import io
+from datetime import datetime
+
+import pytest
+
+from alarm_io import read_csv, read_ics, write_csv, write_ics
+from alarm_store import AlarmStore
+
+LABELS = [
+    "Plain",
+    "Commas, quotes \"and\" semicolons; all here",
+    "Back\\slash, \\n not a newline, \\; not a separator",
+    "Trailing backslash \\",
+]
+
+
+def round_trip(write, read, alarms):
+    out = io.StringIO(newline="")
+    assert write(alarms, out) == len(alarms)
+    errors = []
+    got = list(read(io.StringIO(out.getvalue(), newline=""), errors))
+    assert errors == []
+    return got
+
+
+def sample_alarms():
+    store = AlarmStore()
+    alarms = [store.add(7, i, label, days=["Mon", "Fri"] if i % 2 else []) for i, label in enumerate(LABELS)]
+    alarms.append(store.add(18, 0, "Last Friday", rrule="FREQ=MONTHLY;BYDAY=-1FR", dtstart="2026-01-01"))
+    alarms.append(store.add(6, 45, "Tokyo", days=["Sat"], ringtone="Chime, soft", enabled=False,
+                            timezone="Asia/Tokyo"))
+    return alarms
+
+
+@pytest.mark.parametrize("write, read", [(write_csv, read_csv), (write_ics, read_ics)], ids=["csv", "ics"])
+def test_round_trip(write, read):
+    alarms = sample_alarms()
+    got = round_trip(write, read, alarms)
+    assert [(a["hour"], a["minute"], a["label"], a["days"], a["ringtone"], a["enabled"], a["rrule"], a["timezone"])
+            for a in got] == [(a.hour, a.minute, a.label, a.days, a.ringtone, a.enabled, a.rrule, a.timezone)
+                              for a in alarms]
+    assert got[-2]["dtstart"] == "2026-01-01"
+
+
+def test_ics_newline_in_label_becomes_space():
+    alarm = AlarmStore().add(7, 0, "Two\nlines")
+    assert round_trip(write_ics, read_ics, [alarm])[0]["label"] == "Two lines"
+
+
+def test_csv_bad_rows_are_reported():
+    text = "\n".join([
+        "time,label,days,enabled,rrule,timezone",
+        "07:30,Good,Mon;Wed,yes,,",
+        "25:00,Bad hour,,,,",
+        "13:00 PM,Bad 12-hour,,,,",
+        "08:00,Bad day,Funday,,,",
+        "08:00,Bad enabled,,maybe,,",
+        "08:00,Bad rule,,,FREQ=YEARLY,",
+        "08:00,Bad zone,,,,Mars/Olympus",
+        ",No time,,,,",
+        "7:15 pm,\"Quoted, label\",,no,,",
+    ]) + "\n"
+    errors = []
+    got = list(read_csv(io.StringIO(text), errors))
+    assert [(a["hour"], a["minute"], a["label"], a["enabled"]) for a in got] == [
+        (7, 30, "Good", True), (19, 15, "Quoted, label", False)]
+    assert [line for line, message in errors] == [3, 4, 5, 6, 7, 8, 9]
+
+
+def test_ics_bad_events_are_reported():
+    text = "\r\n".join([
+        "BEGIN:VCALENDAR",
+        "BEGIN:VEVENT",
+        "DTSTART;VALUE=DATE:20260105",
+        "SUMMARY:All day",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "SUMMARY:No start",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "DTSTART:20260105T070000",
+        "RRULE:FREQ=YEARLY",
+        "END:VEVENT",
+        "BEGIN:VEVENT",
+        "DTSTART;TZID=\"Europe/Paris\":20260105T071500",
+        "SUMMARY:Folded \\, escaped",
+        "  label",
+        "END:VEVENT",
+        "END:VCALENDAR",
+    ]) + "\r\n"
+    errors = []
+    got = list(read_ics(io.StringIO(text), errors))
+    assert [(a["hour"], a["minute"], a["label"], a["timezone"]) for a in got] == [
+        (7, 15, "Folded , escaped label", "Europe/Paris")]
+    assert [line for line, message in errors] == [2, 6, 9]
+
+
+def test_ics_one_time_alarm_starts_today():
+    alarm = AlarmStore().add(9, 5, "Once")
+    out = io.StringIO()
+    write_ics([alarm], out, today=datetime(2026, 3, 2, 8, 0))
+    assert "DTSTART:20260302T090500\r\n" in out.getvalue()
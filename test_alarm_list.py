@@ -0,0 +1,188 @@
+"""
+Tests for the virtualized alarm list, with stand-ins for the canvas and cards
+"""
+from alarm_store import AlarmStore
+from alarm_list import VirtualAlarmList
+
+ROW = 100
+
+
+class FakeCanvas:
+    def __init__(self, height):
+        self.height = height
+        self.top = 0
+        self.options = {}
+
+    def winfo_height(self):
+        return self.height
+
+    def winfo_width(self):
+        return 400
+
+    def canvasy(self, y):
+        return self.top + y
+
+    def coords(self, item, x, y):
+        self.options["coords"] = (x, y)
+
+    def itemconfigure(self, item, **options):
+        self.options.update(options)
+
+    def configure(self, **options):
+        self.options.update(options)
+
+
+class FakeFrame:
+    def __init__(self):
+        self.idle = []
+
+    def after_idle(self, callback):
+        self.idle.append(callback)
+
+    def run_idle(self):
+        while self.idle:
+            self.idle.pop(0)()
+
+
+class FakeCard:
+    def __init__(self):
+        self.alarm = None
+        self.y = None
+
+    def place(self, x, y, relwidth, width):
+        self.y = y
+
+    def place_forget(self):
+        self.y = None
+
+
+class FakeList(VirtualAlarmList):
+    def __init__(self, height, **kwargs):
+        self.created = []
+        self.binds = 0
+        super().__init__(None, ROW, self._create, self._bind, **kwargs)
+        self.canvas.height = height
+
+    def _create_widgets(self, master, frame_kwargs):
+        self.canvas = FakeCanvas(1)
+        self.frame = FakeFrame()
+        self._window = 1
+
+    def _scaling(self):
+        return 1.0
+
+    def _create(self, master):
+        card = FakeCard()
+        self.created.append(card)
+        return card
+
+    def _bind(self, card, alarm):
+        card.alarm = alarm
+        self.binds += 1
+
+    def scroll_to(self, top):
+        self.canvas.top = top
+        self.schedule_render()
+        self.frame.run_idle()
+
+    def shown(self):
+        return sorted((card.y, card.alarm.label) for card in self._visible.values())
+
+
+def make_alarms(count):
+    store = AlarmStore()
+    return store, [store.add(7, minute % 60, f"Alarm {minute}") for minute in range(count)]
+
+
+def test_only_visible_rows_get_cards():
+    store, alarms = make_alarms(1000)
+    alarm_list = FakeList(350, overscan=1)
+    alarm_list.set_alarms(alarms)
+    alarm_list.frame.run_idle()
+    # Rows 0-3 are in view, plus one row of overscan below
+    assert [label for y, label in alarm_list.shown()] == [f"Alarm {i}" for i in range(5)]
+    assert len(alarm_list.created) == 5
+    assert alarm_list.canvas.options["scrollregion"] == (0, 0, 400, 1000 * ROW)
+
+
+def test_scrolling_recycles_cards():
+    store, alarms = make_alarms(1000)
+    alarm_list = FakeList(350, overscan=1)
+    alarm_list.set_alarms(alarms)
+    alarm_list.frame.run_idle()
+
+    alarm_list.scroll_to(50 * ROW + 30)
+    assert [label for y, label in alarm_list.shown()] == [f"Alarm {i}" for i in range(49, 55)]
+    # Cards are placed relative to the inner frame, which sits at the top of the view
+    assert alarm_list.shown()[1][0] == alarm_list.pady - 30
+    assert alarm_list.canvas.options["coords"] == (0, 50 * ROW + 30)
+    assert alarm_list.canvas.options["height"] == 350
+
+    for top in range(0, 900 * ROW, 7 * ROW + 13):
+        alarm_list.scroll_to(top)
+    # At most five rows overlap a 350px view, plus one overscan row either side
+    assert len(alarm_list.created) == 7
+    assert len(alarm_list._visible) + len(alarm_list._pool) == 7
+
+
+def test_small_scroll_does_not_rebind():
+    store, alarms = make_alarms(100)
+    alarm_list = FakeList(350)
+    alarm_list.set_alarms(alarms)
+    alarm_list.frame.run_idle()
+    binds = alarm_list.binds
+    alarm_list.scroll_to(20)
+    assert alarm_list.binds == binds
+
+
+def test_keyed_insert_update_remove():
+    store, alarms = make_alarms(3)
+    alarm_list = FakeList(1000)
+    alarm_list.set_alarms(alarms)
+    alarm_list.frame.run_idle()
+    cards = dict(alarm_list._visible)
+
+    added = store.add(9, 0, "Added")
+    alarm_list.insert(added)
+    alarm_list.frame.run_idle()
+    assert len(alarm_list) == 4
+    assert alarm_list._visible[added.id].y == 3 * ROW + alarm_list.pady
+    # Existing rows keep their cards
+    assert all(alarm_list._visible[alarm_id] is card for alarm_id, card in cards.items())
+
+    store.set_enabled(alarms[1].id, False)
+    binds = alarm_list.binds
+    alarm_list.update(alarms[1])
+    assert alarm_list.binds == binds + 1
+    assert cards[alarms[1].id].alarm is alarms[1]
+    alarm_list.update(store.add(10, 0, "Not listed"))
+    assert alarm_list.binds == binds + 1
+
+    alarm_list.remove(alarms[0].id)
+    alarm_list.frame.run_idle()
+    assert cards[alarms[0].id] in alarm_list._pool
+    # Rows below shift up without being rebound
+    assert [label for y, label in alarm_list.shown()] == ["Alarm 1", "Alarm 2", "Added"]
+    assert alarm_list._visible[alarms[1].id] is cards[alarms[1].id]
+    assert alarm_list._visible[alarms[1].id].y == alarm_list.pady
+    alarm_list.remove(alarms[0].id)
+    assert len(alarm_list) == 3
+
+
+def test_empty_state_and_render_callback():
+    empty = FakeCard()
+    alarm_list = FakeList(350, create_empty=lambda master: empty)
+    rendered = []
+    alarm_list.set_alarms([], on_rendered=lambda: rendered.append(len(alarm_list._visible)))
+    alarm_list.set_alarms([], on_rendered=lambda: rendered.append("again"))
+    assert rendered == []
+    alarm_list.frame.run_idle()
+    # Both callbacks wait for the one render the two calls share
+    assert rendered == [0, "again"]
+    assert empty.y == 30
+
+    store, alarms = make_alarms(2)
+    alarm_list.set_alarms(alarms)
+    alarm_list.frame.run_idle()
+    assert empty.y is None and len(alarm_list._visible) == 2
+    assert rendered == [0, "again"]
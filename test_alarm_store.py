@@ -0,0 +1,90 @@
+"""
+Tests for the slot-array alarm store: ids, the free-list and the legacy upgrade
+"""
+import json
+
+from alarm_store import STORE_VERSION, AlarmStore
+
+
+def test_ids_are_never_reused():
+    store = AlarmStore()
+    first, second = store.add(7, 0, "First"), store.add(8, 0, "Second")
+    store.remove(second.id)
+    third = store.add(9, 0, "Third")
+    assert (first.id, second.id, third.id) == (1, 2, 3)
+    assert store.get(second.id) is None and second.id not in store
+    assert store.get(third.id) is third
+
+
+def test_free_slots_are_reused():
+    store = AlarmStore()
+    alarms = [store.add(7, minute, "Test") for minute in range(4)]
+    slot = store.slot(alarms[1].id)
+    store.remove(alarms[1].id)
+    assert store.slots()[slot] is None
+    assert store.remove(alarms[1].id) is None
+
+    added = store.add(9, 0, "Reused")
+    assert store.slot(added.id) == slot
+    assert len(store.slots()) == 4
+    # Other alarms keep their slots
+    assert [store.slot(alarm.id) for alarm in alarms if alarm is not alarms[1]] == [0, 2, 3]
+    # Iteration is in insertion order, not slot order
+    assert [alarm.label for alarm in store] == ["Test", "Test", "Test", "Reused"]
+
+
+def test_next_id_survives_a_save(tmp_path):
+    store = AlarmStore()
+    alarms = [store.add(7, 0, "Test") for _ in range(3)]
+    # Deleting the newest must not let its id come back after a restart
+    store.remove(alarms[-1].id)
+    path = str(tmp_path / "alarms.json")
+    store.save(path)
+    assert json.loads(open(path).read())["version"] == STORE_VERSION
+
+    loaded = AlarmStore()
+    loaded.load(path)
+    assert sorted(alarm.id for alarm in loaded) == [alarms[0].id, alarms[1].id]
+    assert loaded.add(8, 0, "After restart").id == alarms[-1].id + 1
+
+
+def test_upsert_keeps_the_id():
+    store = AlarmStore()
+    alarm = store.upsert({"id": 41, "hour": 6, "minute": 15, "label": "Imported"})
+    assert store.get(41) is alarm
+    replaced = store.upsert({"id": 41, "hour": 6, "minute": 30, "label": "Replaced"})
+    assert len(store) == 1 and store.get(41) is replaced
+    assert store.add(7, 0, "Next").id == 42
+
+
+def test_legacy_list_is_upgraded():
+    # Ids came from len(alarms), so they collide; snoozes had string ids
+    legacy = [
+        {"id": 0, "hour": 7, "minute": 0, "label": "Work", "days": ["Mon"]},
+        {"id": 1, "hour": 8, "minute": 30, "label": "", "enabled": False},
+        {"id": 1, "hour": 9, "minute": 15, "label": "Duplicate"},
+        {"id": "snooze_0_1700000000", "hour": 7, "minute": 5, "label": "Snooze: Work"},
+        {"id": True, "hour": 10, "minute": 0, "label": "Bool id"},
+        {"id": 5, "minute": 0, "label": "No hour"},
+    ]
+    store = AlarmStore()
+    store.load_data(legacy)
+    alarms = {alarm.label: alarm for alarm in store}
+    assert sorted(alarms) == ["Alarm 08:30", "Bool id", "Duplicate", "Snooze: Work", "Work"]
+    assert alarms["Work"].id == 0 and alarms["Alarm 08:30"].id == 1
+    assert alarms["Alarm 08:30"].enabled is False
+    assert alarms["Snooze: Work"].snooze_of == 0
+    # Replacement ids come after every kept one
+    fresh = sorted(alarms[label].id for label in ("Duplicate", "Snooze: Work", "Bool id"))
+    assert fresh[0] > 5 and len(set(fresh)) == 3
+    assert store.to_data()["next_id"] == fresh[-1] + 1
+
+
+def test_load_replaces_the_contents():
+    store = AlarmStore()
+    store.add(7, 0, "Old")
+    store.load_data({"version": STORE_VERSION, "next_id": 10, "alarms": [{"id": 3, "hour": 6, "minute": 0,
+                                                                          "label": "New"}]})
+    assert [alarm.label for alarm in store] == ["New"]
+    assert store.slots() == [store.get(3)]
+    assert store.add(8, 0, "Next").id == 10
@@ -47,6 +47,23 @@ def test_imports():
         print("  [FIX] Run: pip install pystray")
         return False
     
+    try:
+        import numpy
+        print("  [OK] numpy")
+    except ImportError as e:
+        print(f"  [ERROR] numpy: {e}")
+        print("  [FIX] Run: pip install numpy")
+        return False
+    
+    try:
+        from zoneinfo import ZoneInfo
+        ZoneInfo("Europe/London")
+        print("  [OK] zoneinfo time zone data")
+    except Exception as e:
+        print(f"  [ERROR] zoneinfo: {e}")
+        print("  [FIX] Run: pip install tzdata")
+        return False
+    
     return True
 
 def test_assets():
@@ -0,0 +1,135 @@
+"""
+Tests for ringtone playback under SDL's dummy audio driver
+"""
+import os
+import wave
+
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+from audio import DEFAULT_RINGTONE, AudioEngine, RingtoneCache, synthesize_beep
+
+RATE = 22050
+
+
+@pytest.fixture
+def mixer(monkeypatch, request):
+    frequency, size, channels = getattr(request, "param", (RATE, -16, 1))
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    try:
+        pygame.mixer.init(frequency, size, channels)
+    except pygame.error as e:
+        pytest.skip(f"no audio: {e}")
+    yield pygame.mixer.get_init()
+    pygame.mixer.quit()
+
+
+def write_wav(path, seconds):
+    # In the mixer's own format, so the decoded size is exactly the sample data
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(RATE)
+        w.writeframes(b"\x00\x00" * int(RATE * seconds))
+
+
+@pytest.fixture
+def ringtones(tmp_path):
+    for name, seconds in [("A.wav", 0.5), ("B.wav", 0.5), ("C.wav", 0.5), ("Long.wav", 2)]:
+        write_wav(tmp_path / name, seconds)
+    return tmp_path
+
+
+def cached(cache):
+    return list(cache._sounds)
+
+
+def test_cache_evicts_least_recently_used_by_bytes(mixer, ringtones):
+    # 0.5 s of 16-bit mono is 22050 bytes: room for two
+    cache = RingtoneCache(str(ringtones), max_bytes=50000)
+    a = cache.get("A.wav")
+    cache.get("B.wav")
+    assert cache._bytes == 2 * 22050
+    assert cache.get("A.wav") is a
+    cache.get("C.wav")
+    assert cached(cache) == ["A.wav", "C.wav"]
+    assert cache._bytes == 2 * 22050
+
+    # One ringtone over the whole budget is still kept, on its own
+    cache.get("Long.wav")
+    assert cached(cache) == ["Long.wav"]
+    assert cache._bytes == 4 * 22050
+
+
+def test_cache_reloads_a_changed_file(mixer, ringtones):
+    cache = RingtoneCache(str(ringtones))
+    first = cache.get("A.wav")
+    assert cache.get("A.wav") is first
+
+    write_wav(ringtones / "A.wav", 1)
+    stat = os.stat(ringtones / "A.wav")
+    os.utime(ringtones / "A.wav", (stat.st_atime, stat.st_mtime + 10))
+    second = cache.get("A.wav")
+    assert second is not first
+    assert second.get_length() == pytest.approx(1.0)
+    assert cache._bytes == 2 * 22050
+
+    os.remove(ringtones / "A.wav")
+    assert cache.get("A.wav") is None
+    assert cache.get("Missing.wav") is None
+
+
+def test_default_ringtone_is_synthesized_once(mixer, tmp_path):
+    cache = RingtoneCache(str(tmp_path))
+    beep = cache.get(DEFAULT_RINGTONE)
+    assert beep is cache.get(DEFAULT_RINGTONE)
+    assert cached(cache) == []
+
+
+@pytest.mark.parametrize("mixer", [(22050, 8, 1), (44100, -16, 2), (48000, 32, 2)], indirect=True,
+                         ids=["22050-8-mono", "44100-16-stereo", "48000-32-stereo"])
+def test_beep_matches_the_mixer_format(mixer):
+    frequency, size, channels = mixer
+    beep = synthesize_beep(beep_ms=500, gap_ms=250)
+    assert beep.get_length() == pytest.approx(0.75, abs=1e-3)
+    frames = int(frequency * 0.5) + int(frequency * 0.25)
+    assert len(beep.get_raw()) == frames * channels * abs(size) // 8
+
+
+def sound(seconds=1.0):
+    return pygame.mixer.Sound(buffer=bytes(int(RATE * seconds) * 2))
+
+
+def test_full_pool_takes_over_the_oldest_voice(mixer):
+    engine = AudioEngine(max_voices=2)
+    engine.play(1, sound())
+    engine.play(2, sound())
+    oldest = engine._voices[1]
+    engine.play(3, sound())
+    assert not engine.is_playing(1)
+    assert engine.is_playing(2) and engine.is_playing(3)
+    assert engine._voices[3] is oldest
+
+    # Replaying a key replaces its voice and makes it the newest
+    engine.play(2, sound())
+    assert list(engine._voices) == [3, 2]
+    engine.stop_all()
+    assert not engine.is_playing(2) and not engine.is_playing(3)
+
+
+def test_stop_and_volume_per_voice(mixer):
+    engine = AudioEngine(max_voices=3)
+    engine.play("alarm", sound(), volume=0.5)
+    engine.play("test", sound(), volume=0.5)
+    engine.set_volume(0.25, key="alarm")
+    assert engine._voices["alarm"].get_volume() == pytest.approx(0.25, abs=0.01)
+    assert engine._voices["test"].get_volume() == pytest.approx(0.5, abs=0.01)
+    engine.set_volume(1.0)
+    assert all(channel.get_volume() == pytest.approx(1.0, abs=0.01) for channel in engine._voices.values())
+    engine.set_volume(0.3, key="unknown")
+
+    engine.stop("test")
+    assert not engine.is_playing("test")
+    assert engine.is_playing("alarm")
+    engine.stop("test")
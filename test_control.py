@@ -0,0 +1,128 @@
+"""
+Tests for the local control endpoint and the command line's use of it
+"""
+import json
+import socket
+
+import pytest
+
+import cli
+from control import ControlError, ControlServer, InstanceLock, NotRunning, claim_instance, request
+
+
+class FailingEngine:
+    """Just enough of AlarmEngine for the control server; writes fail"""
+    alarms = []
+
+    def add_alarms(self, records):
+        raise OSError("disk full")
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = ControlServer(FailingEngine(), path=str(tmp_path / "instance.json"))
+    server.start()
+    yield server
+    server.stop()
+
+
+def write_instance(path, port):
+    with open(path, "w") as f:
+        json.dump({"port": port, "token": "x" * 32, "pid": 1}, f)
+
+
+def test_no_instance_file(tmp_path):
+    with pytest.raises(NotRunning):
+        request("ping", path=str(tmp_path / "instance.json"))
+
+
+def test_stale_instance_file(tmp_path):
+    # A port nobody listens on any more
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    path = str(tmp_path / "instance.json")
+    write_instance(path, port)
+    with pytest.raises(NotRunning):
+        request("ping", path=path)
+
+
+def test_silent_instance_is_an_error(tmp_path):
+    # Accepts the connection but never answers: may be a busy app, so no fallback
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        path = str(tmp_path / "instance.json")
+        write_instance(path, listener.getsockname()[1])
+        with pytest.raises(ControlError):
+            request("ping", path=path, timeout=0.2)
+
+
+def test_round_trip(server):
+    assert request("ping", path=server.path)["pid"] > 0
+    assert request("list", path=server.path) == []
+
+
+def test_handler_failure_is_reported(server):
+    with pytest.raises(ControlError, match="disk full"):
+        request("add", {"time": "07:30"}, path=server.path)
+    # The server is still serving
+    assert request("list", path=server.path) == []
+
+
+def test_bad_token(server):
+    instance = json.load(open(server.path))
+    write_instance(server.path, instance["port"])
+    with pytest.raises(ControlError, match="bad token"):
+        request("ping", path=server.path)
+
+
+def test_instance_lock(tmp_path):
+    path = str(tmp_path / "instance.lock")
+    first, second = InstanceLock(path), InstanceLock(path)
+    assert first.acquire()
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_claim_instance(tmp_path):
+    path = str(tmp_path / "instance.lock")
+    lock = claim_instance(path=path)
+    assert lock is not None
+    # The holder isn't answering (no instance file here): give up rather than start a second one
+    assert claim_instance(path=path, wait=0.2) is None
+    lock.release()
+
+
+def test_cli_only_falls_back_when_not_running(tmp_path, monkeypatch):
+    def unreachable(op, args):
+        raise ControlError("the running instance did not answer in time")
+
+    def local(*args):
+        raise AssertionError("wrote the data files while an instance may be running")
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cli, "request", unreachable)
+    monkeypatch.setattr(cli, "LocalAlarms", local)
+    monkeypatch.setattr(cli.os, "chdir", lambda path: None)
+    lock = InstanceLock()
+    assert lock.acquire()
+    try:
+        assert cli.main(["list"]) == 1
+    finally:
+        lock.release()
+
+
+def test_cli_edits_files_when_not_running(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cli.os, "chdir", lambda path: None)
+    assert cli.main(["add", "07:30", "--label", "Work", "--days", "Mon,Fri"]) == 0
+    assert cli.main(["list", "--json"]) == 0
+    alarms = json.loads(capsys.readouterr().out.split("\n", 1)[1])
+    assert [(a["hour"], a["minute"], a["label"], a["days"]) for a in alarms] == [(7, 30, "Work", ["Mon", "Fri"])]
+    # The lock was released again
+    lock = InstanceLock()
+    assert lock.acquire()
+    lock.release()
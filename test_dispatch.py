@@ -0,0 +1,117 @@
+"""
+Tests for the UI dispatcher, with a stand-in for the Tk root
+"""
+from dispatch import UIDispatcher
+
+
+class FakeRoot:
+    def __init__(self):
+        self.pending = {}
+        self.ids = 0
+
+    def after(self, ms, callback):
+        self.ids += 1
+        self.pending[self.ids] = (ms, callback)
+        return self.ids
+
+    def after_cancel(self, after_id):
+        del self.pending[after_id]
+
+    def run_pending(self):
+        pending, self.pending = self.pending, {}
+        for ms, callback in pending.values():
+            callback()
+
+
+def test_newest_per_key_runs():
+    root = FakeRoot()
+    dispatcher = UIDispatcher(interval_ms=20)
+    dispatcher.attach(root)
+    ran = []
+    for i in range(3):
+        dispatcher.post(ran.append, ("list", i), key="list")
+        dispatcher.post(ran.append, ("progress", i), key="progress")
+        dispatcher.post(ran.append, ("plain", i))
+    assert ran == []
+    root.run_pending()
+    # Unkeyed callbacks all run; a keyed one runs in the place of its newest post
+    assert ran == [("plain", 0), ("plain", 1), ("list", 2), ("progress", 2), ("plain", 2)]
+    # And the next drain is armed
+    assert [ms for ms, callback in root.pending.values()] == [20]
+
+
+def test_batches_are_bounded():
+    root = FakeRoot()
+    dispatcher = UIDispatcher(max_batch=2)
+    dispatcher.attach(root)
+    ran = []
+    for i in range(5):
+        dispatcher.post(ran.append, i, key="same")
+    root.run_pending()
+    assert ran == [1]
+    root.run_pending()
+    assert ran == [1, 3]
+    root.run_pending()
+    assert ran == [1, 3, 4]
+
+
+def test_posts_wait_while_detached():
+    dispatcher = UIDispatcher()
+    ran = []
+    dispatcher.post(ran.append, "tray")
+    root = FakeRoot()
+    dispatcher.attach(root)
+    dispatcher.detach()
+    assert root.pending == {}
+    dispatcher.post(ran.append, "still tray")
+    assert ran == []
+
+    root = FakeRoot()
+    dispatcher.attach(root)
+    root.run_pending()
+    assert ran == ["tray", "still tray"]
+
+
+def test_leftovers_after_teardown_run_first():
+    root = FakeRoot()
+    dispatcher = UIDispatcher()
+    dispatcher.attach(root)
+    ran = []
+
+    def teardown():
+        # As if another thread posted while the batch was running
+        dispatcher.post(ran.append, "posted during")
+        dispatcher.detach()
+
+    dispatcher.post(ran.append, "before")
+    dispatcher.post(teardown)
+    dispatcher.post(ran.append, "after 1", key="refresh")
+    dispatcher.post(ran.append, "after 2")
+    root.run_pending()
+    assert ran == ["before"]
+    # Nothing is armed on the torn-down root
+    assert root.pending == {}
+
+    dispatcher.post(ran.append, "posted later")
+    dispatcher.post(ran.append, "refresh later", key="refresh")
+    new_root = FakeRoot()
+    dispatcher.attach(new_root)
+    new_root.run_pending()
+    # The held callbacks keep their place ahead of newer posts, and still merge by key
+    assert ran == ["before", "after 2", "posted during", "posted later", "refresh later"]
+
+
+def test_errors_do_not_stop_the_batch(capsys):
+    root = FakeRoot()
+    dispatcher = UIDispatcher()
+    dispatcher.attach(root)
+    ran = []
+
+    def broken():
+        raise RuntimeError("boom")
+
+    dispatcher.post(broken)
+    dispatcher.post(ran.append, "next")
+    root.run_pending()
+    assert ran == ["next"]
+    assert "Error in UI callback broken: boom" in capsys.readouterr().out
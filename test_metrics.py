@@ -0,0 +1,66 @@
+"""
+Tests for the runtime metrics and where they are recorded
+"""
+from types import SimpleNamespace
+
+from alarm_store import AlarmStore
+from engine import AlarmEngine
+from metrics import AUDIO_START, SAVE_ALARMS, Histogram, Metrics
+from sqlite_storage import SqliteStorage
+from storage import JournalStorage
+
+
+def test_histogram_percentiles():
+    histogram = Histogram()
+    for ms in [0.5, 3, 3, 7, 40, 120, 999, 70000, 400000]:
+        histogram.record(ms)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 9
+    assert snapshot["min_ms"] == 0.5 and snapshot["max_ms"] == 400000
+    # 5th of 9 values is 40 ms, in the (20, 50] bucket
+    assert snapshot["p50_ms"] == 50
+    assert snapshot["p99_ms"] == 400000
+    assert sum(snapshot["buckets"].values()) == 9
+
+
+def test_export(tmp_path):
+    registry = Metrics()
+    registry.record(SAVE_ALARMS, 4.0)
+    path = tmp_path / "out" / "metrics.json"
+    registry.export(str(path))
+    assert '"save_alarms"' in path.read_text()
+
+
+def fire_with(played, monkeypatch):
+    registry = Metrics()
+    monkeypatch.setattr("engine.METRICS", registry)
+    engine = SimpleNamespace(running_alarms={}, on_fire=None, play_sound=lambda ringtone, alarm_id=None: played)
+    AlarmEngine.fire(engine, AlarmStore().add(7, 0, "Test"))
+    return registry.snapshot()["metrics"][AUDIO_START]["count"]
+
+
+def test_audio_start_only_when_sound_played(monkeypatch):
+    assert fire_with(True, monkeypatch) == 1
+    assert fire_with(False, monkeypatch) == 0
+
+
+def writes_recorded(monkeypatch, make_storage):
+    registry = Metrics()
+    monkeypatch.setattr("storage.METRICS", registry)
+    monkeypatch.setattr("sqlite_storage.METRICS", registry)
+    store = AlarmStore()
+    storage = make_storage(store)
+    storage.put(store.add(7, 0, "Test"))
+    storage.close()
+    return registry.snapshot()["metrics"][SAVE_ALARMS]["count"]
+
+
+def test_journal_write_timed(tmp_path, monkeypatch):
+    assert writes_recorded(monkeypatch, lambda store: JournalStorage(
+        store, str(tmp_path / "alarms.json"), str(tmp_path / "alarms.journal"))) == 1
+
+
+def test_sqlite_write_timed_in_writer(tmp_path, monkeypatch):
+    # close() waits for the writer, so the committed transaction has been timed
+    assert writes_recorded(monkeypatch, lambda store: SqliteStorage(
+        store, str(tmp_path / "ringring.db"), str(tmp_path / "alarms.json"), str(tmp_path / "settings.json"))) >= 1
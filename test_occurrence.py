@@ -0,0 +1,210 @@
+"""
+Tests for next-occurrence calculations across daylight-saving changes
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from alarm_store import AlarmStore
+from occurrence import OccurrenceIndex, next_occurrence
+from zones import FOLD_BOTH, FOLD_FIRST, FOLD_SECOND, GAP_SHIFT, GAP_SKIP, ZONES
+
+pytestmark = pytest.mark.skipif(not hasattr(time, "tzset"), reason="needs time.tzset to switch the local zone")
+
+
+@pytest.fixture
+def new_york():
+    """Run with America/New_York as the system zone and default DST policies"""
+    saved = os.environ.get("TZ")
+    os.environ["TZ"] = "America/New_York"
+    ZONES.clear()
+    yield
+    if saved is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = saved
+    ZONES.clear()
+    ZONES.set_policy(GAP_SHIFT, FOLD_FIRST)
+
+
+def alarm_at(hour, minute, days=()):
+    return AlarmStore().add(hour, minute, "Test", list(days))
+
+
+def check_index(alarm, now):
+    """The vectorized index must agree with the scalar path"""
+    expected = next_occurrence(alarm, now)
+    index = OccurrenceIndex([alarm])
+    when, _ = index.next_alarm(now)
+    assert when.timestamp() == expected.timestamp()
+    assert index.due_at(expected) == [alarm]
+    return expected
+
+
+def test_plain_daily(new_york):
+    alarm = alarm_at(7, 30)
+    assert check_index(alarm, datetime(2026, 6, 1, 8, 0)) == datetime(2026, 6, 2, 7, 30)
+
+
+def test_gap_shift(new_york):
+    # 02:30 doesn't exist on 2026-03-08; shifted it rings at 03:30
+    alarm = alarm_at(2, 30)
+    assert check_index(alarm, datetime(2026, 3, 8, 0, 0)) == datetime(2026, 3, 8, 3, 30)
+
+
+def test_gap_skip(new_york):
+    ZONES.set_policy(GAP_SKIP)
+    alarm = alarm_at(2, 30)
+    assert check_index(alarm, datetime(2026, 3, 8, 0, 0)) == datetime(2026, 3, 9, 2, 30)
+
+
+def test_gap_just_passed(new_york):
+    # Regression: the change was 70 minutes ago and the shifted time is still ahead
+    alarm = alarm_at(2, 30)
+    assert check_index(alarm, datetime(2026, 3, 8, 3, 10)) == datetime(2026, 3, 8, 3, 30)
+
+
+@pytest.mark.parametrize("policy, rings", [
+    (FOLD_FIRST, [0]),
+    (FOLD_SECOND, [1]),
+    (FOLD_BOTH, [0, 1]),
+])
+def test_fold_policies(new_york, policy, rings):
+    # 01:30 happens twice on 2026-11-01: EDT (fold 0), then EST (fold 1)
+    ZONES.set_policy(fold_policy=policy)
+    alarm = alarm_at(1, 30)
+    now = datetime(2026, 11, 1, 0, 0)
+    folds = []
+    for _ in rings:
+        now = check_index(alarm, now)
+        assert (now.month, now.day, now.hour, now.minute) == (11, 1, 1, 30)
+        folds.append(now.fold)
+    assert folds == rings
+    assert check_index(alarm, now).day == 2
+
+
+def test_fold_just_passed(new_york):
+    # Regression: in the second 01:xx, an alarm at 01:39 has already rung today
+    alarm = alarm_at(1, 39)
+    now = datetime(2026, 11, 1, 1, 30, fold=1)
+    when = check_index(alarm, now)
+    assert when == datetime(2026, 11, 2, 1, 39)
+    assert when.timestamp() > now.timestamp()
+
+
+def test_weekly_days(new_york):
+    alarm = alarm_at(6, 0, ["Mon", "Fri"])
+    # 2026-06-03 is a Wednesday
+    assert check_index(alarm, datetime(2026, 6, 3, 12, 0)) == datetime(2026, 6, 5, 6, 0)
+
+
+def test_alarm_timezone(new_york):
+    alarm = AlarmStore().add(9, 0, "London", [], timezone="Europe/London")
+    # 09:00 London is 04:00 in New York in June
+    assert next_occurrence(alarm, datetime(2026, 6, 1, 0, 0)) == datetime(2026, 6, 1, 4, 0)
+
+
+# Every 2026 change in each zone, and a zone without DST that is off the hour
+ZONE_CHANGES = {
+    "America/New_York": [(3, 8), (11, 1)],
+    "Europe/London": [(3, 29), (10, 25)],
+    "Australia/Sydney": [(4, 5), (10, 4)],
+    "Asia/Kolkata": [(3, 8), (10, 25)],
+}
+
+
+@pytest.fixture(params=sorted(ZONE_CHANGES))
+def zone(request):
+    saved = os.environ.get("TZ")
+    os.environ["TZ"] = request.param
+    ZONES.clear()
+    yield request.param
+    if saved is None:
+        del os.environ["TZ"]
+    else:
+        os.environ["TZ"] = saved
+    ZONES.clear()
+
+
+def random_alarm(store, rng):
+    # Mostly around the small hours, where the changes are
+    hour = rng.choice([0, 1, 2, 3, rng.randrange(24)])
+    days = rng.choice([[], ["Sun"], ["Sat", "Sun"], ["Mon", "Wed", "Fri"]])
+    kind = rng.random()
+    if kind < 0.1:
+        return store.add(hour, rng.randrange(60), "Test", rrule="FREQ=MONTHLY;BYDAY=1SU", dtstart="2026-01-01")
+    if kind < 0.2:
+        return store.add(hour, rng.randrange(60), "Test", days, timezone="Asia/Tokyo")
+    return store.add(hour, rng.randrange(60), "Test", days, enabled=rng.random() > 0.2)
+
+
+def expected_order(store, now):
+    upcoming = []
+    for alarm in store:
+        when = next_occurrence(alarm, now) if alarm.enabled else None
+        if when is not None:
+            upcoming.append(when.timestamp())
+    return sorted(upcoming)
+
+
+def check_against_scalar(index, store, now):
+    upcoming = expected_order(store, now)
+    when, alarm = index.next_alarm(now)
+    assert when.timestamp() == upcoming[0], now
+    assert next_occurrence(alarm, now).timestamp() == upcoming[0]
+    top = index.top_k(now, 5)
+    assert [when.timestamp() for when, alarm in top] == upcoming[:5], now
+    assert all(next_occurrence(alarm, now).timestamp() == when.timestamp() for when, alarm in top)
+
+
+def test_index_matches_next_occurrence(zone):
+    import random
+    rng = random.Random(zone)
+    store = AlarmStore()
+    for _ in range(50):
+        random_alarm(store, rng)
+    index = OccurrenceIndex(store.slots())
+
+    for month, day in ZONE_CHANGES[zone]:
+        start = (datetime(2026, month, day) - timedelta(hours=2)).timestamp()
+        for step in range(12):
+            now = datetime.fromtimestamp(start + 1500 * step)
+            check_against_scalar(index, store, now)
+
+            # Keep the index in step one slot at a time, as the engine does
+            for alarm in rng.sample(list(store), 3):
+                slot = store.slot(alarm.id)
+                store.remove(alarm.id)
+                index.clear(slot)
+            for _ in range(4):
+                alarm = random_alarm(store, rng)
+                index.set(store.slot(alarm.id), alarm)
+            alarm = rng.choice(list(store))
+            store.set_enabled(alarm.id, not alarm.enabled)
+            index.set(store.slot(alarm.id), alarm)
+    # The store outgrew the index's first allocation along the way
+    assert len(store.slots()) > OccurrenceIndex.MIN_CAPACITY
+
+
+def test_cleared_and_reused_slots(new_york):
+    store = AlarmStore()
+    early, late = store.add(6, 0, "Early"), store.add(9, 0, "Late")
+    index = OccurrenceIndex(store.slots())
+    now = datetime(2026, 6, 1, 5, 0)
+    assert index.next_alarm(now)[1] is early
+
+    slot = store.slot(early.id)
+    store.remove(early.id)
+    index.clear(slot)
+    assert index.next_alarm(now)[1] is late
+    assert index.due_at(datetime(2026, 6, 1, 6, 0)) == []
+
+    london = store.add(13, 0, "London", timezone="Europe/London")
+    assert store.slot(london.id) == slot
+    index.set(slot, london)
+    # 13:00 London is 08:00 in New York
+    assert index.next_alarm(now) == (datetime(2026, 6, 1, 8, 0), london)
+    index.clear(slot)
+    assert index.top_k(now, 5) == [(datetime(2026, 6, 1, 9, 0), late)]
@@ -0,0 +1,105 @@
+"""
+Tests for RRULE parsing and expansion
+"""
+from datetime import datetime
+from itertools import islice
+
+import pytest
+
+from alarm_io import InvalidAlarm, parse_rrule
+from alarm_store import AlarmStore
+from recurrence import OccurrenceCache, RecurrenceRule
+
+
+def expand(text, start, limit=20, after=None):
+    return list(islice(RecurrenceRule.parse(text).occurrences(start, after), limit))
+
+
+def test_weekly_interval():
+    # 2026-01-05 is a Monday
+    got = expand("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR", datetime(2026, 1, 5, 7, 0), limit=4)
+    assert got == [datetime(2026, 1, 5, 7, 0), datetime(2026, 1, 9, 7, 0),
+                   datetime(2026, 1, 19, 7, 0), datetime(2026, 1, 23, 7, 0)]
+
+
+def test_count():
+    got = expand("FREQ=DAILY;COUNT=3", datetime(2026, 1, 1, 6, 30))
+    assert got == [datetime(2026, 1, 1, 6, 30), datetime(2026, 1, 2, 6, 30), datetime(2026, 1, 3, 6, 30)]
+
+
+def test_count_is_from_dtstart_not_after():
+    # COUNT counts from DTSTART even when asked about a later time
+    got = expand("FREQ=DAILY;COUNT=3", datetime(2026, 1, 1, 6, 30), after=datetime(2026, 1, 2, 12, 0))
+    assert got[-1] == datetime(2026, 1, 3, 6, 30)
+
+
+def test_until_date_includes_the_day():
+    got = expand("FREQ=DAILY;UNTIL=20260103", datetime(2026, 1, 1, 23, 0))
+    assert got == [datetime(2026, 1, 1, 23, 0), datetime(2026, 1, 2, 23, 0), datetime(2026, 1, 3, 23, 0)]
+
+
+def test_until_datetime():
+    got = expand("FREQ=DAILY;UNTIL=20260103T060000", datetime(2026, 1, 1, 7, 0))
+    assert got == [datetime(2026, 1, 1, 7, 0), datetime(2026, 1, 2, 7, 0)]
+
+
+def test_last_friday():
+    got = expand("FREQ=MONTHLY;BYDAY=-1FR", datetime(2026, 1, 1, 18, 0), limit=3)
+    assert got == [datetime(2026, 1, 30, 18, 0), datetime(2026, 2, 27, 18, 0), datetime(2026, 3, 27, 18, 0)]
+
+
+def test_monthly_skips_short_months():
+    got = expand("FREQ=MONTHLY", datetime(2026, 1, 31, 8, 0), limit=3)
+    assert got == [datetime(2026, 1, 31, 8, 0), datetime(2026, 3, 31, 8, 0), datetime(2026, 5, 31, 8, 0)]
+
+
+def test_last_day_of_month():
+    got = expand("FREQ=MONTHLY;BYMONTHDAY=-1", datetime(2026, 1, 1, 8, 0), limit=3)
+    assert [d.day for d in got] == [31, 28, 31]
+
+
+def test_starts_near_after():
+    # Without COUNT, expansion starts at the period containing `after`
+    got = expand("FREQ=WEEKLY;BYDAY=WE", datetime(2020, 1, 1, 9, 0), limit=1, after=datetime(2026, 6, 1))
+    assert got == [datetime(2026, 6, 3, 9, 0)]
+
+
+def test_round_trip_text():
+    rule = RecurrenceRule.parse("RRULE:freq=monthly;interval=2;byday=1MO,-1FR;count=5")
+    assert str(rule) == "FREQ=MONTHLY;INTERVAL=2;BYDAY=1MO,-1FR;COUNT=5"
+    assert str(RecurrenceRule.parse(str(rule))) == str(rule)
+
+
+@pytest.mark.parametrize("text", [
+    "FREQ=DAILY;COUNT=0",
+    "FREQ=DAILY;COUNT=-1",
+    "FREQ=DAILY;INTERVAL=0",
+    "FREQ=DAILY;INTERVAL=-2",
+    "FREQ=YEARLY",
+    "FREQ=WEEKLY;BYDAY=1MO",
+    "FREQ=MONTHLY;BYMONTHDAY=32",
+    "FREQ=DAILY;COUNT=2;UNTIL=20260101",
+    "FREQ=DAILY;BYHOUR=7",
+    "FREQ=DAILY;COUNT",
+])
+def test_invalid_rules(text):
+    with pytest.raises(ValueError):
+        RecurrenceRule.parse(text)
+    # alarm_io reports the row instead of importing it
+    with pytest.raises(InvalidAlarm):
+        parse_rrule(text)
+
+
+def test_simple_rules_become_days():
+    assert parse_rrule("FREQ=WEEKLY;BYDAY=MO,FR") == (["Mon", "Fri"], None)
+    assert parse_rrule("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO") == ([], "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO")
+
+
+def test_cache_follows_queries():
+    alarm = AlarmStore().add(7, 0, "Test", rrule="FREQ=DAILY;COUNT=2", dtstart="2026-01-01")
+    cache = OccurrenceCache()
+    assert cache.next_after(alarm, datetime(2026, 1, 1)) == datetime(2026, 1, 1, 7, 0)
+    assert cache.next_after(alarm, datetime(2026, 1, 1, 7, 0)) == datetime(2026, 1, 2, 7, 0)
+    assert cache.next_after(alarm, datetime(2026, 1, 2, 7, 0)) is None
+    # Asking about an earlier time starts over
+    assert cache.next_after(alarm, datetime(2025, 12, 31)) == datetime(2026, 1, 1, 7, 0)
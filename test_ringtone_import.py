@@ -0,0 +1,108 @@
+"""
+Tests for the ringtone import pipeline: chunked copy, dedup and naming
+"""
+import os
+import shutil
+import wave
+
+import pytest
+
+import ringtone_import
+from ringtone_import import DUPLICATE, FAILED, IMPORTED, RingtoneImporter
+from ringtone_library import RingtoneLibrary, file_sha256
+
+
+@pytest.fixture
+def importer(tmp_path):
+    library = RingtoneLibrary(str(tmp_path / "ringtones"), str(tmp_path / "ringtones.json"))
+    return RingtoneImporter(library, str(tmp_path / "ringtones"))
+
+
+def source_file(tmp_path, name, content):
+    folder = tmp_path / "downloads"
+    folder.mkdir(exist_ok=True)
+    path = folder / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def listing(importer):
+    return sorted(os.listdir(importer.ringtones_path))
+
+
+def test_copied_in_chunks_then_renamed(tmp_path, importer, monkeypatch):
+    monkeypatch.setattr(ringtone_import, "HASH_CHUNK_SIZE", 1000)
+    content = os.urandom(4500)
+    source = source_file(tmp_path, "Morning.mp3", content)
+    seen = []
+
+    def on_progress(done, total):
+        # Mid-copy the file only exists under its temporary name
+        seen.append((done, total, listing(importer)))
+
+    assert importer.import_file(source, on_progress) == (IMPORTED, "Morning.mp3")
+    assert [(done, total) for done, total, _ in seen] == [(1000, 4500), (2000, 4500), (3000, 4500),
+                                                          (4000, 4500), (4500, 4500)]
+    assert all(len(names) == 1 and names[0].endswith(".part") for _, _, names in seen)
+    assert listing(importer) == ["Morning.mp3"]
+    assert (tmp_path / "ringtones" / "Morning.mp3").read_bytes() == content
+    assert importer.library.get("Morning.mp3")["source_sha256"] == file_sha256(source)
+
+
+def test_same_content_is_not_copied_again(tmp_path, importer):
+    content = os.urandom(2000)
+    importer.import_file(source_file(tmp_path, "Bell.mp3", content))
+    assert importer.import_file(source_file(tmp_path, "Bell copy.mp3", content)) == (DUPLICATE, "Bell.mp3")
+    assert listing(importer) == ["Bell.mp3"]
+
+
+def test_name_clash_gets_a_suffix(tmp_path, importer):
+    first = source_file(tmp_path, "Bell.mp3", b"first" * 100)
+    assert importer.import_file(first) == (IMPORTED, "Bell.mp3")
+    other = tmp_path / "elsewhere"
+    other.mkdir()
+    for i, content in enumerate([b"second" * 100, b"third" * 100], start=2):
+        path = other / "Bell.mp3"
+        path.write_bytes(content)
+        assert importer.import_file(str(path)) == (IMPORTED, f"Bell ({i}).mp3")
+    assert listing(importer) == ["Bell (2).mp3", "Bell (3).mp3", "Bell.mp3"]
+
+
+def test_failed_copy_leaves_nothing_behind(tmp_path, importer, monkeypatch, capsys):
+    monkeypatch.setattr(ringtone_import, "HASH_CHUNK_SIZE", 1000)
+    source = source_file(tmp_path, "Big.mp3", os.urandom(5000))
+
+    def on_progress(done, total):
+        if done >= 2000:
+            raise OSError("No space left on device")
+
+    assert importer.import_file(source, on_progress) == (FAILED, None)
+    assert listing(importer) == []
+    assert importer.library.names(include_broken=True) == []
+    assert "Error importing ringtone" in capsys.readouterr().out
+
+    assert importer.import_file(str(tmp_path / "missing.mp3")) == (FAILED, None)
+    assert listing(importer) == []
+
+
+def test_start_reports_from_the_worker(tmp_path, importer):
+    source = source_file(tmp_path, "Async.mp3", b"x" * 100)
+    done = []
+    importer.start(source, on_done=lambda status, name: done.append((status, name))).join(5)
+    assert done == [(IMPORTED, "Async.mp3")]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not on PATH")
+def test_large_wav_is_transcoded(tmp_path, importer):
+    importer.transcode_wav_over = 0
+    source = str(tmp_path / "Long.wav")
+    with wave.open(source, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(22050)
+        w.writeframes(os.urandom(22050 * 2))
+
+    assert importer.import_file(source) == (IMPORTED, "Long.ogg")
+    assert listing(importer) == ["Long.ogg"]
+    # The original WAV is recognised as already imported
+    assert importer.import_file(source) == (DUPLICATE, "Long.ogg")
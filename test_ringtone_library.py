@@ -0,0 +1,130 @@
+"""
+Tests for the ringtone library index: incremental scans and broken files
+"""
+import json
+import os
+import wave
+
+import pytest
+
+import ringtone_library
+from ringtone_library import RingtoneLibrary
+
+
+def write_wav(path, seconds=0.5, rate=8000):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(1)
+        w.setframerate(rate)
+        w.writeframes(bytes([128]) * int(rate * seconds))
+
+
+@pytest.fixture
+def library(tmp_path):
+    (tmp_path / "ringtones").mkdir()
+    return RingtoneLibrary(str(tmp_path / "ringtones"), str(tmp_path / "data" / "ringtones.json"))
+
+
+@pytest.fixture
+def hashed(monkeypatch):
+    """Names of the files hashed, in order"""
+    names = []
+    file_sha256 = ringtone_library.file_sha256
+
+    def counting(path):
+        names.append(os.path.basename(path))
+        return file_sha256(path)
+
+    monkeypatch.setattr(ringtone_library, "file_sha256", counting)
+    return names
+
+
+@pytest.fixture
+def saves(library, monkeypatch):
+    saved = []
+    save = library.save
+
+    def counting(entries):
+        saved.append(sorted(entries))
+        save(entries)
+
+    monkeypatch.setattr(library, "save", counting)
+    return saved
+
+
+@pytest.fixture
+def mixer(monkeypatch):
+    pygame = pytest.importorskip("pygame")
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    try:
+        pygame.mixer.init()
+    except pygame.error as e:
+        pytest.skip(f"no audio: {e}")
+    yield
+    pygame.mixer.quit()
+
+
+def test_unchanged_files_are_not_rehashed(tmp_path, library, hashed):
+    ringtones = tmp_path / "ringtones"
+    write_wav(ringtones / "Bell.wav")
+    write_wav(ringtones / "Chime.wav", seconds=1)
+    (ringtones / "notes.txt").write_text("not a ringtone")
+
+    assert library.scan() is True
+    assert sorted(hashed) == ["Bell.wav", "Chime.wav"]
+    assert library.names() == ["Bell.wav", "Chime.wav"]
+    assert library.get("Chime.wav")["duration"] == pytest.approx(1.0)
+    assert library.get("Chime.wav")["sample_rate"] == 8000
+
+    # A new process loads the index and finds nothing to do
+    hashed.clear()
+    reloaded = RingtoneLibrary(library.ringtones_path, library.index_path)
+    reloaded.load()
+    assert reloaded.scan() is False
+    assert hashed == []
+
+    # Only the file whose size changed is hashed again
+    write_wav(ringtones / "Bell.wav", seconds=2)
+    assert library.scan() is True
+    assert hashed == ["Bell.wav"]
+    assert library.get("Bell.wav")["duration"] == pytest.approx(2.0)
+
+
+def test_index_is_rewritten_only_on_change(tmp_path, library, saves):
+    ringtones = tmp_path / "ringtones"
+    write_wav(ringtones / "Bell.wav")
+    library.scan()
+    assert saves == [["Bell.wav"]]
+    assert library.scan() is False
+    assert saves == [["Bell.wav"]]
+
+    os.remove(ringtones / "Bell.wav")
+    assert library.scan() is True
+    assert saves == [["Bell.wav"], []]
+    # Written through a temporary file that is renamed over the index
+    assert not os.path.exists(library.index_path + ".tmp")
+    assert json.loads(open(library.index_path).read()) == {"version": 1, "ringtones": {}}
+
+
+def test_broken_files_are_flagged(tmp_path, library, mixer, capsys):
+    ringtones = tmp_path / "ringtones"
+    write_wav(ringtones / "Good.wav")
+    (ringtones / "Broken.ogg").write_bytes(b"not really vorbis" * 64)
+    library.scan()
+    assert library.names() == ["Good.wav"]
+    assert library.broken() == ["Broken.ogg"]
+    assert library.names(include_broken=True) == ["Broken.ogg", "Good.wav"]
+    assert library.get("Broken.ogg")["error"]
+    assert "Ringtone Broken.ogg can't be played" in capsys.readouterr().out
+
+
+def test_find_by_hash(tmp_path, library):
+    ringtones = tmp_path / "ringtones"
+    write_wav(ringtones / "Bell.wav")
+    library.scan()
+    sha256 = library.get("Bell.wav")["sha256"]
+    assert library.find_by_hash(sha256) == "Bell.wav"
+    write_wav(ringtones / "Converted.wav", seconds=3)
+    library.add("Converted.wav", source_sha256="from-the-original")
+    assert library.find_by_hash("from-the-original") == "Converted.wav"
+    assert library.find_by_hash("unknown") is None
@@ -0,0 +1,188 @@
+"""
+Tests for the deadline-driven scheduler: catch-up policies and clock jumps
+
+The scheduler's loop is driven one pass at a time through _tick with made-up
+wall and monotonic clocks, so no scheduler thread or sleeping is involved.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduler as scheduler_module
+from alarm_store import AlarmStore
+from scheduler import CATCH_UP_COALESCE, CATCH_UP_DROP, CATCH_UP_FIRE_LATE, AlarmScheduler
+
+START = datetime(2026, 1, 5, 6, 0)
+
+
+class Clock:
+    """Wall and monotonic time for _tick; wall time can jump, monotonic time only runs"""
+
+    def __init__(self, scheduler, now=START):
+        self.scheduler = scheduler
+        self.now = now
+        self.mono = 1000.0
+
+    def run(self, seconds):
+        self.now += timedelta(seconds=seconds)
+        self.mono += seconds
+        return self.tick()
+
+    def jump(self, seconds, elapsed=1):
+        """Move the wall clock without the monotonic clock keeping up (suspend, or a clock change)"""
+        self.now += timedelta(seconds=seconds)
+        self.mono += elapsed
+        return self.tick()
+
+    def tick(self):
+        with self.scheduler._cond:
+            due = self.scheduler._tick(self.now, self.mono)
+        return [(alarm.id, scheduled) for alarm, scheduled in due]
+
+
+def scheduler_with(*times, policy=CATCH_UP_COALESCE, minutes=10):
+    store = AlarmStore()
+    alarms = [store.add(hour, minute, "Test") for hour, minute in times]
+    scheduler = AlarmScheduler(lambda: store, lambda alarm, scheduled: None, policy, minutes)
+    clock = Clock(scheduler)
+    assert clock.tick() == []
+    return scheduler, clock, alarms
+
+
+def test_fires_on_time():
+    scheduler, clock, (alarm,) = scheduler_with((7, 0))
+    assert clock.run(3599) == []
+    assert clock.run(1) == [(alarm.id, datetime(2026, 1, 5, 7, 0))]
+    assert clock.run(60) == []
+
+
+def test_late_tick_still_fires():
+    # A tick that comes late (sleep drift, GC pause) makes the alarm late, not lost
+    scheduler, clock, (alarm,) = scheduler_with((7, 0))
+    assert clock.run(3600 + 7) == [(alarm.id, datetime(2026, 1, 5, 7, 0))]
+
+
+@pytest.mark.parametrize("policy, expected", [
+    (CATCH_UP_FIRE_LATE, [datetime(2026, 1, 5, 7, 0), datetime(2026, 1, 6, 7, 0), datetime(2026, 1, 7, 7, 0)]),
+    (CATCH_UP_COALESCE, [datetime(2026, 1, 7, 7, 0)]),
+    (CATCH_UP_DROP, []),
+])
+def test_catch_up_after_suspend(policy, expected):
+    scheduler, clock, (alarm,) = scheduler_with((7, 0), policy=policy)
+    # Suspended from 06:00 on the 5th until 08:00 on the 7th
+    fired = clock.jump(2 * 86400 + 7200)
+    assert fired == [(alarm.id, when) for when in expected]
+    if policy == CATCH_UP_DROP:
+        assert [entry[1] for entry in scheduler.dropped_log] == [datetime(2026, 1, 7, 7, 0)]
+    # Nothing more until the next day's occurrence
+    assert clock.run(60) == []
+    assert scheduler.next_deadline()[0] == datetime(2026, 1, 8, 7, 0)
+
+
+def test_drop_keeps_alarms_inside_the_window():
+    scheduler, clock, (alarm,) = scheduler_with((7, 0), policy=CATCH_UP_DROP, minutes=10)
+    assert clock.jump(3600 + 300) == [(alarm.id, datetime(2026, 1, 5, 7, 0))]
+
+
+def test_clock_back_does_not_repeat():
+    scheduler, clock, (alarm,) = scheduler_with((7, 0))
+    assert clock.run(3601) == [(alarm.id, datetime(2026, 1, 5, 7, 0))]
+    # The clock is set back two minutes, across the alarm it just rang
+    assert clock.jump(-120) == []
+    assert clock.run(120) == []
+
+
+def test_clock_back_then_change_does_not_repeat():
+    # Regression: a rebuild after the jump (e.g. a toggle) started from `now`,
+    # which is behind the alarm that already rang
+    scheduler, clock, (alarm, other) = scheduler_with((7, 0), (12, 0))
+    assert clock.run(3601) == [(alarm.id, datetime(2026, 1, 5, 7, 0))]
+    assert clock.jump(-120) == []
+    assert clock.run(30) == []
+    scheduler.reschedule()
+    assert clock.run(30) == []
+    assert clock.run(120) == []
+    assert scheduler.next_deadline() == (datetime(2026, 1, 5, 12, 0), other)
+
+
+def test_large_clock_correction_is_trusted():
+    # Set back further than MAX_BACKWARD_GUARD: treated as a correction, so the alarm rings again
+    scheduler, clock, (alarm,) = scheduler_with((7, 0))
+    assert clock.run(3601) == [(alarm.id, datetime(2026, 1, 5, 7, 0))]
+    assert clock.jump(-86400) == []
+    assert clock.run(86400) == [(alarm.id, datetime(2026, 1, 5, 7, 0))]
+
+
+def test_disabled_alarms_are_not_scheduled():
+    scheduler, clock, (alarm,) = scheduler_with((7, 0))
+    alarm.enabled = False
+    # reschedule() wakes the thread, which rebuilds straight away
+    scheduler.reschedule()
+    assert clock.run(1) == []
+    assert clock.run(3599) == []
+    assert scheduler.next_deadline() is None
+
+
+@pytest.mark.parametrize("change", ["disable", "delete"])
+def test_change_just_before_deadline(change):
+    # Regression: the old heap entry was popped before the change was applied, so it still rang
+    scheduler, clock, (alarm,) = scheduler_with((7, 0))
+    assert clock.run(3599) == []
+    if change == "disable":
+        alarm.enabled = False
+    else:
+        scheduler._get_alarms().remove(alarm.id)
+    scheduler.reschedule([alarm.id])
+    assert clock.run(2) == []
+    assert clock.run(86400) == []
+
+
+def test_single_alarm_changes_do_not_rebuild(monkeypatch):
+    scheduler, clock, (first, second) = scheduler_with((7, 0), (8, 0))
+
+    def rebuild(*args):
+        raise AssertionError("full rebuild")
+
+    monkeypatch.setattr(scheduler, "_build", rebuild)
+    store = scheduler._get_alarms()
+    first.enabled = False
+    added = store.add(6, 30, "Added")
+    scheduler.reschedule([first.id, added.id])
+    assert clock.run(1) == []
+    assert scheduler.next_deadline() == (datetime(2026, 1, 5, 6, 30), added)
+    # Moving an alarm: its old entry is skipped, the new one rings
+    store.remove(added.id)
+    moved = store.add(6, 45, "Moved")
+    scheduler.reschedule([added.id, moved.id])
+    assert clock.run(1799) == []
+    assert clock.run(900) == [(moved.id, datetime(2026, 1, 5, 6, 45))]
+    assert clock.run(4500) == [(second.id, datetime(2026, 1, 5, 8, 0))]
+
+
+def test_reschedule_does_not_wait_for_a_rebuild(monkeypatch):
+    scheduler, clock, (alarm,) = scheduler_with((7, 0))
+    building = threading.Event()
+    release = threading.Event()
+    real_next_occurrence = scheduler_module.next_occurrence
+
+    def slow_next_occurrence(alarm, after):
+        building.set()
+        release.wait(5)
+        return real_next_occurrence(alarm, after)
+
+    monkeypatch.setattr(scheduler_module, "next_occurrence", slow_next_occurrence)
+    scheduler.reschedule()
+    worker = threading.Thread(target=clock.run, args=(1,))
+    worker.start()
+    assert building.wait(5)
+    # The rebuild is still computing; a change from the UI thread goes straight through
+    started = time.monotonic()
+    scheduler.reschedule([alarm.id])
+    assert time.monotonic() - started < 1
+    release.set()
+    worker.join(5)
+    # Applied on the same pass, once the new heap was swapped in
+    assert not scheduler._changed
+    assert scheduler.next_deadline() == (datetime(2026, 1, 5, 7, 0), alarm)
@@ -0,0 +1,188 @@
+"""
+Tests for the SQLite backend: migration, indexed lookups and checkpoints
+"""
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from alarm_store import AlarmStore
+from engine import AlarmEngine
+from occurrence import next_occurrence
+from sqlite_storage import SqliteStorage
+from zones import ZONES
+
+
+@pytest.fixture
+def open_db(tmp_path):
+    opened = []
+
+    def open_db():
+        store = AlarmStore()
+        storage = SqliteStorage(store, str(tmp_path / "ringring.db"), str(tmp_path / "alarms.json"),
+                                str(tmp_path / "settings.json"))
+        opened.append(storage)
+        storage.load()
+        return store, storage
+
+    yield open_db
+    for storage in opened:
+        storage.close()
+
+
+@pytest.fixture
+def local_zone():
+    def set_zone(name):
+        os.environ["TZ"] = name
+        ZONES.clear()
+
+    saved = os.environ.get("TZ")
+    yield set_zone
+    if saved is None:
+        os.environ.pop("TZ", None)
+    else:
+        os.environ["TZ"] = saved
+    ZONES.clear()
+
+
+def test_migrates_legacy_json(tmp_path, open_db):
+    # The pre-AlarmStore format: ids from len(alarms), so they collide, and string snooze ids
+    legacy = [
+        {"id": 0, "hour": 7, "minute": 0, "label": "Work", "days": ["Mon", "Fri"], "enabled": True},
+        {"id": 1, "hour": 8, "minute": 30, "label": "Gym", "days": [], "enabled": False},
+        {"id": 1, "hour": 9, "minute": 15, "label": "Duplicate", "days": ["Sat"], "enabled": True},
+        {"id": "snooze_0_1700000000", "hour": 7, "minute": 5, "label": "Snooze: Work", "days": []},
+    ]
+    (tmp_path / "alarms.json").write_text(json.dumps(legacy))
+    (tmp_path / "settings.json").write_text(json.dumps({"volume": 0.3, "theme": "light"}))
+
+    store, storage = open_db()
+    alarms = {alarm.label: alarm for alarm in store}
+    assert sorted(alarms) == ["Duplicate", "Gym", "Snooze: Work", "Work"]
+    assert len({alarm.id for alarm in store}) == 4
+    assert alarms["Work"].id == 0 and alarms["Gym"].id == 1
+    assert alarms["Snooze: Work"].snooze_of == 0
+    assert alarms["Gym"].enabled is False
+    assert storage.load_settings() == {"volume": 0.3, "theme": "light"}
+
+    # New ids carry on after the migrated ones, and the migration runs once
+    storage.put(store.add(10, 0, "New"))
+    storage.close()
+    (tmp_path / "alarms.json").write_text("[]")
+    store, storage = open_db()
+    assert sorted(alarm.label for alarm in store) == ["Duplicate", "Gym", "New", "Snooze: Work", "Work"]
+    assert len({alarm.id for alarm in store}) == 5
+
+
+def test_lookups_use_the_indexes(open_db):
+    store, storage = open_db()
+    conn = storage._reader()
+    names = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"alarms_by_time", "alarms_by_days"} <= names
+
+    traced = []
+    conn.set_trace_callback(traced.append)
+    storage.next_alarm(datetime(2026, 1, 5, 12, 0))
+    storage.alarms_due_at(datetime(2026, 1, 5, 12, 0))
+    conn.set_trace_callback(None)
+    selects = [sql for sql in traced if sql.startswith("SELECT")]
+    assert selects
+    for sql in selects:
+        plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql))
+        assert "USING INDEX" in plan and "SCAN" not in plan, plan
+
+
+def random_alarms(store, count, seed=7):
+    rng = random.Random(seed)
+    alarms = []
+    for _ in range(count):
+        kind = rng.random()
+        days = rng.choice([[], ["Mon"], ["Sat", "Sun"], ["Tue", "Thu"]])
+        alarm = store.add(rng.randrange(24), rng.randrange(60), "Test", days)
+        if kind < 0.1:
+            alarm.rrule, alarm.dtstart = "FREQ=MONTHLY;BYDAY=-1FR", "2026-01-01"
+        elif kind < 0.2:
+            alarm.timezone = "Asia/Tokyo"
+        alarm.enabled = rng.random() > 0.2
+        alarms.append(alarm)
+    return alarms
+
+
+def expected_next(alarms, now):
+    best = None
+    for alarm in alarms:
+        when = next_occurrence(alarm, now) if alarm.enabled else None
+        if when is not None and (best is None or when.timestamp() < best.timestamp()):
+            best = when
+    return best
+
+
+def check_lookups(store, storage, alarms, times):
+    storage.put_many(alarms)
+    for now in times:
+        upcoming = storage.next_alarm(now)
+        assert upcoming[0].timestamp() == expected_next(alarms, now).timestamp(), now
+        minute = now.replace(second=0, microsecond=0)
+        after = datetime.fromtimestamp(minute.timestamp() - 60)
+        expected = sorted(alarm.id for alarm in alarms if alarm.enabled and (
+            (next_occurrence(alarm, after) or after).timestamp() == minute.timestamp()))
+        assert sorted(data["id"] for data in storage.alarms_due_at(minute)) == expected, minute
+
+
+def test_lookups_match_next_occurrence(open_db):
+    store, storage = open_db()
+    alarms = random_alarms(store, 400)
+    start = datetime(2026, 1, 5, 0, 0, 30)
+    times = [start + timedelta(minutes=37 * i) for i in range(60)]
+    # Minutes at which something rings, so the due lookups find alarms
+    times += [expected_next(alarms, now) for now in times[:20]]
+    check_lookups(store, storage, alarms, times)
+
+
+@pytest.mark.skipif(not hasattr(time, "tzset"), reason="needs time.tzset")
+def test_lookups_across_dst(open_db, local_zone):
+    local_zone("America/New_York")
+    store, storage = open_db()
+    alarms = random_alarms(store, 200, seed=11)
+    # Alarms in the hours that the 2026 changes skip (8 March) and repeat (1 November)
+    alarms += [store.add(2, 30, "Gap"), store.add(1, 30, "Fold", ["Sun"])]
+    times = []
+    # Real instants every 20 minutes; adding to a naive time could land in the skipped hour
+    for start in (datetime(2026, 3, 7, 23, 0), datetime(2026, 10, 31, 23, 0)):
+        times += [datetime.fromtimestamp(start.timestamp() + 1200 * i) for i in range(20)]
+    times += [datetime(2026, 3, 8, 3, 30), datetime(2026, 11, 1, 1, 30), datetime(2026, 11, 1, 1, 30, fold=1)]
+    check_lookups(store, storage, alarms, times)
+
+
+def test_queries_see_queued_writes(open_db):
+    store, storage = open_db()
+    alarm = store.add(7, 0, "Just added")
+    storage.put(alarm)
+    assert storage.next_alarm(datetime(2026, 1, 5, 6, 0))[1]["id"] == alarm.id
+    storage.delete(alarm.id)
+    assert storage.next_alarm(datetime(2026, 1, 5, 6, 0)) is None
+
+
+def test_engine_asks_the_database(open_db):
+    store, storage = open_db()
+    alarms = [store.add(7, 0, "Early", ringtone="Bell"), store.add(7, 0, "Same minute", ringtone="Chime"),
+              store.add(9, 0, "Later")]
+    storage.put_many(alarms)
+    engine = SimpleNamespace(storage_backend="sqlite", storage=storage, alarms=store, occurrence_index=None)
+    when, alarm = AlarmEngine.next_alarm(engine, datetime(2026, 1, 5, 6, 0))
+    assert when == datetime(2026, 1, 5, 7, 0) and alarm is alarms[0]
+    assert sorted(alarm.id for alarm in AlarmEngine.alarms_due_at(engine, when)) == [alarms[0].id, alarms[1].id]
+
+
+def test_checkpoint_runs_after_the_commit(tmp_path, open_db, capsys):
+    store, storage = open_db()
+    # Queued together, so they reach the writer in one batch
+    storage.put_many([store.add(7, minute, "Test") for minute in range(30)])
+    storage.compact()
+    storage._wait_for_writes()
+    assert "Error" not in capsys.readouterr().out
+    assert os.path.getsize(tmp_path / "ringring.db-wal") == 0
@@ -0,0 +1,77 @@
+"""
+Tests for the snapshot-plus-journal storage: torn records and compaction
+"""
+from alarm_store import AlarmStore
+from storage import JournalStorage
+
+
+def open_storage(tmp_path, compact_after=500):
+    store = AlarmStore()
+    storage = JournalStorage(store, str(tmp_path / "alarms.json"), str(tmp_path / "alarms.journal"), compact_after)
+    storage.load()
+    return store, storage
+
+
+def labels(store):
+    return sorted(alarm.label for alarm in store)
+
+
+def test_replay_after_restart(tmp_path):
+    store, storage = open_storage(tmp_path)
+    kept = store.add(7, 0, "Kept")
+    gone = store.add(8, 0, "Gone")
+    storage.put_many([kept, gone])
+    store.set_enabled(kept.id, False)
+    storage.put(kept)
+    store.remove(gone.id)
+    storage.delete(gone.id)
+    storage.close()
+
+    store, storage = open_storage(tmp_path)
+    assert labels(store) == ["Kept"]
+    assert store.get(kept.id).enabled is False
+
+
+def test_torn_record_is_cut_off(tmp_path):
+    store, storage = open_storage(tmp_path)
+    storage.put(store.add(7, 0, "Before crash"))
+    storage.close()
+    journal = tmp_path / "alarms.journal"
+    good = journal.read_bytes()
+    # A crash part-way through appending the next record
+    journal.write_bytes(good + b'{"op":"put","alarm":{"id":')
+
+    store, storage = open_storage(tmp_path)
+    assert labels(store) == ["Before crash"]
+    assert journal.read_bytes() == good
+
+    # New records start on a clean line instead of being glued to the fragment
+    storage.put(store.add(9, 0, "After crash"))
+    storage.close()
+    store, storage = open_storage(tmp_path)
+    assert labels(store) == ["After crash", "Before crash"]
+
+
+def test_compaction_round_trip(tmp_path):
+    store, storage = open_storage(tmp_path, compact_after=1000)
+    alarms = [store.add(6, minute, f"Alarm {minute}") for minute in range(5)]
+    storage.put_many(alarms)
+    storage.compact()
+    assert not (tmp_path / "alarms.journal").exists()
+    store.remove(alarms[0].id)
+    storage.delete(alarms[0].id)
+    storage.close()
+
+    store, storage = open_storage(tmp_path)
+    assert labels(store) == [f"Alarm {minute}" for minute in range(1, 5)]
+
+
+def test_interrupted_compaction_is_replayed(tmp_path):
+    store, storage = open_storage(tmp_path)
+    storage.put(store.add(7, 0, "Pending"))
+    storage.close()
+    # Crash after the journal was set aside but before the snapshot was written
+    (tmp_path / "alarms.journal").rename(tmp_path / "alarms.journal.compacting")
+
+    store, storage = open_storage(tmp_path)
+    assert labels(store) == ["Pending"]
@@ -0,0 +1,91 @@
+"""
+Tests for batched theme switching, with stand-ins for Tk widgets
+"""
+import customtkinter as ctk
+import pytest
+
+import styles
+from styles import StyleRegistry
+
+
+class FakeRoot:
+    def __init__(self):
+        self.idle = []
+        self.log = []
+
+    def after_idle(self, callback, *args):
+        self.idle.append((callback, args))
+
+    def update_idletasks(self):
+        self.log.append("update_idletasks")
+
+    def run_idle(self):
+        while self.idle:
+            callback, args = self.idle.pop(0)
+            callback(*args)
+
+
+class FakeWidget:
+    def __init__(self, root, name, viewable):
+        self.root = root
+        self.name = name
+        self.viewable = viewable
+        self.mode = "Light"
+
+    def winfo_viewable(self):
+        return self.viewable
+
+    def _set_appearance_mode(self, mode):
+        self.mode = mode
+        self.root.log.append(self.name)
+
+
+@pytest.fixture
+def tracker(monkeypatch):
+    tracker = ctk.AppearanceModeTracker
+    monkeypatch.setattr(tracker, "callback_list", [])
+    monkeypatch.setattr(tracker, "appearance_mode", 0)
+    monkeypatch.setattr(tracker, "appearance_mode_set_by", "user")
+    return tracker
+
+
+def widgets(root, tracker, count, viewable):
+    made = [FakeWidget(root, f"{'shown' if viewable else 'hidden'}{i}", viewable) for i in range(count)]
+    tracker.callback_list.extend(widget._set_appearance_mode for widget in made)
+    return made
+
+
+def test_visible_widgets_first_in_one_pass(tracker, monkeypatch):
+    monkeypatch.setattr(styles, "RESTYLE_CHUNK", 2)
+    root = FakeRoot()
+    hidden = widgets(root, tracker, 5, False)
+    shown = widgets(root, tracker, 3, True)
+
+    StyleRegistry(root).apply_theme("dark")
+    assert ctk.get_appearance_mode() == "Dark"
+    # On-screen widgets are restyled together, then painted once
+    assert root.log == ["shown0", "shown1", "shown2", "update_idletasks"]
+    assert all(widget.mode == "Dark" for widget in shown)
+    assert all(widget.mode == "Light" for widget in hidden)
+
+    root.run_idle()
+    assert all(widget.mode == "Dark" for widget in hidden)
+    assert root.log.count("update_idletasks") == 1
+
+
+def test_newer_switch_cancels_deferred_chunks(tracker):
+    root = FakeRoot()
+    hidden = widgets(root, tracker, 3, False)
+    registry = StyleRegistry(root)
+    registry.apply_theme("dark")
+    registry.apply_theme("light")
+    root.run_idle()
+    assert all(widget.mode == "Light" for widget in hidden)
+    assert root.log.count("hidden0") == 1
+
+
+def test_same_mode_is_a_no_op(tracker):
+    root = FakeRoot()
+    widgets(root, tracker, 2, True)
+    StyleRegistry(root).apply_theme("light")
+    assert root.log == []
@@ -0,0 +1,135 @@
+"""
+Tests for the main-loop timer heap, with a fake clock and Tk root
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import timers
+from timers import TimerHeap
+
+# 2026-01-05 10:00:00 UTC
+START = 1767607200.0
+
+
+class FakeRoot:
+    """Records the pending root.after; fire() moves the clock to when Tk would wake and runs it"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.pending = None
+        self.armed = 0
+
+    def after(self, ms, callback):
+        self.armed += 1
+        self.pending = (self.clock.now + ms / 1000, callback)
+        return self.armed
+
+    def after_cancel(self, after_id):
+        if after_id == self.armed:
+            self.pending = None
+
+    def fire(self, late=0.0):
+        wake, callback = self.pending
+        self.pending = None
+        self.clock.now = max(self.clock.now, wake + late)
+        callback()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=START)
+    monkeypatch.setattr(timers, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_one_wakeup_for_many_timers(clock):
+    root = FakeRoot(clock)
+    heap = TimerHeap()
+    heap.attach(root)
+    ran = []
+    heap.call_later(5, ran.append, "five")
+    heap.call_later(2, ran.append, "two")
+    heap.call_later(9, ran.append, "nine")
+    # Only the earliest is armed
+    assert root.pending[0] == pytest.approx(START + 2.001)
+    root.fire()
+    assert ran == ["two"]
+    root.fire()
+    root.fire()
+    assert ran == ["two", "five", "nine"]
+    assert root.pending is None
+
+
+def test_aligned_to_the_minute(clock):
+    clock.now = START + 17.25
+    root = FakeRoot(clock)
+    heap = TimerHeap()
+    heap.attach(root)
+    ran = []
+    heap.every(60, lambda: ran.append(clock.now), align=True)
+    for _ in range(3):
+        root.fire()
+    assert [when - START for when in ran] == pytest.approx([60.001, 120.001, 180.001])
+
+
+def test_no_drift_after_a_late_wakeup(clock):
+    root = FakeRoot(clock)
+    heap = TimerHeap()
+    heap.attach(root)
+    ran = []
+    heap.every(60, lambda: ran.append(clock.now), align=True)
+    # The machine was busy: the first minute fires 25 seconds late
+    root.fire(late=25)
+    root.fire()
+    root.fire()
+    assert [when - START for when in ran] == pytest.approx([85.001, 120.001, 180.001])
+
+
+def test_unaligned_interval_restarts_from_a_late_run(clock):
+    root = FakeRoot(clock)
+    heap = TimerHeap()
+    heap.attach(root)
+    ran = []
+    heap.every(10, lambda: ran.append(clock.now), run_now=True)
+    root.fire()
+    # Three periods missed: it runs once, not three times, then carries on from now
+    root.fire(late=30)
+    root.fire()
+    assert [when - START for when in ran] == pytest.approx([0.001, 40.002, 50.003], abs=1e-4)
+
+
+def test_cancel(clock):
+    root = FakeRoot(clock)
+    heap = TimerHeap()
+    heap.attach(root)
+    ran = []
+    first = heap.call_later(1, ran.append, "cancelled")
+    heap.call_later(2, ran.append, "kept")
+    periodic = heap.every(1, ran.append, "tick")
+    first.cancel()
+    root.fire()
+    assert ran == ["tick"]
+    periodic.cancel()
+    root.fire()
+    assert ran == ["tick", "kept"]
+    assert root.pending is None
+
+
+def test_detached_timers_catch_up_once(clock):
+    root = FakeRoot(clock)
+    heap = TimerHeap()
+    heap.attach(root)
+    ran = []
+    heap.every(60, ran.append, "minute", align=True)
+    heap.call_later(30, ran.append, "once")
+    heap.detach()
+    assert root.pending is None
+
+    # Ten minutes in tray-only mode, then a new window
+    clock.now += 600
+    root = FakeRoot(clock)
+    heap.attach(root)
+    root.fire()
+    assert sorted(ran) == ["minute", "once"]
+    assert root.pending[0] == pytest.approx(START + 660.001)
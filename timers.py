@@ -0,0 +1,123 @@
+"""
+Timers on the Tk main loop
+
+Periodic UI work (the countdown, ringtone prefetch) used to run on sleeping
+threads of its own. TimerHeap keeps every timer in one heap ordered by due time
+and arms a single root.after for the earliest one, so however many tasks are
+registered the main loop has one pending wakeup, and callbacks run on the Tk
+thread where they can touch widgets.
+
+Periodic timers can be aligned to wall-clock boundaries: every(60, ..., align=True)
+fires on the minute rather than 60 seconds after whenever it was registered.
+
+The heap outlives any one window. While tray-only mode has no Tk root nothing
+fires; when the next window attaches, overdue one-shot timers run and each
+periodic timer runs once before resuming its schedule.
+"""
+import heapq
+import itertools
+import math
+import time
+
+# Tk may wake a millisecond or two before the due time
+TOLERANCE = 0.005
+
+
+class Timer:
+    __slots__ = ("due", "interval", "align", "callback", "args", "cancelled")
+
+    def __init__(self, due, interval, align, callback, args):
+        self.due = due
+        self.interval = interval
+        self.align = align
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerHeap:
+    """Call only from the Tk thread; background threads go through the UI dispatcher"""
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._root = None
+        self._after_id = None
+        self._armed_for = None
+
+    def attach(self, root):
+        self._root = root
+        self._arm()
+
+    def detach(self):
+        self._disarm()
+        self._root = None
+
+    def call_at(self, when, callback, *args):
+        """Run callback(*args) at epoch time `when`"""
+        return self._add(Timer(when, None, False, callback, args))
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(time.time() + delay, callback, *args)
+
+    def every(self, interval, callback, *args, align=False, run_now=False):
+        """Run callback(*args) every `interval` seconds; with align, on multiples of it since the epoch"""
+        now = time.time()
+        timer = Timer(now, interval, align, callback, args)
+        if not run_now:
+            timer.due = self._next_due(timer, now)
+        return self._add(timer)
+
+    def _add(self, timer):
+        heapq.heappush(self._heap, (timer.due, next(self._seq), timer))
+        if self._armed_for is None or timer.due < self._armed_for:
+            self._arm()
+        return timer
+
+    def _next_due(self, timer, after):
+        if timer.align:
+            return (math.floor(after / timer.interval) + 1) * timer.interval
+        return after + timer.interval
+
+    def _disarm(self):
+        if self._root is not None and self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        self._after_id = None
+        self._armed_for = None
+
+    def _arm(self):
+        self._disarm()
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if self._root is None or not self._heap:
+            return
+        due = self._heap[0][0]
+        delay = max(0, int((due - time.time()) * 1000) + 1)
+        self._after_id = self._root.after(delay, self._run)
+        self._armed_for = due
+
+    def _run(self):
+        self._after_id = None
+        self._armed_for = None
+        root = self._root
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now + TOLERANCE and self._root is root:
+            due, _, timer = heapq.heappop(self._heap)
+            if timer.cancelled:
+                continue
+            if timer.interval:
+                # A periodic timer that fell behind runs once and picks up its schedule from now
+                timer.due = self._next_due(timer, max(now, due))
+                heapq.heappush(self._heap, (timer.due, next(self._seq), timer))
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                print(f"Error in timer {getattr(timer.callback, '__name__', timer.callback)}: {e}")
+        if self._root is root:
+            self._arm()
@@ -0,0 +1,172 @@
+"""
+Time zone and daylight-saving resolution for alarm times
+
+An alarm time is a wall-clock time in the alarm's zone: the system's local
+time, or an IANA zone (e.g. "Europe/London") for people who travel and want an
+alarm to keep home time. Turning a wall-clock time into an instant goes
+through a per-zone, per-year table of UTC offset changes, built once from
+zoneinfo by sampling the year, so the usual case is a bisect on a short list.
+
+Around a change some wall times don't exist (the skipped hour when clocks go
+forward) and some happen twice (the repeated hour when they go back). What an
+alarm does then is a policy:
+  gap   "shift" rings when the clock would have shown the time (a skipped
+        02:30 rings at 03:30); "skip" doesn't ring that day
+  fold  "first", "second" or "both" of the two times the clock shows it
+
+Times handed to and returned by this module's callers are naive system-local
+datetimes, as elsewhere in the app; their fold attribute tells the two halves
+of a repeated hour apart, and .timestamp() gives the exact instant.
+"""
+import bisect
+import calendar
+import functools
+import threading
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+GAP_SHIFT = "shift"
+GAP_SKIP = "skip"
+GAP_POLICIES = (GAP_SHIFT, GAP_SKIP)
+FOLD_FIRST = "first"
+FOLD_SECOND = "second"
+FOLD_BOTH = "both"
+FOLD_POLICIES = (FOLD_FIRST, FOLD_SECOND, FOLD_BOTH)
+
+# Longest stretch of wall time a zone has ever repeated, with room to spare
+MAX_FOLD = timedelta(hours=3)
+EPOCH = datetime(1970, 1, 1)
+DAY_SECONDS = 86400
+
+
+def get_zone(name):
+    """ZoneInfo for an IANA name, or None (system local time) for an empty name; raises ValueError"""
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"unknown time zone {name!r}") from e
+
+
+@functools.lru_cache(maxsize=64)
+def alarm_zone(name):
+    """Like get_zone, but an unknown zone (e.g. tzdata missing) falls back to local time, reported once"""
+    try:
+        return get_zone(name)
+    except ValueError as e:
+        print(f"Error in alarm time zone: {e}; using local time")
+        return None
+
+
+def _offset_at(zone, timestamp):
+    """UTC offset in seconds at a POSIX time, straight from the zone rules"""
+    if zone is None:
+        return datetime.fromtimestamp(timestamp).astimezone().utcoffset().total_seconds()
+    return datetime.fromtimestamp(timestamp, zone).utcoffset().total_seconds()
+
+
+class TransitionTable:
+    """UTC offsets of one zone through one year: the offset at new year and each change after it"""
+
+    def __init__(self, zone, year):
+        start = calendar.timegm((year, 1, 1, 0, 0, 0))
+        end = calendar.timegm((year + 1, 1, 1, 0, 0, 0))
+        self.times = [start]
+        self.offsets = [_offset_at(zone, start)]
+        # Sample daily and bisect each change down to the second; zones don't change twice a day
+        day = start
+        while day < end:
+            following = min(day + DAY_SECONDS, end)
+            offset = _offset_at(zone, following)
+            if offset != self.offsets[-1]:
+                low, high = day, following
+                while high - low > 1:
+                    middle = (low + high) // 2
+                    if _offset_at(zone, middle) == self.offsets[-1]:
+                        low = middle
+                    else:
+                        high = middle
+                self.times.append(high)
+                self.offsets.append(offset)
+            day = following
+
+    def offset_at(self, timestamp):
+        return self.offsets[bisect.bisect_right(self.times, timestamp) - 1]
+
+
+class ZoneCache:
+    def __init__(self, gap_policy=GAP_SHIFT, fold_policy=FOLD_FIRST):
+        # (zone, year) -> TransitionTable; zone None is the system's local time
+        self._tables = {}
+        self._lock = threading.Lock()
+        self.gap_policy = gap_policy
+        self.fold_policy = fold_policy
+
+    def set_policy(self, gap_policy=None, fold_policy=None):
+        if gap_policy is not None:
+            if gap_policy not in GAP_POLICIES:
+                raise ValueError(f"Unknown gap policy: {gap_policy}")
+            self.gap_policy = gap_policy
+        if fold_policy is not None:
+            if fold_policy not in FOLD_POLICIES:
+                raise ValueError(f"Unknown fold policy: {fold_policy}")
+            self.fold_policy = fold_policy
+
+    def clear(self):
+        """Forget the tables, e.g. after the system time zone has changed"""
+        if hasattr(time, "tzset"):
+            time.tzset()
+        with self._lock:
+            self._tables = {}
+
+    def _table(self, zone, year):
+        table = self._tables.get((zone, year))
+        if table is None:
+            table = TransitionTable(zone, year)
+            with self._lock:
+                self._tables[(zone, year)] = table
+        return table
+
+    def offset_at(self, zone, timestamp):
+        return self._table(zone, time.gmtime(timestamp).tm_year).offset_at(timestamp)
+
+    def to_wall(self, timestamp, zone):
+        """Naive wall-clock time in `zone` at a POSIX time"""
+        return EPOCH + timedelta(seconds=timestamp + self.offset_at(zone, timestamp))
+
+    def resolve(self, wall, zone):
+        """
+        POSIX times at which the naive wall-clock time `wall` in `zone` should
+        ring, in order: normally one, and per the policies none or a shifted
+        time in a gap, or one or both in a fold.
+        """
+        local = (wall - EPOCH).total_seconds()
+        # The offsets in force a day either side cover any change near `wall`
+        before = self.offset_at(zone, local - DAY_SECONDS)
+        after = self.offset_at(zone, local + DAY_SECONDS)
+        hits = sorted({local - offset for offset in (before, after) if self.offset_at(zone, local - offset) == offset})
+        if not hits:
+            return [local - before] if self.gap_policy == GAP_SHIFT else []
+        if len(hits) == 2:
+            if self.fold_policy == FOLD_FIRST:
+                return hits[:1]
+            if self.fold_policy == FOLD_SECOND:
+                return hits[1:]
+        return hits
+
+    def unstable_walls(self, zone, start, end):
+        """(first, last) naive wall times skipped or repeated by offset changes between two POSIX times"""
+        walls = []
+        for year in range(time.gmtime(start).tm_year, time.gmtime(end).tm_year + 1):
+            table = self._table(zone, year)
+            for i in range(1, len(table.times)):
+                if start <= table.times[i] < end:
+                    offsets = (table.offsets[i - 1], table.offsets[i])
+                    walls.append((EPOCH + timedelta(seconds=table.times[i] + min(offsets)),
+                                  EPOCH + timedelta(seconds=table.times[i] + max(offsets))))
+        return walls
+
+
+ZONES = ZoneCache()